@@ -1,164 +1,55 @@
-import traci
+import argparse
 import sumolib
-import networkx as nx
-import xml.etree.ElementTree as ET
-import time
 from dotenv import load_dotenv
-import os
 import requests
 import json
 import sys
 import re
-import heapq
+
+from src.common.circuit_breaker import CircuitOpenError
+from src.common.deepseek import DeepSeekApi
+from src.common.k_shortest_paths_engine import KShortestPathsEngine
+from src.common.network_attributes import NetworkAttributes
+from src.common.path_batch import PathBatch
+from src.common.run_config import ProgressReporter, RunConfig
+from src.common.routing_graph import RoutingGraph
+from src.common.simulation_state import SimulationStateCollector
 
 load_dotenv()
-G = nx.DiGraph()
+routing_graph = None
+ksp_engine = None
 
 def init_graph(net_data):
-    for edge in net_data.getEdges():
-        from_node = edge.getFromNode().getID()
-        to_node = edge.getToNode().getID()
-        length = edge.getLength()
-        G.add_edge(from_node, to_node, edge=edge.getID(), weight=length)
+    global routing_graph, ksp_engine
+    routing_graph = RoutingGraph.from_net(net_data)
+    ksp_engine = KShortestPathsEngine(routing_graph)
 
 def get_shortest_path(net_data, start_edge, end_edge):
     path = net_data.getShortestPath(start_edge, end_edge)
     return path[0] if path else []
 
 def find_k_shortest_paths(net_data, start_edge, end_edge, k):
-    G = nx.DiGraph()
-
-    for edge in net_data.getEdges():
-        from_node = edge.getFromNode().getID()
-        to_node = edge.getToNode().getID()
-        length = edge.getLength()
-        G.add_edge(from_node, to_node, edge=edge.getID(), weight=length)
-
-    start_node = net_data.getEdge(start_edge).getToNode().getID()
-    end_node = net_data.getEdge(end_edge).getFromNode().getID()
-
-    paths = []
-    heap = []
-
-    try:
-        shortest_path = nx.shortest_path(G, start_node, end_node, weight="weight")
-        paths.append(shortest_path)
-    except nx.NetworkXNoPath:
-        return []
-
-    for _ in range(k - 1):
-        for i in range(len(paths[-1]) - 1):
-            spur_node = paths[-1][i]
-            root_path = paths[-1][:i + 1]
-
-            removed_edges = []
-            for path in paths:
-                if len(path) > i and path[:i + 1] == root_path:
-                    u, v = path[i], path[i + 1]
-                    if G.has_edge(u, v):
-                        removed_edges.append((u, v, G[u][v]['weight'], G[u][v]['edge']))
-                        G.remove_edge(u, v)
-
-            try:
-                spur_path = nx.shortest_path(G, spur_node, end_node, weight="weight")
-                new_path = root_path[:-1] + spur_path
-                heapq.heappush(heap, (nx.path_weight(G, new_path, weight="weight"), new_path))
-            except nx.NetworkXNoPath:
-                pass
-
-            for u, v, weight, edge in removed_edges:
-                G.add_edge(u, v, weight=weight, edge=edge)
-
-        if not heap:
-            break
-
-        _, next_best_path = heapq.heappop(heap)
-        paths.append(next_best_path)
-
-    k_paths = []
-    for path in paths:
-        edge_path = [start_edge]
-        for u, v in zip(path[:-1], path[1:]):
-            edge_path.append(G[u][v]['edge'])
-        edge_path.append(end_edge)
-        k_paths.append(edge_path)
-
-    return k_paths
-
-def get_node_id(net_data, path):
-    node_ids = []
-    for edge in path:
-        edge_obj = net_data.getEdge(edge)
-        node_ids.append(edge_obj.getFromNode().getID())
-        node_ids.append(edge_obj.getToNode().getID())
-
-    node_ids = list(set(node_ids))
-    return node_ids
-
-def count_traffic_lights(net_data, path, net_path):
-    count = 0
-    tree = ET.parse(net_path)
-    root = tree.getroot()
-    node_ids = get_node_id(net_data, path)
-
-    for tl_logic in root.findall(".//tlLogic"):
-        if tl_logic.attrib['id'] in node_ids:
-            count += 1
-
-    return count
-
-def get_estimate_time(path):
-    total_time = sum(traci.edge.getTraveltime(edge) for edge in path)
-    return total_time
-
-def get_vehicle_density(path):
-    total_vehicles = sum(traci.edge.getLastStepVehicleNumber(edge) for edge in path)
-    return total_vehicles / len(path) if len(path) > 0 else 0
-def get_deepseek_response(prompt):
-    deepseek_api_url = os.getenv("DEEPSEEK_API_URL")
-    deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-
-    # Ghi prompt vào file
-    with open("deepseek_tracking.txt", "a") as f:
-        f.write(f"Prompt: {prompt}\n\n")
-
-    body = {
-        "model": "deepseek-chat",
-        "messages": [
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ]
-    }
-
-    headers = {
-        "Authorization": f"Bearer {deepseek_api_key}",
-        "Content-Type": "application/json"
-    }
-
-    response = requests.post(
-        deepseek_api_url,
-        json=body,
-        headers=headers
+    if ksp_engine is None:
+        init_graph(net_data)
+
+    return [edge_path for _, edge_path in ksp_engine.find(start_edge, end_edge, k)]
+
+def get_path_metrics(network, paths, edges):
+    # All candidate paths of all vehicles at once: traffic lights, summed travel time
+    # and mean vehicle number per edge, gathered from the step's edge arrays
+    batch = PathBatch(network, paths)
+    return (
+        batch.traffic_lights().tolist(),
+        batch.total(edges.travel_time).tolist(),
+        batch.mean(edges.vehicle_number).tolist()
     )
 
-    # Ghi response vào file
-    with open("deepseek_tracking.txt", "a") as f:
-        if response.status_code == 200:
-            response_content = response.json()["choices"][0]["message"]["content"]
-            f.write(f"Response: {response_content}\n\n")
-        else:
-            f.write(f"Error: {response.status_code} - {response.text}\n\n")
+def get_deepseek_response(deepseek_api, prompt, context=None):
+    # Prompt, answer, latency and token usage go to deepseek_tracking.jsonl from a background thread
+    return deepseek_api.request(prompt, context=context)
 
-    # In ra nội dung response nếu cần thiết
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        response.raise_for_status()
 
-
-def gpt_decision(k_shortest_paths, traffic_light_count, estimated_time_list, vehicle_density_list):
+def gpt_decision(deepseek_api, k_shortest_paths, traffic_light_count, estimated_time_list, vehicle_density_list, context=None):
     prompt = f'''
         You are a driver operating a car on city roads.
         Now you have reached an intersection.
@@ -174,7 +65,11 @@ def gpt_decision(k_shortest_paths, traffic_light_count, estimated_time_list, veh
         choice_reason = '...'
     '''
 
-    response = get_deepseek_response(prompt)
+    try:
+        response = get_deepseek_response(deepseek_api, prompt, context)
+    except (requests.RequestException, CircuitOpenError) as e:
+        print("DeepSeek unavailable, using the shortest path: ", e)
+        return k_shortest_paths[0]
 
     pattern = r"chose_path\s*=\s*\[([^\]]+)\]"
     match = re.search(pattern, response)
@@ -186,28 +81,49 @@ def gpt_decision(k_shortest_paths, traffic_light_count, estimated_time_list, veh
 
     return k_shortest_paths[0]
 
-def run_sumo_simulation(net_file, rou_file, cfg_file, tracking_vehicle_id):
-    sumo_cmd = ["sumo-gui", "-n", net_file, "-r", rou_file, "-c", cfg_file]
-    traci.start(sumo_cmd)
+def run_sumo_simulation(net_file, rou_file, cfg_file, tracking_vehicle_id, run_config=None):
+    run_config = run_config or RunConfig()
+    sumo_cmd = run_config.sumo_cmd(net_file, rou_file, cfg_file)
+    sim = run_config.load_sim()
+    sim.start(sumo_cmd)
+    progress = ProgressReporter(run_config.progress_interval)
 
-    net_data = sumolib.net.readNet(net_file)
+    net_data = sumolib.net.readNet(net_file, withInternal=True)
+    network = NetworkAttributes.from_net(net_data)
     init_graph(net_data)
+    state = SimulationStateCollector(network, sim=sim)
+    state.start()
+    deepseek_api = DeepSeekApi(tracking_file="deepseek_tracking.jsonl")
 
     step = 0
+    # Vehicle ID -> last edge of its route, read once when it departs
+    targets = {}
 
-    while traci.simulation.getMinExpectedNumber() > 0:
-        traci.simulationStep(step)
+    while sim.simulation.getMinExpectedNumber() > 0:
+        sim.simulationStep()
+        snapshot = state.collect()
         step += 1
-        print("step: ", step)
-        time.sleep(0.1)
+        run_config.wait_step()
+
+        for vi in snapshot.departed:
+            targets[vi] = sim.vehicle.getRoute(vi)[-1]
+        for vi in snapshot.arrived:
+            targets.pop(vi, None)
+
+        vehicles = snapshot.vehicles
+        sim_time = snapshot.time
+        progress.report(step, sim_time, len(vehicles))
+        if run_config.reached_end(sim_time):
+            break
 
-        vehicles = traci.vehicle.getIDList()
-        for vi in vehicles:
+        candidates = []
+        for vi, vehicle in vehicles.items():
             # if vi != tracking_vehicle_id:
             #     continue
 
-            current_edge = traci.vehicle.getRoadID(vi)
-            target_edge = traci.vehicle.getRoute(vi)[-1]
+            current_edge = vehicle.road_id
+            # Chosen paths end at the same edge, so the target never changes
+            target_edge = targets[vi]
 
             if current_edge == target_edge:
                 print(f"Vehicle {vi} finished")
@@ -216,25 +132,36 @@ def run_sumo_simulation(net_file, rou_file, cfg_file, tracking_vehicle_id):
             if str(current_edge).startswith(":"):
                 continue
 
-            lane_id = traci.vehicle.getLaneID(vi)
-            lane_pos = traci.vehicle.getLanePosition(vi)
-            lane_length = traci.lane.getLength(lane_id)
-
-            if (lane_length - lane_pos) > 1.0:
+            if (vehicle.lane_length - vehicle.lane_position) > 1.0:
                 continue
 
-            k_shortest_paths = find_k_shortest_paths(net_data, current_edge, target_edge, 3)
-            traffic_light_count = [count_traffic_lights(net_data, path, net_file) for path in k_shortest_paths]
-            estimated_time_list = [get_estimate_time(path) for path in k_shortest_paths]
-            vehicle_density_list = [get_vehicle_density(path) for path in k_shortest_paths]
+            candidates.append((vi, find_k_shortest_paths(net_data, current_edge, target_edge, 3)))
 
-            chosen_path = gpt_decision(k_shortest_paths, traffic_light_count, estimated_time_list, vehicle_density_list)
-            traci.vehicle.setRoute(vi, chosen_path)
+        if not candidates:
+            continue
+
+        traffic_lights, estimated_times, densities = get_path_metrics(
+            network, [path for _, paths in candidates for path in paths], snapshot.edges
+        )
+        start = 0
+        for vi, k_shortest_paths in candidates:
+            end = start + len(k_shortest_paths)
+            chosen_path = gpt_decision(
+                deepseek_api, k_shortest_paths, traffic_lights[start:end], estimated_times[start:end], densities[start:end],
+                context={"vehicle_ids": [vi], "step": step}
+            )
+            sim.vehicle.setRoute(vi, chosen_path)
+            start = end
 
     print("Finished simulation")
-    traci.close()
+    sim.close()
+    deepseek_api.close()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    RunConfig.add_arguments(parser)
+    args = parser.parse_args()
+
     dataset_path = "./dataset/hangzhou"
     net_file = f'{dataset_path}/net.xml'
     rou_file = f'{dataset_path}/routes.xml'
@@ -242,4 +169,4 @@ if __name__ == '__main__':
 
     tracking_vehicle_id = '0'
 
-    run_sumo_simulation(net_file, rou_file, cfg_file, tracking_vehicle_id)
+    run_sumo_simulation(net_file, rou_file, cfg_file, tracking_vehicle_id, RunConfig.from_args(args))
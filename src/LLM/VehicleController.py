@@ -2,105 +2,146 @@ import os
 
 from dotenv import load_dotenv
 from src.common.load_prompt import load_prompt
-from src.common.deepseek import DeepSeekApi
+from src.common.decision_backend import create_backend
+from src.common.batch_prompt import load_batch_prompt, parse_batch_response
+from src.common.decision_cache import DecisionCache
+from src.common.decision_dispatcher import DecisionDispatcher, DecisionRequest
+from src.common.decision_gate import DecisionGate
+from src.common.decision_prefetch import DecisionPrefetcher
 from src.common.get_k_shortest_paths import get_k_shortest_paths
-from src.common.get_vehicle_routes import get_vehicle_routes
+from src.common.k_shortest_paths_engine import KShortestPathsEngine
 from src.common.get_shortest_path import get_shortest_path
+from src.common.intersection_scheduler import APPROACH_THRESHOLD, IntersectionScheduler, step_reach
 from src.common.save_to_csv import save_to_csv
-import traci
+from src.common.run_config import ProgressReporter, RunConfig
+from src.common.network_cache import load_network
+from src.common.path_batch import PathBatch
+from src.common.shortest_path_tree_cache import ShortestPathTreeCache
+from src.common.simulation_state import SimulationStateCollector, StepSnapshot, VehicleState
+from src.common.step_profiler import StepProfiler
+from src.common.trip_metrics import TripMetrics
+from src.common.vehicle_decisions import VehicleDecisionTable
 import sumolib
-import networkx as nx
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import re
 
 NUMBER_OF_SHORTEST_PATHS = 3
+MAX_DECISIONS_IN_FLIGHT = 8
+PROFILE_PHASES = (
+    "simulation_step", "collect", "metrics", "poll", "schedule", "ksp", "build_requests", "gate", "cache", "dispatch", "set_route"
+)
 
 class VehicleController:
-    def __init__(self, net_file: str, rou_file: str, cfg_file: str) -> None:
+    def __init__(self, net_file: str, rou_file: str, cfg_file: str, turn_penalties: Optional[Dict[str, float]] = None,
+                 run_config: Optional[RunConfig] = None, max_in_flight: int = MAX_DECISIONS_IN_FLIGHT,
+                 batch_size: int = 1, flush_interval: float = 0.0, decision_cache_path: Optional[str] = None,
+                 backend: Optional[str] = None, decision_gate: Optional[DecisionGate] = None,
+                 decision_cooldown: float = 0.0, prefetch_distance: float = 0.0, prefetch_horizon: float = 0.0,
+                 prefetch_tolerance: float = 0.25) -> None:
         load_dotenv()
         self.net_file = net_file
         self.rou_file = rou_file
         self.cfg_file = cfg_file
-
-        self.net_data = sumolib.net.readNet(net_file)
-        self.graph = self._init_graph()
+        self.turn_penalties = turn_penalties
+        self.run_config = run_config or RunConfig()
+
+        self._net_data = None
+        self.graph, self.network = load_network(net_file, turn_penalties=turn_penalties)
+        self.tree_cache = ShortestPathTreeCache(self.graph)
+        self.profiler = StepProfiler(
+            PROFILE_PHASES,
+            enabled=self.run_config.profile_output is not None,
+            profiler=self.run_config.profiler
+        )
+        self.sim = self.profiler.wrap(self.run_config.load_sim())
+        self.state = SimulationStateCollector(self.network, sim=self.sim)
+        self.decision_cooldown = decision_cooldown
+        self.scheduler = IntersectionScheduler()
+        self.decisions: Optional[VehicleDecisionTable] = None
+        self.ksp_engine = KShortestPathsEngine(self.graph, self.tree_cache)
 
         self.start_time: Optional[float] = None
         self.end_time: Optional[float] = None
-        self.total_travel_time: float = 0.0
-        self.total_waiting_time: float = 0.0
-        self.total_time_loss: float = 0.0
+        self.metrics = TripMetrics(end_time=self.run_config.end_time)
 
         self.prompt_path = os.getenv("PROMPT_PATH")
-        self.deepseek = DeepSeekApi()
-
-    def _init_graph(self) -> nx.DiGraph:
-        graph = nx.DiGraph()
-        for edge in self.net_data.getEdges():
-            from_node = edge.getFromNode().getID()
-            to_node = edge.getToNode().getID()
-            graph.add_edge(from_node, to_node, edge=edge.getID(), weight=edge.getLength())
-        return graph
-
-    def _get_target_edge(self, vehicle_id: str, current_edge: str, vehicle_routes: Dict) -> Optional[str]:
-        route_info = vehicle_routes.get(vehicle_id)
-        if not route_info:
-            return None
+        self.batch_prompt_path = os.getenv("BATCH_PROMPT_PATH", "src/LLM/batch_prompt.txt")
+        self.backend = create_backend(backend)
+        self.dispatcher = DecisionDispatcher(
+            self._get_llm_suggestions,
+            max_in_flight=max_in_flight,
+            batch_size=batch_size,
+            flush_interval=flush_interval
+        )
+        self.decision_cache = DecisionCache(db_path=decision_cache_path)
+        self.decision_gate = decision_gate or DecisionGate()
+        self.prefetcher = DecisionPrefetcher(prefetch_distance, prefetch_horizon, prefetch_tolerance)
 
-        route = route_info['route']
-        target_index = route_info['target_edge_index']
+    @property
+    def net_data(self) -> sumolib.net.Net:
+        """The full sumolib net, parsed only when something asks for it."""
+        if self._net_data is None:
+            self._net_data = sumolib.net.readNet(self.net_file, withInternal=True)
+        return self._net_data
 
-        if target_index < len(route):
-            target_edge = route[target_index]
+    def _is_approaching_intersection(self, vehicle: VehicleState, threshold: float = APPROACH_THRESHOLD) -> bool:
+        return (vehicle.lane_length - vehicle.lane_position) <= threshold
 
-            if current_edge == target_edge:
-                route_info['target_edge_index'] += 1
-                if route_info['target_edge_index'] < len(route):
-                    return route_info['route'][route_info['target_edge_index']]
-            else:
-                return target_edge
-        return None
+    def _prefetch_threshold(self, vehicle: VehicleState, delta_t: float) -> float:
+        """
+        Distance to the lane end at which a held prefetched decision is taken up.
 
-    def _is_approaching_intersection(self, vehicle_id: str, threshold: float = 2.0) -> bool:
-        lane_id = traci.vehicle.getLaneID(vehicle_id)
-        lane_pos = traci.vehicle.getLanePosition(vehicle_id)
-        lane_length = traci.lane.getLength(lane_id)
-        return (lane_length - lane_pos) <= threshold
+        That is the last step before the vehicle may leave its edge, so the path
+        is in place before the turn; never closer to the end than a decision made on the spot.
+        """
+        return max(APPROACH_THRESHOLD, step_reach(vehicle, delta_t))
 
-    def _is_inside_intersection(self, vehicle_id: str) -> bool:
-        return traci.vehicle.getRoadID(vehicle_id).startswith(":")
+    def _is_inside_intersection(self, vehicle: VehicleState) -> bool:
+        return vehicle.road_id.startswith(":")
 
     def _save_results(self, file_path: str) -> None:
-        records = [{
-            "total_travel_time": self.total_travel_time,
-            "total_waiting_time": self.total_waiting_time,
-            "total_time_loss": self.total_time_loss
-        }]
+        records = [self.metrics.totals()]
         save_to_csv(file_path, fieldnames=list(records[0].keys()), records=records)
-
-    def _get_traffic_light_count(self, path: list, net_file: str) -> int:
-        net_data = sumolib.net.readNet(net_file)
-        traffic_lights = net_data.getTrafficLights()
-        count = 0
-        for tl in traffic_lights:
-            if tl.getID() in path:
-                count += 1
-        return count
-    
-    def _get_estimated_time(self, path: list) -> float:
-        return sum(traci.edge.getTraveltime(edge) for edge in path)
-
-    def _get_vehicle_density_(self, path: list) -> float:
-        total_vehicles = sum(traci.edge.getLastStepOccupancy(edge) for edge in path)
-        total_path_length = len(path)
-        return total_vehicles / total_path_length if total_path_length > 0 else 0.0
+        self.metrics.save(file_path)
+
+    def _build_requests(self, candidates: List[Tuple[str, list]], snapshot: StepSnapshot, step: int) -> List[DecisionRequest]:
+        """
+        Decision requests for every vehicle deciding this step.
+
+        The metrics of all candidate paths of all vehicles are computed together:
+        estimated time is the sum of the edges' current travel times, vehicle
+        density the mean of their occupancies.
+
+        :param candidates: (vehicle ID, k shortest paths) per deciding vehicle.
+        """
+        paths = [path for _, k_shortest_paths in candidates for path in k_shortest_paths]
+        batch = PathBatch(self.network, paths)
+        traffic_light_count = batch.traffic_lights().tolist()
+        estimated_time_list = batch.total(snapshot.edges.travel_time).tolist()
+        vehicle_density_list = batch.mean(snapshot.edges.occupancy).tolist()
+
+        requests = []
+        start = 0
+        for vehicle_id, k_shortest_paths in candidates:
+            end = start + len(k_shortest_paths)
+            requests.append(DecisionRequest(
+                vehicle_id,
+                k_shortest_paths,
+                traffic_light_count[start:end],
+                estimated_time_list[start:end],
+                vehicle_density_list[start:end],
+                step
+            ))
+            start = end
+        return requests
     
     def _get_llm_suggestion(
         self,
         k_shortest_paths,
         traffic_light_count,
         estimated_time_list,
-        vehicle_density_list
+        vehicle_density_list,
+        context=None
     ):
         prompt = load_prompt(
             self.prompt_path,
@@ -110,10 +151,29 @@ class VehicleController:
             vehicle_density_list=vehicle_density_list
         )
 
-        response = self.deepseek.request(prompt)
-        chose_path = self._parse_chosen_path(response)
-
-        return chose_path if chose_path else k_shortest_paths[0]
+        response = self.backend.request(prompt, context=context)
+        return self._parse_chosen_path(response)
+
+    def _get_llm_suggestions(self, requests: List[DecisionRequest]) -> Dict[str, list]:
+        """Chosen path per vehicle: one prompt per vehicle, or one JSON prompt for a whole batch."""
+        context = {
+            "vehicle_ids": [request.vehicle_id for request in requests],
+            "step": max(request.step for request in requests),
+        }
+        if len(requests) == 1:
+            request = requests[0]
+            chose_path = self._get_llm_suggestion(
+                request.k_shortest_paths,
+                request.traffic_light_count,
+                request.estimated_time_list,
+                request.vehicle_density_list,
+                context=context
+            )
+            return {request.vehicle_id: chose_path} if chose_path else {}
+
+        prompt = load_batch_prompt(self.batch_prompt_path, requests)
+        response = self.backend.request(prompt, json_output=True, context=context)
+        return parse_batch_response(response, requests)
 
     def _parse_chosen_path(self, response: str) -> list:
         """Parse the chosen path from LLM response."""
@@ -125,58 +185,324 @@ class VehicleController:
 
         return re.findall(r"'(.*?)'", match.group(1))
 
-    def run_simulation(self) -> None:
-        sumo_cmd = ["sumo-gui", "-n", self.net_file, "-r", self.rou_file, "-c", self.cfg_file]
-        traci.start(sumo_cmd)
+    def _apply_decision(self, vehicle_id: str, path: list, snapshot: StepSnapshot) -> None:
+        with self.profiler.phase("set_route"):
+            self._set_route(vehicle_id, path, snapshot)
+
+    def _take_decided(self, decided: List[Tuple[DecisionRequest, Optional[list]]], snapshot: StepSnapshot) -> None:
+        """
+        Cache and apply the model's answers.
+
+        Only a path that is one of the request's candidates is taken: the path
+        is parsed from free text, and a made-up or partial route would otherwise
+        be cached and replayed on every later run. Without one, the vehicle
+        gets its shortest candidate.
+        """
+        for request, path in decided:
+            if path in request.k_shortest_paths:
+                with self.profiler.phase("cache"):
+                    self.decision_cache.put(request, path)
+            else:
+                path = request.k_shortest_paths[0]
+            self._decided(request, path, snapshot)
+
+    def _decided(self, request: DecisionRequest, path: list, snapshot: StepSnapshot) -> None:
+        """
+        Apply a decided path.
+
+        A prefetched path is applied right away if the vehicle is still on the
+        edge it was decided for and the decision is still fresh, which leaves
+        the vehicle the rest of the edge to change into the lane the path
+        needs. Otherwise it is held until the decision point.
+        """
+        if self.prefetcher.owns(request):
+            path = self.prefetcher.resolve(request, path)
+            if path is None:
+                path = self._take_if_fresh(request, snapshot)
+            if path is None:
+                return
+        self._apply_decision(request.vehicle_id, path, snapshot)
+
+    def _take_if_fresh(self, request: DecisionRequest, snapshot: StepSnapshot) -> Optional[list]:
+        """The vehicle's held path if it is still on the decision's edge and the decision is fresh, else None."""
+        vehicle_id = request.vehicle_id
+        vehicle = snapshot.vehicles.get(vehicle_id)
+        if vehicle is None or vehicle.road_id != self.prefetcher.edge(vehicle_id):
+            return None
+        if self.prefetcher.is_stale(request, self._estimated_times(request, snapshot)):
+            return None
+        return self.prefetcher.take(vehicle_id, vehicle.road_id)
+
+    def _estimated_times(self, request: DecisionRequest, snapshot: StepSnapshot) -> List[float]:
+        """The request's candidates' estimated times in this step's traffic."""
+        batch = PathBatch(self.network, request.k_shortest_paths)
+        return batch.total(snapshot.edges.travel_time).tolist()
+
+    def _consider(
+        self, vehicle_id: str, vehicle: VehicleState, target_edge: str, snapshot: StepSnapshot,
+        candidates: List[Tuple[str, list]], prefetching: Dict[str, str]
+    ) -> None:
+        """
+        Start a route decision for the vehicle if it is due one.
+
+        Without prefetching, a vehicle decides once it is approaching the end of
+        its edge. With it, the decision starts earlier, as soon as the vehicle
+        enters the prefetch window, and is taken up again at the decision point
+        by ``_take_prefetched``; a vehicle already at its decision point decides on the spot.
+        """
+        current_edge = vehicle.road_id
+        if self.prefetcher.enabled:
+            if self._is_inside_intersection(vehicle) or not self.prefetcher.in_window(vehicle):
+                return
+        elif self._is_inside_intersection(vehicle) or not self._is_approaching_intersection(vehicle):
+            return
+
+        if self.dispatcher.is_pending(vehicle_id):
+            return
+
+        if not self.decisions.may_decide(vehicle_id, current_edge, snapshot.time):
+            return
+        # Also when no route comes of it, so the vehicle does not search again on every step of this edge
+        self.decisions.record_decision(vehicle_id, current_edge, snapshot.time)
+
+        k_shortest_paths = self._k_shortest_paths(current_edge, target_edge)
+        if not k_shortest_paths:
+            # The target cannot be reached from here; keep the current route
+            return
+        candidates.append((vehicle_id, k_shortest_paths))
+        if self.prefetcher.enabled and not self._is_approaching_intersection(
+            vehicle, self._prefetch_threshold(vehicle, snapshot.delta_t)
+        ):
+            # Already at its decision point, the decision is applied as soon as it is made
+            prefetching[vehicle_id] = current_edge
+
+    def _take_prefetched(
+        self, vehicle_id: str, vehicle: VehicleState, target_edge: Optional[str], snapshot: StepSnapshot,
+        candidates: List[Tuple[str, list]]
+    ) -> None:
+        """
+        Apply the vehicle's held decision once it reaches its decision point, or has passed it.
+
+        The decision point is the last step before the vehicle may leave its
+        edge (see ``_prefetch_threshold``). A path is only still held there if
+        it was stale when it came back; the candidates' estimated times are
+        looked up again, and a decision made on times that have since moved too
+        far is made again, this time applied as soon as it comes back.
+        """
+        if self.prefetcher.is_waiting(vehicle_id):
+            return
+
+        on_edge = vehicle.road_id == self.prefetcher.edge(vehicle_id)
+        if on_edge and not self._is_approaching_intersection(vehicle, self._prefetch_threshold(vehicle, snapshot.delta_t)):
+            return
+
+        estimated_time_list = None
+        if on_edge:
+            estimated_time_list = self._estimated_times(self.prefetcher.request(vehicle_id), snapshot)
+
+        path = self.prefetcher.take(vehicle_id, vehicle.road_id, estimated_time_list)
+        if path:
+            self._apply_decision(vehicle_id, path, snapshot)
+        elif vehicle_id not in self.prefetcher and target_edge:
+            k_shortest_paths = self._k_shortest_paths(vehicle.road_id, target_edge)
+            if k_shortest_paths:
+                candidates.append((vehicle_id, k_shortest_paths))
+
+    def _k_shortest_paths(self, current_edge: str, target_edge: str) -> list:
+        """
+        The candidate paths from the current edge to the target; empty when the
+        target cannot be reached from there, e.g. a waypoint driven past between two steps.
+        """
+        with self.profiler.phase("ksp"):
+            try:
+                k_shortest_paths = get_k_shortest_paths(
+                    self.graph, current_edge, target_edge, NUMBER_OF_SHORTEST_PATHS, engine=self.ksp_engine
+                )
+            except ValueError as e:
+                print(f"Error finding shortest paths: {e}")
+                k_shortest_paths = []
+        self.profiler.count("ksp_queries")
+        return k_shortest_paths
+
+    def _wake_threshold(
+        self, vehicle_id: str, vehicle: VehicleState, delta_t: float, prefetching: Dict[str, str]
+    ) -> Optional[float]:
+        """
+        Distance to the lane end at which the vehicle next needs looking at; None for the decision point.
+
+        :param prefetching: The vehicles whose prefetched decision starts this step.
+        """
+        if not self.prefetcher.enabled:
+            return None
+        if vehicle_id in self.prefetcher or vehicle_id in prefetching:
+            if self.prefetcher.is_waiting(vehicle_id):
+                # Waiting for an answer it is past the decision point for: only a new lane matters
+                return 0.0
+            return self._prefetch_threshold(vehicle, delta_t)
+        if self.decisions.decided_on(vehicle_id, vehicle.road_id):
+            return 0.0
+        return self.prefetcher.lead(vehicle)
+
+    def _set_route(self, vehicle_id: str, path: list, snapshot: StepSnapshot) -> None:
+        if vehicle_id not in snapshot.vehicles:
+            # Arrived while the decision was in flight.
+            return
+
+        # The vehicle kept driving while the LLM was asked, so start the new route
+        # at the edge its route is on now and drop the edges already driven. On a
+        # junction that is still the edge it is leaving, and the turn is already
+        # taken, so the new route must continue the same way.
+        route = self.sim.vehicle.getRoute(vehicle_id)
+        route_index = self.sim.vehicle.getRouteIndex(vehicle_id)
+        current_edge = route[route_index]
+        if current_edge not in path:
+            return
+        path = path[path.index(current_edge):]
+        if self._is_inside_intersection(snapshot.vehicles[vehicle_id]) and path[1:2] != route[route_index + 1:route_index + 2]:
+            return
+
+        try:
+            self.sim.vehicle.setRoute(vehicle_id, path)
+        except self.sim.TraCIException as e:
+            print(f"Could not apply the route chosen for vehicle {vehicle_id}: {e}")
+            return
+        self.decisions.record_route(vehicle_id, path)
 
-        vehicle_routes = get_vehicle_routes(self.rou_file)
+    def run_simulation(self) -> None:
+        sumo_cmd = self.run_config.sumo_cmd(self.net_file, self.rou_file, self.cfg_file)
+        self.sim.start(sumo_cmd, label=self.run_config.label)
+        progress = ProgressReporter(self.run_config.progress_interval)
+
+        self.decisions = VehicleDecisionTable.from_route_file(self.rou_file, self.network.edge_index, self.decision_cooldown)
+        self.state.start()
+        self.dispatcher.start()
+        self.profiler.start()
         step = 0
 
-        while traci.simulation.getMinExpectedNumber() > 0:
-            traci.simulationStep()
+        while self.sim.simulation.getMinExpectedNumber() > 0:
+            with self.profiler.phase("simulation_step"):
+                self.sim.simulationStep()
+            with self.profiler.phase("collect"):
+                snapshot = self.state.collect()
+            with self.profiler.phase("metrics"):
+                self.metrics.update(snapshot)
 
             if self.start_time is None:
-                self.start_time = traci.simulation.getTime()
+                self.start_time = snapshot.time
+
+            with self.profiler.phase("poll"):
+                decided = self.dispatcher.poll()
+            self._take_decided(decided, snapshot)
+            for vehicle_id in snapshot.arrived:
+                self.prefetcher.drop(vehicle_id)
 
-            vehicles = traci.vehicle.getIDList()
-            self.total_travel_time += len(vehicles) * traci.simulation.getDeltaT()
+            vehicles = snapshot.vehicles
 
             step += 1
+            progress.report(step, snapshot.time, len(vehicles))
+            self.run_config.wait_step()
+            if self.run_config.reached_end(snapshot.time):
+                break
+
+            with self.profiler.phase("schedule"):
+                due = self.scheduler.due(snapshot)
+            candidates = []
+            # Vehicle ID -> edge, for the candidates whose decision is prefetched
+            prefetching = {}
+            for vehicle_id, vehicle in due:
+                target_edge = self.decisions.target_edge(vehicle_id, vehicle.road_id)
+                if vehicle_id in self.prefetcher:
+                    # Its decision may be for the edge before its last waypoint
+                    self._take_prefetched(vehicle_id, vehicle, target_edge, snapshot, candidates)
+                elif target_edge:
+                    self._consider(vehicle_id, vehicle, target_edge, snapshot, candidates, prefetching)
+                else:
+                    # Past its last waypoint, so it never decides again
+                    continue
+                self.scheduler.reschedule(
+                    vehicle_id, vehicle, snapshot, self._wake_threshold(vehicle_id, vehicle, snapshot.delta_t, prefetching)
+                )
 
-            for vehicle_id in vehicles:
-                current_edge = traci.vehicle.getRoadID(vehicle_id)
-                target_edge = self._get_target_edge(vehicle_id, current_edge, vehicle_routes)
+            with self.profiler.phase("build_requests"):
+                requests = self._build_requests(candidates, snapshot, step) if candidates else []
 
-                if not target_edge:
-                    self.total_waiting_time += traci.vehicle.getAccumulatedWaitingTime(vehicle_id)
-                    self.total_time_loss += traci.vehicle.getTimeLoss(vehicle_id)
-                    continue
+            for request in requests:
+                if request.vehicle_id in prefetching:
+                    self.prefetcher.start(request, prefetching[request.vehicle_id])
 
-                if self._is_inside_intersection(vehicle_id) or not self._is_approaching_intersection(vehicle_id):
+                # Only genuinely ambiguous choices go to the model.
+                with self.profiler.phase("gate"):
+                    local_path = self.decision_gate.resolve(request)
+                if local_path:
+                    self._decided(request, local_path, snapshot)
                     continue
 
-                k_shortest_paths = get_k_shortest_paths(self.graph, current_edge, target_edge, NUMBER_OF_SHORTEST_PATHS)
-                traffic_light_count = [self._get_traffic_light_count(path, self.net_file) for path in k_shortest_paths]
-                estimated_time_list = [self._get_estimated_time(path) for path in k_shortest_paths]
-                vehicle_density_list = [self._get_vehicle_density_(path) for path in k_shortest_paths]
+                with self.profiler.phase("cache"):
+                    cached_path = self.decision_cache.get(request)
+                if cached_path:
+                    self._decided(request, cached_path, snapshot)
+                    continue
 
-                choose_path = self._get_llm_suggestion(
-                    k_shortest_paths,
-                    traffic_light_count,
-                    estimated_time_list,
-                    vehicle_density_list
-                )
+                # The vehicle keeps its current route until the decision comes back.
+                with self.profiler.phase("dispatch"):
+                    self.dispatcher.submit(request, snapshot.time)
 
-                traci.vehicle.setRoute(vehicle_id, choose_path)
+            with self.profiler.phase("dispatch"):
+                self.dispatcher.flush(snapshot.time)
+            self.profiler.end_step()
 
-        self.end_time = traci.simulation.getTime()
+        self.dispatcher.close()
+        self.decision_cache.close()
+        self.end_time = self.sim.simulation.getTime()
+        self.metrics.finish()
+        totals = self.metrics.totals()
 
         print(f"Simulation ended at {self.end_time} seconds")
         print(f"Total simulation time: {self.end_time - self.start_time} seconds")
-        print(f"Total travel time: {self.total_travel_time} seconds")
-        print(f"Total waiting time: {self.total_waiting_time} seconds")
-        print(f"Total time loss: {self.total_time_loss} seconds")
+        print(f"Total travel time: {totals['total_travel_time']} seconds")
+        print(f"Total waiting time: {totals['total_waiting_time']} seconds")
+        print(f"Total time loss: {totals['total_time_loss']} seconds")
+        print(f"Route decisions: {int(self.decisions.decision_count.sum())} made, "
+              f"{self.decisions.skipped} skipped as already decided or cooling down")
+        print(f"Decision cache: {self.decision_cache.hits} hits, {self.decision_cache.misses} misses")
+        self._print_gate_statistics()
+        if self.prefetcher.enabled:
+            prefetcher = self.prefetcher
+            print(f"Decision prefetch: {prefetcher.started} started, {prefetcher.on_time} applied on time, "
+                  f"{prefetcher.late} applied late, {prefetcher.stale} made again as stale")
+        self._finish_profile()
+
+    def _print_gate_statistics(self) -> None:
+        gate = self.decision_gate
+        print(f"Decision gate: {gate.single} single-route and {gate.dominated} dominated choices settled locally, "
+              f"{gate.ambiguous} sent on")
+        if self.dispatcher.decided:
+            # Model time the settled choices would have cost, at the average time per decided vehicle
+            saved = gate.settled * self.dispatcher.mean_decision_time
+            print(f"Decision gate: about {saved:.1f} s of model time avoided "
+                  f"({self.dispatcher.mean_decision_time:.3f} s per decision)")
+
+    def _finish_profile(self) -> None:
+        # The model answers on the dispatcher's threads, so its share is counted, not timed per step.
+        self.profiler.stop()
+        self.profiler.count("llm_calls", self.dispatcher.batches)
+        self.profiler.count("llm_failed_calls", self.dispatcher.failed)
+        self.profiler.count("llm_decisions", self.dispatcher.decided)
+        self.profiler.count("llm_time_ms", int(self.dispatcher.model_time * 1000))
+        self.profiler.count("cache_hits", self.decision_cache.hits)
+        self.profiler.count("cache_misses", self.decision_cache.misses)
+        self.profiler.count("gate_settled", self.decision_gate.settled)
+        self.profiler.count("vehicles_woken", self.scheduler.woken)
+        if self.prefetcher.enabled:
+            self.profiler.count("prefetch_started", self.prefetcher.started)
+            self.profiler.count("prefetch_on_time", self.prefetcher.on_time)
+            self.profiler.count("prefetch_late", self.prefetcher.late)
+            self.profiler.count("prefetch_stale", self.prefetcher.stale)
+        self.profiler.print_summary()
+        if self.run_config.profile_output:
+            self.profiler.dump(self.run_config.profile_output)
 
     def finish_simulation(self) -> None:
-        traci.close()
+        self.sim.close()
+        self.backend.close()
         print("Simulation finished and closed.")
\ No newline at end of file
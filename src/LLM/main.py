@@ -1,9 +1,40 @@
 from src.LLM.VehicleController import VehicleController
+from src.common.decision_backend import BACKENDS
+from src.common.decision_gate import DecisionGate
+from src.common.run_config import RunConfig
+import argparse
 import time
 from dotenv import load_dotenv
 import os
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    RunConfig.add_arguments(parser)
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Maximum number of LLM requests running at once.")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Vehicles per LLM request; above 1, decisions are batched into one JSON prompt.")
+    parser.add_argument("--flush-interval", type=float, default=0.0,
+                        help="Simulation seconds a partial batch may wait for more vehicles.")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="Model answering the route choices (default: DECISION_BACKEND, then deepseek).")
+    parser.add_argument("--time-margin", type=float, default=0.0,
+                        help="Relative slack on estimated time when settling dominated choices locally.")
+    parser.add_argument("--density-margin", type=float, default=0.0,
+                        help="Absolute slack on vehicle density when settling dominated choices locally.")
+    parser.add_argument("--no-decision-gate", action="store_true", help="Send every route choice to the model.")
+    parser.add_argument("--decision-cooldown", type=float, default=0.0,
+                        help="Minimum simulation seconds between two route decisions of a vehicle.")
+    parser.add_argument("--prefetch-distance", type=float, default=0.0,
+                        help="Start a vehicle's route decision this many metres before the end of its edge "
+                             "(inf: on entering the edge) and apply it at the decision point.")
+    parser.add_argument("--prefetch-horizon", type=float, default=0.0,
+                        help="Start a vehicle's route decision this many seconds, at its allowed speed, before the end of its edge.")
+    parser.add_argument("--prefetch-tolerance", type=float, default=0.25,
+                        help="Relative change of a candidate's estimated time that makes a prefetched decision stale.")
+    parser.add_argument("--decision-cache", default=None,
+                        help="SQLite file that keeps LLM decisions between runs (in-memory only if omitted).")
+    args = parser.parse_args()
+
     load_dotenv()
 
     dataset_path = "./dataset/mini-grid"
@@ -11,7 +42,20 @@ if __name__ == '__main__':
     rou_file = f'{dataset_path}/routes.xml'
     cfg_file = f'{dataset_path}/config_file.sumocfg'
 
-    vehicle_controller = VehicleController(net_file, rou_file, cfg_file)
+    vehicle_controller = VehicleController(
+        net_file, rou_file, cfg_file,
+        run_config=RunConfig.from_args(args),
+        max_in_flight=args.max_in_flight,
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval,
+        decision_cache_path=args.decision_cache,
+        backend=args.backend,
+        decision_gate=DecisionGate(args.time_margin, args.density_margin, enabled=not args.no_decision_gate),
+        decision_cooldown=args.decision_cooldown,
+        prefetch_distance=args.prefetch_distance,
+        prefetch_horizon=args.prefetch_horizon,
+        prefetch_tolerance=args.prefetch_tolerance
+    )
     vehicle_controller.run_simulation()
 
     file_name = time.strftime("%d-%m-%Y %H:%M:%S")
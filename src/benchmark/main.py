@@ -0,0 +1,66 @@
+from src.common.scenario_sweep import CONTROLLERS, build_matrix, find_scenario, run_sweep
+from src.common.run_config import RunConfig
+from src.common.save_to_csv import save_to_csv
+from src.common.sim_backend import SIM_BACKENDS
+import argparse
+import json
+import os
+import time
+
+FIELDS = ["dataset", "controller", "sim_backend", "status", "steps", "wall_time", "steps_per_second",
+          "simulation_step_s", "collect_s", "speedup"]
+
+
+def read_profile(output_dir: str) -> dict:
+    with open(os.path.join(output_dir, "run_profile.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the step throughput of the traci and libsumo backends.")
+    parser.add_argument("--dataset-dir", default="./dataset")
+    parser.add_argument("--datasets", nargs="+", default=["hangzhou", "ingolstadt21"])
+    parser.add_argument("--controllers", nargs="+", choices=list(CONTROLLERS), default=["shortest_path"])
+    parser.add_argument("--backends", nargs="+", choices=SIM_BACKENDS, default=list(SIM_BACKENDS))
+    parser.add_argument("--end", dest="end_time", type=float, default=None, help="Override the simulation end time.")
+    args = parser.parse_args()
+
+    scenarios = [find_scenario(os.path.join(args.dataset_dir, name)) for name in args.datasets]
+    scenarios = [scenario for scenario in scenarios if scenario is not None]
+    results_dir = f"results/benchmark/{time.strftime('%d-%m-%Y %H:%M:%S')}"
+
+    rows = []
+    for backend in args.backends:
+        runs = build_matrix(scenarios, args.controllers, [None], {}, os.path.join(results_dir, backend))
+        run_config = RunConfig(progress_interval=0, end_time=args.end_time, profile_output="run", sim_backend=backend)
+        # One run at a time, so the runs do not compete for the CPU.
+        for record in run_sweep(runs, workers=1, run_config=run_config):
+            row = {"dataset": record["dataset"], "controller": record["controller"], "sim_backend": backend,
+                   "status": record["status"], "wall_time": record["wall_time"]}
+            if record["status"] == "ok":
+                profile = read_profile(record["output_dir"])
+                step_time = profile["phases"]["step"]["total_s"]
+                row.update(
+                    steps=profile["steps"],
+                    steps_per_second=round(profile["steps"] / step_time, 1) if step_time else 0.0,
+                    simulation_step_s=round(profile["phases"]["simulation_step"]["total_s"], 3),
+                    collect_s=round(profile["phases"]["collect"]["total_s"], 3),
+                )
+            rows.append(row)
+
+    baseline = {
+        (row["dataset"], row["controller"]): row["steps_per_second"]
+        for row in rows if row["sim_backend"] == "traci" and row.get("steps_per_second")
+    }
+    for row in rows:
+        reference = baseline.get((row["dataset"], row["controller"]))
+        if reference and row.get("steps_per_second"):
+            row["speedup"] = round(row["steps_per_second"] / reference, 2)
+
+    os.makedirs(results_dir, exist_ok=True)
+    save_to_csv(f"{results_dir}/benchmark.csv", fieldnames=FIELDS, records=rows)
+    print(f"{'dataset':<14} {'controller':<14} {'backend':<8} {'steps':>6} {'steps/s':>9} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['dataset']:<14} {row['controller']:<14} {row['sim_backend']:<8} {row.get('steps', '-'):>6} "
+              f"{row.get('steps_per_second', '-'):>9} {row.get('speedup', '-'):>8}")
+    print(f"Results in {results_dir}/benchmark.csv")
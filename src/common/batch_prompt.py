@@ -0,0 +1,63 @@
+import json
+from typing import Dict, List
+
+from src.common.decision_dispatcher import DecisionRequest
+from src.common.load_prompt import load_prompt
+
+
+def load_batch_prompt(file_path: str, requests: List[DecisionRequest]) -> str:
+    """
+    Fill the batch prompt template with the candidate routes of several vehicles.
+
+    The template gets a single ``{vehicles}`` field: a one-line JSON list with,
+    per vehicle, its ID and its candidate routes numbered from 0.
+    """
+    vehicles = [
+        {
+            "vehicle_id": request.vehicle_id,
+            "routes": [
+                {
+                    "route": i,
+                    "edges": path,
+                    "traffic_lights": request.traffic_light_count[i],
+                    "estimated_time": round(request.estimated_time_list[i], 1),
+                    "vehicle_density": round(request.vehicle_density_list[i], 3),
+                }
+                for i, path in enumerate(request.k_shortest_paths)
+            ],
+        }
+        for request in requests
+    ]
+    return load_prompt(file_path, vehicles=json.dumps(vehicles, separators=(",", ":")))
+
+
+def parse_batch_response(response: str, requests: List[DecisionRequest]) -> Dict[str, List[str]]:
+    """
+    Split the JSON answer to a batch prompt back into one path per vehicle.
+
+    Entries that are missing, malformed or point at a route that does not
+    exist are left out, so the caller falls back for those vehicles only.
+
+    :param response: Model output; surrounding text or code fences are ignored.
+    :param requests: The requests the prompt was built from.
+    :return: Chosen path per vehicle ID.
+    """
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end < start:
+        return {}
+
+    try:
+        decisions = json.loads(response[start:end + 1]).get("decisions", [])
+    except (ValueError, AttributeError):
+        return {}
+
+    candidates = {request.vehicle_id: request.k_shortest_paths for request in requests}
+    chosen = {}
+    for decision in decisions if isinstance(decisions, list) else []:
+        if not isinstance(decision, dict):
+            continue
+        paths = candidates.get(str(decision.get("vehicle_id")))
+        route = decision.get("route")
+        if paths is not None and isinstance(route, int) and 0 <= route < len(paths):
+            chosen[str(decision["vehicle_id"])] = paths[route]
+    return chosen
@@ -0,0 +1,76 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from src.common.tracking_sink import TrackingSink
+
+BACKENDS = ("deepseek", "gpt4all")
+
+
+class DecisionBackend(ABC):
+    """
+    A model that answers route-choice prompts.
+
+    Backends only turn a prompt into the model's text answer; building the
+    prompt and parsing the answer stay with the controller. Every request is
+    logged as one JSON Lines record to the tracking file, if one is set.
+    """
+
+    def __init__(self, tracking_file: Optional[str] = None) -> None:
+        """
+        :param tracking_file: JSON Lines file every request is logged to; defaults to
+            DEEPSEEK_TRACKING_FILE, and nothing is logged when neither is set.
+        """
+        self.tracking_file = tracking_file or os.getenv("DEEPSEEK_TRACKING_FILE")
+        self.tracking_sink = TrackingSink(self.tracking_file) if self.tracking_file else None
+
+    @abstractmethod
+    def request(self, prompt: str, json_output: bool = False, context: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Send a prompt and return the model's answer.
+
+        :param json_output: Ask for a JSON object as the answer.
+        :param context: Extra fields for the tracking record, e.g. vehicle IDs and step.
+        """
+
+    def tracking(
+        self,
+        prompt: str,
+        latency: float,
+        context: Optional[Dict[str, Any]] = None,
+        response: Optional[str] = None,
+        usage: Optional[Dict[str, int]] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Queue one JSON Lines record for the request; the file is written in the background."""
+        if self.tracking_sink is None:
+            return
+
+        record = {"timestamp": round(time.time(), 3), **(context or {}), "latency": round(latency, 4), "prompt": prompt}
+        if error is not None:
+            record["error"] = error
+        else:
+            record["response"] = response
+            record["usage"] = usage
+        self.tracking_sink.write(record)
+
+    def close(self) -> None:
+        if self.tracking_sink is not None:
+            self.tracking_sink.close()
+
+
+def create_backend(name: Optional[str] = None) -> DecisionBackend:
+    """
+    Build the decision backend by name.
+
+    :param name: One of ``BACKENDS``; defaults to DECISION_BACKEND, then "deepseek".
+    """
+    name = name or os.getenv("DECISION_BACKEND", "deepseek")
+    if name == "deepseek":
+        from src.common.deepseek import DeepSeekApi
+        return DeepSeekApi()
+    if name == "gpt4all":
+        from src.common.gpt4all_backend import GPT4AllBackend
+        return GPT4AllBackend()
+    raise ValueError(f"Unknown decision backend {name!r}, expected one of {BACKENDS}")
@@ -0,0 +1,103 @@
+import json
+import sqlite3
+from collections import OrderedDict
+from typing import List, Optional
+
+from src.common.decision_dispatcher import DecisionRequest
+
+# Commit the on-disk store after this many new decisions.
+COMMIT_EVERY = 100
+
+
+class DecisionCache:
+    """
+    LRU cache of LLM route decisions, optionally backed by SQLite.
+
+    The key is the candidate paths together with their metrics rounded into
+    buckets, so vehicles facing the same choice under similar traffic reuse
+    one answer instead of asking the model again. With ``db_path`` every
+    decision is also written to a SQLite file, and lookups that miss the
+    in-memory LRU fall through to it, so the cache survives between runs.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 4096,
+        db_path: Optional[str] = None,
+        time_bucket: float = 10.0,
+        density_bucket: float = 0.05
+    ) -> None:
+        """
+        :param max_size: Decisions kept in memory.
+        :param db_path: SQLite file to persist decisions in; None keeps them in memory only.
+        :param time_bucket: Width of the estimated-time buckets, in seconds.
+        :param density_bucket: Width of the vehicle-density buckets.
+        """
+        self.max_size = max_size
+        self.time_bucket = time_bucket
+        self.density_bucket = density_bucket
+        self._decisions: "OrderedDict[str, List[str]]" = OrderedDict()
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._uncommitted = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS decisions (key TEXT PRIMARY KEY, path TEXT NOT NULL)")
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._decisions)
+
+    def key(self, request: DecisionRequest) -> str:
+        """Cache key of a request: candidate paths, traffic-light counts and bucketed metrics."""
+        return json.dumps([
+            request.k_shortest_paths,
+            request.traffic_light_count,
+            [round(t / self.time_bucket) for t in request.estimated_time_list],
+            [round(d / self.density_bucket) for d in request.vehicle_density_list],
+        ], separators=(",", ":"))
+
+    def get(self, request: DecisionRequest) -> Optional[List[str]]:
+        """The cached path for a request's situation, or None."""
+        key = self.key(request)
+        path = self._decisions.get(key)
+        if path is not None:
+            self._decisions.move_to_end(key)
+        elif self._db is not None:
+            row = self._db.execute("SELECT path FROM decisions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                path = json.loads(row[0])
+                self._remember(key, path)
+
+        if path is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return path
+
+    def put(self, request: DecisionRequest, path: List[str]) -> None:
+        key = self.key(request)
+        self._remember(key, path)
+
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO decisions (key, path) VALUES (?, ?)", (key, json.dumps(path)))
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def _remember(self, key: str, path: List[str]) -> None:
+        self._decisions[key] = path
+        self._decisions.move_to_end(key)
+        if len(self._decisions) > self.max_size:
+            self._decisions.popitem(last=False)
+
+    def close(self) -> None:
+        """Write outstanding decisions to disk and close the store."""
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
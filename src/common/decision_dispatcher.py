@@ -0,0 +1,181 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+
+class DecisionRequest(NamedTuple):
+    """Everything the LLM is told about one vehicle's choice."""
+    vehicle_id: str
+    k_shortest_paths: List[List[str]]
+    traffic_light_count: List[int]
+    estimated_time_list: List[float]
+    vehicle_density_list: List[float]
+    # Simulation step the request was made on
+    step: int = 0
+
+
+class DecisionDispatcher:
+    """
+    Runs route decisions concurrently, off the simulation thread.
+
+    Requests are buffered by ``submit`` and sent in batches by ``flush``,
+    which the controller calls once per step: full batches of ``batch_size``
+    go out at once, a partial batch once its oldest request has waited
+    ``flush_interval`` simulation seconds. Each batch is one call to
+    ``decide_batch``, run in a worker thread by an asyncio loop in a
+    background thread, so the simulation keeps stepping while the LLM is
+    asked. At most ``max_in_flight`` batches run at once. Finished decisions
+    are collected with ``poll``; the caller decides what a vehicle without
+    an answer does.
+    """
+
+    def __init__(
+        self,
+        decide_batch: Callable[[List[DecisionRequest]], Dict[str, List[str]]],
+        max_in_flight: int = 8,
+        batch_size: int = 1,
+        flush_interval: float = 0.0
+    ) -> None:
+        """
+        :param decide_batch: Blocking function mapping a batch of requests to the chosen
+            path per vehicle ID. Vehicles may be missing from its result.
+        :param max_in_flight: Maximum number of batches being decided at the same time.
+        :param batch_size: Maximum number of vehicles per batch.
+        :param flush_interval: Simulation seconds a partial batch may wait for more vehicles.
+        """
+        self.decide_batch = decide_batch
+        self.max_in_flight = max_in_flight
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self._buffer: List[DecisionRequest] = []
+        self._buffered_since = 0.0
+        self._pending: Set[str] = set()
+        self._futures: Set[Future] = set()
+        self._completed: List[Tuple[DecisionRequest, Optional[List[str]]]] = []
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.batches = 0
+        self.failed = 0
+        # Wall-clock seconds spent waiting for the model, and the vehicles it decided for
+        self.model_time = 0.0
+        self.decided = 0
+
+    def start(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="decision")
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="decision-dispatcher", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the loop. Buffered decisions and decisions still in flight are dropped."""
+        if self._loop is None:
+            return
+
+        self._buffer.clear()
+        self._pending.clear()
+        # Cancel the decisions in flight on the loop itself and wait until they
+        # have unwound, so no task is left pending when the loop is closed.
+        asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop).result()
+        self._futures.clear()
+
+        # Model calls already running in a worker thread cannot be interrupted;
+        # their results are dropped.
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    async def _cancel_all(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def mean_decision_time(self) -> float:
+        """Average seconds of model time per decided vehicle."""
+        return self.model_time / self.decided if self.decided else 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending) - len(self._buffer)
+
+    def is_pending(self, vehicle_id: str) -> bool:
+        return vehicle_id in self._pending
+
+    def submit(self, request: DecisionRequest, sim_time: float) -> None:
+        """Queue a decision for the next batch."""
+        if not self._buffer:
+            self._buffered_since = sim_time
+        self._buffer.append(request)
+        self._pending.add(request.vehicle_id)
+        self.submitted += 1
+
+    def flush(self, sim_time: float, force: bool = False) -> None:
+        """
+        Send the buffered requests that are due.
+
+        :param sim_time: Current simulation time.
+        :param force: Send a partial batch even if ``flush_interval`` has not passed.
+        """
+        if self._loop is None:
+            raise RuntimeError("DecisionDispatcher.start() has not been called")
+
+        while len(self._buffer) >= self.batch_size:
+            self._send(self._buffer[:self.batch_size])
+            self._buffer = self._buffer[self.batch_size:]
+            self._buffered_since = sim_time
+
+        if self._buffer and (force or sim_time - self._buffered_since >= self.flush_interval):
+            self._send(self._buffer)
+            self._buffer = []
+
+    def _send(self, batch: List[DecisionRequest]) -> None:
+        self.batches += 1
+        future = asyncio.run_coroutine_threadsafe(self._decide(batch), self._loop)
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+
+    async def _decide(self, batch: List[DecisionRequest]) -> None:
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                paths = await self._loop.run_in_executor(None, self.decide_batch, batch)
+            except Exception as e:
+                print(f"Decision for {len(batch)} vehicle(s) failed: {e}")
+                with self._lock:
+                    self.failed += 1
+                paths = {}
+            elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.model_time += elapsed
+            self.decided += len(batch)
+            for request in batch:
+                self._completed.append((request, paths.get(request.vehicle_id)))
+
+    def poll(self) -> List[Tuple[DecisionRequest, Optional[List[str]]]]:
+        """
+        Decisions finished since the last call.
+
+        :return: (request, chosen path) pairs; the path is None when the model gave
+            no usable answer for that vehicle.
+        """
+        with self._lock:
+            completed, self._completed = self._completed, []
+
+        for request, _ in completed:
+            self._pending.discard(request.vehicle_id)
+        return completed
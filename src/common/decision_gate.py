@@ -0,0 +1,65 @@
+from typing import List, Optional
+
+from src.common.decision_dispatcher import DecisionRequest
+
+
+class DecisionGate:
+    """
+    Settles route choices that do not need the model.
+
+    A choice is settled locally when there is only one candidate, or when one
+    candidate is no worse than every other on estimated time, vehicle density
+    and traffic-light count at once (Pareto dominance). The margins loosen
+    "no worse" for the two traffic metrics, so a candidate that is slightly
+    slower or denser but otherwise at least as good still counts as
+    dominating. Everything else is ambiguous and goes to the model.
+    """
+
+    def __init__(self, time_margin: float = 0.0, density_margin: float = 0.0, enabled: bool = True) -> None:
+        """
+        :param time_margin: Relative slack on estimated time, e.g. 0.05 for 5%.
+        :param density_margin: Absolute slack on vehicle density.
+        :param enabled: Set to False to send every choice to the model.
+        """
+        self.time_margin = time_margin
+        self.density_margin = density_margin
+        self.enabled = enabled
+
+        self.single = 0
+        self.dominated = 0
+        self.ambiguous = 0
+
+    @property
+    def settled(self) -> int:
+        return self.single + self.dominated
+
+    def _no_worse(self, request: DecisionRequest, i: int, j: int) -> bool:
+        return (
+            request.estimated_time_list[i] <= request.estimated_time_list[j] * (1 + self.time_margin)
+            and request.vehicle_density_list[i] <= request.vehicle_density_list[j] + self.density_margin
+            and request.traffic_light_count[i] <= request.traffic_light_count[j]
+        )
+
+    def resolve(self, request: DecisionRequest) -> Optional[List[str]]:
+        """
+        The path to take without asking the model, or None if the choice is ambiguous.
+
+        Candidates are checked in order, so among several dominating ones the
+        shortest wins.
+        """
+        paths = request.k_shortest_paths
+        if not self.enabled:
+            self.ambiguous += 1
+            return None
+
+        if len(paths) == 1:
+            self.single += 1
+            return paths[0]
+
+        for i in range(len(paths)):
+            if all(self._no_worse(request, i, j) for j in range(len(paths)) if j != i):
+                self.dominated += 1
+                return paths[i]
+
+        self.ambiguous += 1
+        return None
@@ -0,0 +1,143 @@
+import math
+from typing import Dict, List, Optional, Sequence, Set
+
+from src.common.decision_dispatcher import DecisionRequest
+from src.common.simulation_state import VehicleState
+
+
+class DecisionPrefetcher:
+    """
+    Route decisions started ahead of the decision point and held until the vehicle gets there.
+
+    A vehicle's decision starts once it is within ``distance`` metres of its
+    lane end, or ``horizon`` seconds at its allowed speed, whichever comes
+    first; ``math.inf`` starts it as soon as the vehicle enters the edge. The
+    candidates are computed and the model asked right away, so the model's
+    latency is hidden behind the vehicle's travel time. The chosen path is
+    applied as soon as it comes back if the vehicle is still on that edge and
+    the candidates' estimated times have not moved by more than ``tolerance``
+    (relative); a stale one is held until the decision point and checked
+    again there, and decided again if still stale. An answer that comes back
+    after the vehicle passed its decision point is applied right away.
+    """
+
+    def __init__(self, distance: float = 0.0, horizon: float = 0.0, tolerance: float = 0.25) -> None:
+        """
+        :param distance: Metres before the lane end at which decisions start; 0 to ignore.
+        :param horizon: Seconds before the lane end, at the vehicle's allowed speed; 0 to ignore.
+        :param tolerance: Relative change of a candidate's estimated time that makes a decision stale.
+        """
+        self.distance = distance
+        self.horizon = horizon
+        self.tolerance = tolerance
+
+        # Per vehicle with a decision started: its request, the edge it was made on, and its path once decided
+        self._requests: Dict[str, DecisionRequest] = {}
+        self._edges: Dict[str, str] = {}
+        self._paths: Dict[str, List[str]] = {}
+        # Vehicles past their decision point whose answer is still out
+        self._waiting: Set[str] = set()
+
+        self.started = 0
+        # Applied on the decision's edge, applied after the vehicle passed its decision point, and decided again
+        self.on_time = 0
+        self.late = 0
+        self.stale = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.distance > 0 or self.horizon > 0
+
+    def lead(self, vehicle: VehicleState) -> float:
+        """Distance to the lane end at which the vehicle's decision starts."""
+        if not self.horizon:
+            return self.distance
+        if math.isinf(self.horizon):
+            return math.inf
+        return max(self.distance, self.horizon * vehicle.allowed_speed)
+
+    def in_window(self, vehicle: VehicleState) -> bool:
+        return vehicle.lane_length - vehicle.lane_position <= self.lead(vehicle)
+
+    def __contains__(self, vehicle_id: str) -> bool:
+        return vehicle_id in self._requests
+
+    def start(self, request: DecisionRequest, edge: str) -> None:
+        self._requests[request.vehicle_id] = request
+        self._edges[request.vehicle_id] = edge
+        self.started += 1
+
+    def request(self, vehicle_id: str) -> DecisionRequest:
+        return self._requests[vehicle_id]
+
+    def edge(self, vehicle_id: str) -> str:
+        """The edge the vehicle's decision was started on, whose end is its decision point."""
+        return self._edges[vehicle_id]
+
+    def owns(self, request: DecisionRequest) -> bool:
+        return self._requests.get(request.vehicle_id) is request
+
+    def resolve(self, request: DecisionRequest, path: List[str]) -> Optional[List[str]]:
+        """
+        Note the path decided for a prefetched request.
+
+        :return: The path if the vehicle is already past its decision point and
+            it is to be applied now, else None and the path is held.
+        """
+        vehicle_id = request.vehicle_id
+        if vehicle_id in self._waiting:
+            self.late += 1
+            self.drop(vehicle_id)
+            return path
+        self._paths[vehicle_id] = path
+        return None
+
+    def take(
+        self, vehicle_id: str, current_edge: str, estimated_time_list: Optional[Sequence[float]] = None
+    ) -> Optional[List[str]]:
+        """
+        The path to apply, if it has been decided.
+
+        Called once the answer is in and fresh, or once the vehicle is at its
+        decision point or past it. Without an answer yet, the vehicle waits
+        and ``resolve`` hands the path out when it comes. A stale decision is dropped and None returned; the
+        vehicle is then no longer in the prefetcher. A path taken on the edge
+        the decision was started on is on time; one taken after the vehicle
+        left that edge is late.
+
+        :param current_edge: The edge the vehicle is on now.
+        :param estimated_time_list: Current estimated times of the request's
+            candidates, to check the decision is still fresh; not checked if omitted.
+        """
+        path = self._paths.get(vehicle_id)
+        if path is None:
+            self._waiting.add(vehicle_id)
+            return None
+
+        request = self._requests[vehicle_id]
+        on_edge = current_edge == self._edges[vehicle_id]
+        self.drop(vehicle_id)
+        if estimated_time_list is not None and self.is_stale(request, estimated_time_list):
+            self.stale += 1
+            return None
+        if on_edge:
+            self.on_time += 1
+        else:
+            self.late += 1
+        return path
+
+    def is_stale(self, request: DecisionRequest, estimated_time_list: Sequence[float]) -> bool:
+        for before, now in zip(request.estimated_time_list, estimated_time_list):
+            if abs(now - before) > self.tolerance * max(before, 1e-9):
+                return True
+        return False
+
+    def drop(self, vehicle_id: str) -> None:
+        self._requests.pop(vehicle_id, None)
+        self._edges.pop(vehicle_id, None)
+        self._paths.pop(vehicle_id, None)
+        self._waiting.discard(vehicle_id)
+
+    def is_waiting(self, vehicle_id: str) -> bool:
+        return vehicle_id in self._waiting
+
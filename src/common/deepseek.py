@@ -1,26 +1,128 @@
 import os
+import random
+import time
+from typing import Any, Dict, Optional
+
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+
+from src.common.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.common.decision_backend import DecisionBackend
+
+# Answers worth retrying: rate limiting and server-side errors.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Transport errors worth retrying; any other RequestException fails the request at once.
+RETRY_EXCEPTIONS = (
+    requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ContentDecodingError,
+)
 
-class DeepSeekApi:
-    def __init__(self):
+class DeepSeekApi(DecisionBackend):
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        pool_size: int = 16,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        tracking_file: Optional[str] = None
+    ):
+        """
+        :param connect_timeout: Seconds to wait for the connection to the endpoint.
+        :param read_timeout: Seconds to wait for the answer once connected.
+        :param max_retries: Retries after a timeout, connection error or 429/5xx answer.
+        :param backoff_base: Upper bound of the first retry delay; it doubles with every retry.
+        :param backoff_max: Cap on the retry delay.
+        :param pool_size: Connections kept open to the endpoint, one per concurrent request.
+        :param circuit_breaker: Breaker guarding the endpoint; a default one when None.
+        :param tracking_file: See ``DecisionBackend``.
+        """
         load_dotenv()
+        super().__init__(tracking_file)
         self.api_url = os.getenv("DEEPSEEK_API_URL")
         self.api_key = os.getenv("DEEPSEEK_API_KEY")
-        self.tracking_file = os.getenv("DEEPSEEK_TRACKING_FILE")
-
-    def tracking(self, prompt:str, response:requests.Response):
-        with open(self.tracking_file, "a") as f:
-            f.write(f"Prompt: \n{prompt}\n\n")
-            if response.status_code == 200:
-                response_content = response.json()["choices"][0]["message"]["content"]
-                f.write(f"Response: \n{response_content}\n\n")
-            else:
-                f.write(f"Error: {response.status_code} - {response.text}")
 
-            f.write("="*50 + "\n")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        # One pooled session keeps connections alive between requests.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def close(self):
+        super().close()
+        self.session.close()
+
+    def _backoff(self, attempt:int, response:Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        # Full jitter keeps concurrent requests from retrying in lockstep.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def post(self, body:dict) -> requests.Response:
+        """
+        Send a chat-completions body to the endpoint.
+
+        Timeouts, connection errors and 429/5xx answers are retried with jittered
+        exponential backoff. A request that still fails after its retries, or
+        fails any other way, counts against the circuit breaker; while the
+        breaker is open, CircuitOpenError is raised without contacting the endpoint.
 
-    def request(self, prompt:str) -> str:
+        :return: The last response, which may still be an error status.
+        """
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError(f"{self.api_url} keeps failing, not sending requests for now")
+
+        succeeded = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                response, error = None, None
+                try:
+                    response = self.session.post(
+                        self.api_url,
+                        json=body,
+                        timeout=(self.connect_timeout, self.read_timeout)
+                    )
+                except requests.RequestException as e:
+                    error = e
+                    if not isinstance(e, RETRY_EXCEPTIONS):
+                        break
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        succeeded = True
+                        return response
+
+                if attempt < self.max_retries:
+                    time.sleep(self._backoff(attempt, response))
+
+            if error is not None:
+                raise error
+            return response
+        finally:
+            # Every way out settles the breaker, so a half-open trial can never leave it half-open.
+            if succeeded:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+
+    def request(self, prompt:str, json_output:bool=False, context:Optional[Dict[str, Any]]=None) -> str:
         body = {
             "model": "deepseek-chat",
             "messages": [
@@ -30,21 +132,23 @@ class DeepSeekApi:
                 }
             ]
         }
+        if json_output:
+            # JSON mode: the answer is guaranteed to be a JSON object.
+            body["response_format"] = {"type": "json_object"}
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
-        response = requests.post(
-            self.api_url,
-            json=body,
-            headers=headers
-        )
-
-        self.tracking(prompt, response)
+        started = time.perf_counter()
+        try:
+            response = self.post(body)
+        except requests.RequestException as e:
+            self.tracking(prompt, time.perf_counter() - started, context, error=str(e))
+            raise
+        latency = time.perf_counter() - started
 
         if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            self.tracking(prompt, latency, context, response=content, usage=data.get("usage"))
+            return content
         else:
-            response.raise_for_status()
\ No newline at end of file
+            self.tracking(prompt, latency, context, error=f"{response.status_code} - {response.text}")
+            response.raise_for_status()
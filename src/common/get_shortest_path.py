@@ -1,31 +1,42 @@
-from networkx import DiGraph
-from networkx import shortest_path
+from typing import Optional
 
-def get_shortest_path(graph: DiGraph, start_edge: str, end_edge: str) -> list:
+from src.common.routing_graph import RoutingGraph
+from src.common.shortest_path_tree_cache import ShortestPathTreeCache
+
+def get_shortest_path(
+    graph: RoutingGraph,
+    start_edge: str,
+    end_edge: str,
+    tree_cache: Optional[ShortestPathTreeCache] = None
+) -> list:
     """
-    Get the shortest path between two edges in a directed graph.
+    Get the shortest drivable path between two edges in the routing graph.
+
+    The search runs on the edge-level graph, so consecutive edges of the
+    result are always joined by a connection in the net.
 
-    :param graph: DiGraph
+    :param graph: RoutingGraph
     :param start_edge: The starting edge ID.
     :param end_edge: The ending edge ID.
+    :param tree_cache: Reverse shortest-path trees over ``graph``; when given, the path
+        is read off the cached tree towards end_edge instead of running Dijkstra.
     :return: A list of edges representing the shortest path.
     """
     try:
-        start_node = None
-        end_node = None
+        if start_edge not in graph.edge_index or end_edge not in graph.edge_index:
+            raise ValueError(f"Start or end edge not found in graph! start_edge={start_edge}, end_edge={end_edge}")
 
-        for u, v, data in graph.edges(data=True):
-            if data.get('edge') == start_edge:
-                start_node = v
-            if data.get('edge') == end_edge:
-                end_node = u
+        source = graph.edge_index[start_edge][2]
+        target = graph.edge_index[end_edge][2]
+        if tree_cache is not None:
+            cost, edges = tree_cache.shortest_path(source, target)
+        else:
+            cost, edges = graph.edge_shortest_path(source, target)
 
-        if start_node is None or end_node is None:
-            raise ValueError(f"Start or end edge not found in graph! start_edge={start_edge}, end_edge={end_edge}")
+        if cost == float("inf"):
+            raise ValueError(f"No path between {start_edge} and {end_edge}")
 
-        nodes_path = shortest_path(graph, source=start_node, target=end_node, weight='weight')
-        edge_path = [start_edge] + [graph[u][v]['edge'] for u, v in zip(nodes_path[:-1], nodes_path[1:])] + [end_edge]
-        return edge_path
+        return [graph.edge_ids[e] for e in edges]
 
     except Exception as e:
         print(f"Error finding shortest path: {e}")
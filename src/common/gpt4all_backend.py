@@ -0,0 +1,93 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from src.common.decision_backend import DecisionBackend
+
+try:
+    from gpt4all import GPT4All
+except ImportError:
+    GPT4All = None
+
+
+class GPT4AllBackend(DecisionBackend):
+    """
+    Answers prompts with a local gpt4all model on the CPU, without any network.
+
+    The model is loaded once, on a dedicated worker thread, and every request
+    runs on that same thread. The loaded model is reused across requests
+    instead of being rebuilt per decision, and concurrent callers are served
+    one at a time, which is what a single model instance supports. Each
+    prompt gets a fresh chat session, so the context is not carried over
+    from one decision to the next. Sampling defaults to temperature 0, so
+    runs are reproducible.
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        model_path: Optional[str] = None,
+        device: str = "cpu",
+        n_threads: Optional[int] = None,
+        max_tokens: int = 512,
+        temperature: float = 0.0,
+        tracking_file: Optional[str] = None
+    ) -> None:
+        """
+        :param model_name: Model file name; defaults to GPT4ALL_MODEL.
+        :param model_path: Directory holding the model; defaults to GPT4ALL_MODEL_PATH. When set,
+            the model is never downloaded.
+        :param device: Device passed to gpt4all.
+        :param n_threads: CPU threads for inference; gpt4all's default when None.
+        :param max_tokens: Maximum length of an answer.
+        :param temperature: Sampling temperature.
+        :param tracking_file: See ``DecisionBackend``.
+        """
+        if GPT4All is None:
+            raise ImportError("The gpt4all backend needs the gpt4all package: pip install gpt4all")
+
+        super().__init__(tracking_file)
+        self.model_name = model_name or os.getenv("GPT4ALL_MODEL")
+        if not self.model_name:
+            raise ValueError("No gpt4all model given: pass model_name or set GPT4ALL_MODEL")
+        self.model_path = model_path or os.getenv("GPT4ALL_MODEL_PATH")
+        self.device = device
+        self.n_threads = n_threads
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gpt4all")
+        self._model = self._executor.submit(self._load).result()
+
+    def _load(self) -> "GPT4All":
+        return GPT4All(
+            self.model_name,
+            model_path=self.model_path,
+            allow_download=self.model_path is None,
+            device=self.device,
+            n_threads=self.n_threads,
+        )
+
+    def _generate(self, prompt: str) -> str:
+        # A chat session applies the model's prompt template; it is reset for
+        # every prompt so earlier decisions do not fill up the context.
+        with self._model.chat_session():
+            return self._model.generate(prompt, max_tokens=self.max_tokens, temp=self.temperature)
+
+    def request(self, prompt: str, json_output: bool = False, context: Optional[Dict[str, Any]] = None) -> str:
+        # gpt4all has no JSON mode; the batch prompt already asks for JSON only.
+        started = time.perf_counter()
+        try:
+            content = self._executor.submit(self._generate, prompt).result()
+        except Exception as e:
+            self.tracking(prompt, time.perf_counter() - started, context, error=str(e))
+            raise
+
+        self.tracking(prompt, time.perf_counter() - started, context, response=content)
+        return content
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._model.close()
+        super().close()
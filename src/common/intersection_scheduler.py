@@ -0,0 +1,96 @@
+import heapq
+import math
+from typing import List, Optional, Tuple
+
+from src.common.simulation_state import StepSnapshot, VehicleState
+
+# Distance to the end of the lane within which a vehicle decides its route
+APPROACH_THRESHOLD = 2.0
+
+
+def step_reach(vehicle: VehicleState, delta_t: float) -> float:
+    """The farthest the vehicle can drive in one step: at its current speed, or its allowed speed if higher."""
+    return max(vehicle.speed, vehicle.allowed_speed) * delta_t
+
+
+class IntersectionScheduler:
+    """
+    Wakes each vehicle only on the steps it may be approaching an intersection.
+
+    A vehicle never drives faster than its allowed speed, so from its
+    remaining lane length the scheduler knows the first step on which it can
+    be within ``threshold`` of the lane end, and lets it sleep until then.
+    Because that bound is reached no later than the vehicle leaves its lane,
+    a vehicle is also woken on its first step on every following lane and
+    edge. Vehicles wait in a heap keyed by wake-up time; each step only the
+    due ones are handed out, so the controllers' per-step work follows the
+    decisions to make rather than the fleet size. A due vehicle gets exactly
+    the checks it got when every vehicle was polled every step.
+    """
+
+    def __init__(self, threshold: float = APPROACH_THRESHOLD) -> None:
+        """
+        :param threshold: Distance to the lane end at which a vehicle counts as approaching.
+        """
+        self.threshold = threshold
+        # (wake-up time, sequence number, vehicle ID); the sequence keeps ties in scheduling order
+        self._heap: List[Tuple[float, int, str]] = []
+        self._sequence = 0
+
+        # Vehicles handed out by ``due``, and the steps they were handed out on
+        self.woken = 0
+        self.steps = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, vehicle_id: str, wake_time: float) -> None:
+        heapq.heappush(self._heap, (wake_time, self._sequence, vehicle_id))
+        self._sequence += 1
+
+    def due(self, snapshot: StepSnapshot) -> List[Tuple[str, VehicleState]]:
+        """
+        Schedule the vehicles that departed this step, then take every vehicle due now off the heap.
+
+        Vehicles no longer in the simulation are dropped. A due vehicle is not
+        woken again unless it is passed to ``reschedule``.
+        """
+        self.steps += 1
+        for vehicle_id in snapshot.departed:
+            self.add(vehicle_id, snapshot.time)
+
+        # Half a step of slack absorbs rounding in the accumulated simulation time
+        now = snapshot.time + snapshot.delta_t / 2
+        vehicles = snapshot.vehicles
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            vehicle_id = heapq.heappop(heap)[2]
+            vehicle = vehicles.get(vehicle_id)
+            if vehicle is not None:
+                due.append((vehicle_id, vehicle))
+        self.woken += len(due)
+        return due
+
+    def wake_time(self, vehicle: VehicleState, sim_time: float, delta_t: float, threshold: Optional[float] = None) -> float:
+        """
+        The first step after ``sim_time`` on which the vehicle may be within ``threshold`` of its lane end.
+
+        :param threshold: Distance to the lane end; the scheduler's own threshold if None.
+        """
+        if threshold is None:
+            threshold = self.threshold
+        distance = vehicle.lane_length - vehicle.lane_position - threshold
+        reach = step_reach(vehicle, delta_t)
+        if distance <= 0 or reach >= distance:
+            return sim_time + delta_t
+        if reach <= 0:
+            # Cannot move, e.g. a speed limit of zero; look again next step
+            return sim_time + delta_t
+        # The tolerance keeps an exact multiple of a step from being rounded up a whole step
+        return sim_time + math.ceil(distance / reach - 1e-9) * delta_t
+
+    def reschedule(
+        self, vehicle_id: str, vehicle: VehicleState, snapshot: StepSnapshot, threshold: Optional[float] = None
+    ) -> None:
+        self.add(vehicle_id, self.wake_time(vehicle, snapshot.time, snapshot.delta_t, threshold))
@@ -0,0 +1,169 @@
+import heapq
+from typing import List, Optional, Set, Tuple
+
+from src.common.routing_graph import RoutingGraph
+from src.common.shortest_path_tree_cache import ShortestPathTreeCache
+
+
+class KShortestPathsEngine:
+    """
+    Yen's k loopless shortest paths on the edge-level routing graph.
+
+    Spur searches never copy or modify the graph: the connections and edges
+    a spur path may not use are passed as masks. The reverse shortest-path
+    tree towards the target comes from a ShortestPathTreeCache and is reused by every
+    spur search, first as a ready-made answer (when the tree path behind the
+    best allowed turn avoids the masks) and otherwise as an exact A* heuristic.
+    """
+
+    def __init__(self, graph: RoutingGraph, tree_cache: Optional[ShortestPathTreeCache] = None) -> None:
+        self.graph = graph
+        self.tree_cache = tree_cache or ShortestPathTreeCache(graph)
+
+    def find(self, start_edge: str, end_edge: str, k: int) -> List[Tuple[float, List[str]]]:
+        """
+        Find up to k loopless paths from start_edge to end_edge, cheapest first.
+
+        :param start_edge: The starting edge ID.
+        :param end_edge: The ending edge ID.
+        :param k: The number of paths to find.
+        :return: A list of (cost, edge IDs) pairs. Empty when end_edge is unreachable.
+        """
+        graph = self.graph
+        if start_edge not in graph.edge_index or end_edge not in graph.edge_index:
+            raise ValueError(f"Start or end edge not found in graph! start_edge={start_edge}, end_edge={end_edge}")
+
+        source = graph.edge_index[start_edge][2]
+        target = graph.edge_index[end_edge][2]
+        dist, next_conn = self.tree_cache.get(target)
+
+        first = self._spur_path(source, target, set(), set(), dist, next_conn)
+        if first is None:
+            return []
+
+        # Each accepted path: (cost, edges, connections, prefix costs, deviation index)
+        accepted = [self._with_prefix(first[1], first[2], 0)]
+        candidates = []
+        seen = {tuple(first[1])}
+
+        while len(accepted) < k:
+            _, last_edges, last_conns, last_prefix, deviation = accepted[-1]
+
+            # Lawler: spur nodes before the deviation point were already expanded
+            for i in range(deviation, len(last_edges) - 1):
+                root = last_edges[:i + 1]
+
+                banned_connections = {
+                    conns[i] for _, edges, conns, _, _ in accepted
+                    if len(edges) > i + 1 and edges[:i + 1] == root
+                }
+                banned_edges = set(root[:-1])
+
+                spur = self._spur_path(root[-1], target, banned_connections, banned_edges, dist, next_conn)
+                if spur is None:
+                    continue
+
+                spur_cost, spur_edges, spur_conns = spur
+                edges = root[:-1] + spur_edges
+                key = tuple(edges)
+                if key in seen:
+                    continue
+                seen.add(key)
+                heapq.heappush(candidates, (last_prefix[i] + spur_cost, edges, last_conns[:i] + spur_conns, i))
+
+            if not candidates:
+                break
+
+            _, edges, conns, deviation = heapq.heappop(candidates)
+            accepted.append(self._with_prefix(edges, conns, deviation))
+
+        return [(cost, [graph.edge_ids[e] for e in edges]) for cost, edges, _, _, _ in accepted]
+
+    def _with_prefix(self, edges: List[int], conns: List[int], deviation: int):
+        edge_weight = self.graph._edge_weight
+        conn_penalty = self.graph._conn_penalty
+
+        prefix = [0.0]
+        for f, c in zip(edges[1:], conns):
+            prefix.append(prefix[-1] + edge_weight[f] + conn_penalty[c])
+        return prefix[-1], edges, conns, prefix, deviation
+
+    def _spur_path(
+        self,
+        spur: int,
+        target: int,
+        banned_connections: Set[int],
+        banned_edges: Set[int],
+        dist: List[float],
+        next_conn: List[int]
+    ) -> Optional[Tuple[float, List[int], List[int]]]:
+        """Cheapest path spur -> target avoiding the masks, as (cost, edges, connections)."""
+        inf = float("inf")
+        if dist[spur] == inf:
+            return None
+        if spur == target:
+            return 0.0, [spur], []
+
+        conn_indptr, conn_to, conn_penalty = self.graph._conn_indptr, self.graph._conn_to, self.graph._conn_penalty
+        edge_weight = self.graph._edge_weight
+
+        # Every banned connection leaves the spur edge, so past the first turn
+        # only the root edges are masked. Take the allowed first turn with the
+        # lowest bound (turn cost + tree distance); if the tree path behind it
+        # stays clear of the root, no other path can be cheaper.
+        best = None
+        for c in range(conn_indptr[spur], conn_indptr[spur + 1]):
+            f = conn_to[c]
+            if c in banned_connections or f in banned_edges or dist[f] == inf:
+                continue
+            bound = edge_weight[f] + conn_penalty[c] + dist[f]
+            if best is None or bound < best[0]:
+                best = (bound, c, f)
+        if best is None:
+            return None
+
+        bound, c, f = best
+        edges, conns = [spur, f], [c]
+        e = f
+        while e != target:
+            c = next_conn[e]
+            e = conn_to[c]
+            if e in banned_edges or e == spur:
+                break
+            edges.append(e)
+            conns.append(c)
+        else:
+            return bound, edges, conns
+
+        # Otherwise A* with the tree distances as an exact lower bound.
+        cost = {spur: 0.0}
+        via = {}
+        heap = [(dist[spur], 0.0, spur)]
+        while heap:
+            _, d, e = heapq.heappop(heap)
+            if e == target:
+                break
+            if d > cost[e]:
+                continue
+            for c in range(conn_indptr[e], conn_indptr[e + 1]):
+                if c in banned_connections:
+                    continue
+                f = conn_to[c]
+                if f in banned_edges or dist[f] == inf:
+                    continue
+                nd = d + edge_weight[f] + conn_penalty[c]
+                if nd < cost.get(f, inf):
+                    cost[f] = nd
+                    via[f] = c
+                    heapq.heappush(heap, (nd + dist[f], nd, f))
+        else:
+            return None
+
+        edges, conns = [target], []
+        while edges[-1] != spur:
+            c = via[edges[-1]]
+            conns.append(c)
+            edges.append(self.graph._conn_from[c])
+        edges.reverse()
+        conns.reverse()
+        return cost[target], edges, conns
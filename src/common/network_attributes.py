@@ -0,0 +1,139 @@
+from typing import Dict, List, Set
+
+import numpy as np
+
+from src.common.path_batch import PathBatch
+
+
+class NetworkAttributes:
+    """
+    Static per-network facts, read once from a sumolib net.
+
+    Lanes (internal junction lanes included) and edges are numbered and their
+    attributes held in arrays, with dictionaries mapping IDs to indices. Edge
+    numbering follows ``net.getEdges(withInternal=False)``, the same order as
+    RoutingGraph, so edge indices can be shared between the two. None of these
+    values change during a run, so nothing here ever goes back to TraCI.
+    """
+
+    def __init__(
+        self,
+        lane_ids: List[str],
+        lane_length,
+        lane_speed,
+        lane_edge,
+        edge_ids: List[str],
+        edge_length,
+        edge_speed,
+        tls_ids: List[str],
+        tls_junctions: Dict[str, Set[str]],
+        edge_ends_at_tls
+    ) -> None:
+        self.lane_ids = list(lane_ids)
+        self.lane_index: Dict[str, int] = {lane_id: i for i, lane_id in enumerate(self.lane_ids)}
+        self.lane_length = np.asarray(lane_length, dtype=np.float64)
+        self.lane_speed = np.asarray(lane_speed, dtype=np.float64)
+        # Index of the edge each lane belongs to; -1 for internal lanes.
+        self.lane_edge = np.asarray(lane_edge, dtype=np.int32)
+
+        self.edge_ids = list(edge_ids)
+        self.edge_index: Dict[str, int] = {edge_id: i for i, edge_id in enumerate(self.edge_ids)}
+        self.edge_length = np.asarray(edge_length, dtype=np.float64)
+        self.edge_speed = np.asarray(edge_speed, dtype=np.float64)
+
+        self.tls_ids = list(tls_ids)
+        # junction ID -> IDs of the traffic lights controlling it
+        self.tls_junctions = tls_junctions
+        # True for edges whose downstream junction is signalized
+        self.edge_ends_at_tls = np.asarray(edge_ends_at_tls, dtype=bool)
+
+        self._lane_length = self.lane_length.tolist()
+
+    @classmethod
+    def from_net(cls, net) -> "NetworkAttributes":
+        """Read the static attributes from a ``sumolib.net.Net`` (load it with ``withInternal=True``)."""
+        edges = net.getEdges(withInternal=False)
+        edge_index = {edge.getID(): i for i, edge in enumerate(edges)}
+
+        lanes = [lane for edge in net.getEdges() for lane in edge.getLanes()]
+
+        tls_junctions: Dict[str, Set[str]] = {}
+        edge_ends_at_tls = np.zeros(len(edges), dtype=bool)
+        for tls in net.getTrafficLights():
+            for in_lane, _, _ in tls.getConnections():
+                in_edge = in_lane.getEdge()
+                tls_junctions.setdefault(in_edge.getToNode().getID(), set()).add(tls.getID())
+                if in_edge.getID() in edge_index:
+                    edge_ends_at_tls[edge_index[in_edge.getID()]] = True
+
+        return cls(
+            lane_ids=[lane.getID() for lane in lanes],
+            lane_length=[lane.getLength() for lane in lanes],
+            lane_speed=[lane.getSpeed() for lane in lanes],
+            lane_edge=[edge_index.get(lane.getEdge().getID(), -1) for lane in lanes],
+            edge_ids=[edge.getID() for edge in edges],
+            edge_length=[edge.getLength() for edge in edges],
+            edge_speed=[edge.getSpeed() for edge in edges],
+            tls_ids=[tls.getID() for tls in net.getTrafficLights()],
+            tls_junctions=tls_junctions,
+            edge_ends_at_tls=edge_ends_at_tls,
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """The arrays needed to rebuild these attributes with ``from_arrays``."""
+        pairs = [(junction_id, tls_id) for junction_id, tls in self.tls_junctions.items() for tls_id in sorted(tls)]
+        return {
+            "lane_ids": np.asarray(self.lane_ids, dtype=str),
+            "lane_length": self.lane_length,
+            "lane_speed": self.lane_speed,
+            "lane_edge": self.lane_edge,
+            "edge_ids": np.asarray(self.edge_ids, dtype=str),
+            "edge_length": self.edge_length,
+            "edge_speed": self.edge_speed,
+            "tls_ids": np.asarray(self.tls_ids, dtype=str),
+            "tls_junction_ids": np.asarray([junction_id for junction_id, _ in pairs], dtype=str),
+            "tls_junction_tls": np.asarray([tls_id for _, tls_id in pairs], dtype=str),
+            "edge_ends_at_tls": self.edge_ends_at_tls,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "NetworkAttributes":
+        """Rebuild the attributes from ``to_arrays`` output, e.g. a loaded ``.npz`` file."""
+        tls_junctions: Dict[str, Set[str]] = {}
+        for junction_id, tls_id in zip(arrays["tls_junction_ids"].tolist(), arrays["tls_junction_tls"].tolist()):
+            tls_junctions.setdefault(junction_id, set()).add(tls_id)
+
+        return cls(
+            lane_ids=arrays["lane_ids"].tolist(),
+            lane_length=arrays["lane_length"],
+            lane_speed=arrays["lane_speed"],
+            lane_edge=arrays["lane_edge"],
+            edge_ids=arrays["edge_ids"].tolist(),
+            edge_length=arrays["edge_length"],
+            edge_speed=arrays["edge_speed"],
+            tls_ids=arrays["tls_ids"].tolist(),
+            tls_junctions=tls_junctions,
+            edge_ends_at_tls=arrays["edge_ends_at_tls"],
+        )
+
+    def get_lane_length(self, lane_id: str) -> float:
+        return self._lane_length[self.lane_index[lane_id]]
+
+    def get_lane_edge(self, lane_id: str) -> int:
+        return int(self.lane_edge[self.lane_index[lane_id]])
+
+    def is_tls_junction(self, junction_id: str) -> bool:
+        return junction_id in self.tls_junctions
+
+    def count_traffic_lights(self, paths: List[List[str]]) -> List[int]:
+        """
+        Number of signalized junctions each path drives through.
+
+        A path crosses the junction at the end of every edge except its last,
+        so the count is a lookup of ``edge_ends_at_tls`` over those edges,
+        done for all paths at once.
+
+        :param paths: Paths as lists of edge IDs.
+        :return: One traffic-light count per path.
+        """
+        return PathBatch(self, paths).traffic_lights().tolist()
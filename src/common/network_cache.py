@@ -0,0 +1,107 @@
+import hashlib
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import sumolib
+
+from src.common.network_attributes import NetworkAttributes
+from src.common.routing_graph import RoutingGraph
+
+# Bump when the layout of the cached arrays changes.
+CACHE_FORMAT_VERSION = 1
+
+
+def get_cache_path(net_file: str) -> str:
+    """The compiled cache lives next to the net file: net.xml -> net.xml.cache.npz."""
+    return f"{net_file}.cache.npz"
+
+
+def hash_net_file(net_file: str) -> str:
+    digest = hashlib.sha1()
+    with open(net_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_cache(cache_path: str, net_hash: str, vclass: str) -> Optional[Dict[str, np.ndarray]]:
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if (
+                int(data["format_version"]) != CACHE_FORMAT_VERSION
+                or str(data["net_hash"]) != net_hash
+                or str(data["vclass"]) != vclass
+            ):
+                return None
+            return {key: data[key] for key in data.files}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _with_prefix(arrays: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    return {f"{prefix}{key}": value for key, value in arrays.items()}
+
+
+def _strip_prefix(arrays: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    return {key[len(prefix):]: value for key, value in arrays.items() if key.startswith(prefix)}
+
+
+def _write_cache(cache_path: str, arrays: Dict[str, np.ndarray]) -> None:
+    # Write to a temporary file first so parallel runs never read a half-written cache.
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Could not write network cache {cache_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_network(
+    net_file: str,
+    turn_penalties: Optional[Dict[str, float]] = None,
+    vclass: str = "passenger",
+    use_cache: bool = True
+) -> Tuple[RoutingGraph, NetworkAttributes]:
+    """
+    Load the routing graph and static attributes of a network.
+
+    The first load parses net.xml with sumolib and writes the compiled arrays
+    (edges, connections, lanes, traffic lights) to ``get_cache_path(net_file)``.
+    Later loads read that file instead, as long as the net file's hash still
+    matches. Turn penalties are applied after loading, so one cache serves any
+    penalty setting.
+
+    :param net_file: Path to the SUMO net.xml.
+    :param turn_penalties: See ``RoutingGraph.from_net``.
+    :param vclass: Vehicle class the connections are filtered for.
+    :param use_cache: Set to False to always parse the XML and leave the cache alone.
+    :return: (RoutingGraph, NetworkAttributes)
+    """
+    cache_path = get_cache_path(net_file)
+    net_hash = hash_net_file(net_file) if use_cache else ""
+
+    arrays = _read_cache(cache_path, net_hash, vclass) if use_cache else None
+    if arrays is not None:
+        graph = RoutingGraph.from_arrays(_strip_prefix(arrays, "graph_"), turn_penalties)
+        network = NetworkAttributes.from_arrays(_strip_prefix(arrays, "net_"))
+        return graph, network
+
+    net = sumolib.net.readNet(net_file, withInternal=True)
+    graph = RoutingGraph.from_net(net, turn_penalties=turn_penalties, vclass=vclass)
+    network = NetworkAttributes.from_net(net)
+
+    if use_cache:
+        arrays = {
+            "format_version": np.asarray(CACHE_FORMAT_VERSION),
+            "net_hash": np.asarray(net_hash),
+            "vclass": np.asarray(vclass),
+        }
+        arrays.update(_with_prefix(graph.to_arrays(), "graph_"))
+        arrays.update(_with_prefix(network.to_arrays(), "net_"))
+        _write_cache(cache_path, arrays)
+
+    return graph, network
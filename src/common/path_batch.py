@@ -0,0 +1,52 @@
+from typing import List
+
+import numpy as np
+
+
+class PathBatch:
+    """
+    Many paths flattened into one array of edge indices, for batched metrics.
+
+    Per-path sums of any per-edge quantity become one gather and one
+    ``np.bincount`` over all paths at once, instead of a Python loop per
+    edge per path. Build one batch from the candidates of every vehicle
+    deciding in a step: the results hold one value per path, in the order
+    the paths were given, so each vehicle's share is the next slice as long
+    as its number of candidates.
+    """
+
+    def __init__(self, network, paths: List[List[str]]) -> None:
+        """
+        :param network: ``NetworkAttributes`` providing ``edge_index`` and ``edge_ends_at_tls``.
+        :param paths: Paths as lists of edge IDs.
+        """
+        self.network = network
+        self.size = len(paths)
+        self.lengths = np.fromiter((len(path) for path in paths), dtype=np.int64, count=self.size)
+        self.edges = np.fromiter(
+            (network.edge_index[edge_id] for path in paths for edge_id in path),
+            dtype=np.int32,
+            count=int(self.lengths.sum())
+        )
+        # Path each flattened edge belongs to
+        self.owners = np.repeat(np.arange(self.size), self.lengths)
+
+    def total(self, values: np.ndarray) -> np.ndarray:
+        """Per-path sum of a per-edge array indexed like ``network.edge_ids``."""
+        return np.bincount(self.owners, weights=values[self.edges], minlength=self.size)
+
+    def mean(self, values: np.ndarray) -> np.ndarray:
+        """Per-path mean of a per-edge array; 0 for empty paths."""
+        totals = self.total(values)
+        return np.divide(totals, self.lengths, out=np.zeros_like(totals), where=self.lengths > 0)
+
+    def traffic_lights(self) -> np.ndarray:
+        """Signalized junctions crossed per path: the ends of all edges but the last."""
+        crossing = np.ones(len(self.edges), dtype=bool)
+        crossing[np.cumsum(self.lengths)[self.lengths > 0] - 1] = False
+        counts = np.bincount(
+            self.owners[crossing],
+            weights=self.network.edge_ends_at_tls[self.edges[crossing]],
+            minlength=self.size
+        )
+        return counts.astype(int)
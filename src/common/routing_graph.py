@@ -0,0 +1,259 @@
+import heapq
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class RoutingGraph:
+    """
+    Routing graph built once from a sumolib net.
+
+    Junctions are numbered 0..N-1 and edges 0..M-1. Routing runs on the
+    edge-level (line) graph taken from the net's ``<connection>`` elements,
+    so parallel edges between the same two junctions are all kept. The edges
+    a vehicle may turn into from edge ``e`` are
+    ``conn_to[conn_indptr[e]:conn_indptr[e + 1]]``, and moving along
+    connection ``c`` costs the weight of the next edge plus ``conn_penalty[c]``.
+    Paths found on this graph can always be driven, so ``setRoute`` accepts them.
+    """
+
+    def __init__(
+        self,
+        node_ids: List[str],
+        edge_ids: List[str],
+        edge_from,
+        edge_to,
+        edge_length,
+        turn_from=(),
+        turn_to=(),
+        turn_direction=(),
+        turn_penalties: Optional[Dict[str, float]] = None
+    ) -> None:
+        self.node_ids = list(node_ids)
+        self.node_index: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.node_ids)}
+
+        self.edge_ids = list(edge_ids)
+        self.edge_from = np.asarray(edge_from, dtype=np.int32)
+        self.edge_to = np.asarray(edge_to, dtype=np.int32)
+        self.edge_length = np.asarray(edge_length, dtype=np.float64)
+
+        # edge_id -> (from node index, to node index, edge index)
+        self.edge_index: Dict[str, Tuple[int, int, int]] = {
+            edge_id: (int(u), int(v), i)
+            for i, (edge_id, u, v) in enumerate(zip(self.edge_ids, self.edge_from, self.edge_to))
+        }
+
+        # Distinct (from edge, to edge, direction) turns as read from the net.
+        self.turn_from = np.asarray(turn_from, dtype=np.int32)
+        self.turn_to = np.asarray(turn_to, dtype=np.int32)
+        self.turn_direction = np.asarray(turn_direction, dtype="<U1")
+        self.turn_penalties = dict(turn_penalties or {})
+
+        # One connection per pair of edges, at the cheapest of its turn penalties.
+        connections: Dict[Tuple[int, int], float] = {}
+        for u, v, direction in zip(self.turn_from.tolist(), self.turn_to.tolist(), self.turn_direction.tolist()):
+            penalty = self.turn_penalties.get(direction, 0.0)
+            connections[(u, v)] = min(penalty, connections.get((u, v), penalty))
+
+        conn_from = np.fromiter((u for u, _ in connections), dtype=np.int32, count=len(connections))
+        order = np.argsort(conn_from, kind="stable")
+        self.conn_from = conn_from[order]
+        self.conn_to = np.fromiter((v for _, v in connections), dtype=np.int32, count=len(connections))[order]
+        self.conn_penalty = np.fromiter(connections.values(), dtype=np.float64, count=len(connections))[order]
+        counts = np.bincount(self.conn_from, minlength=len(self.edge_ids))
+        self.conn_indptr = np.zeros(len(self.edge_ids) + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.conn_indptr[1:])
+
+        # Reverse adjacency: connections entering edge ``f`` are
+        # ``rconn[rconn_indptr[f]:rconn_indptr[f + 1]]`` (indices into conn_*).
+        counts = np.bincount(self.conn_to, minlength=len(self.edge_ids))
+        self.rconn_indptr = np.zeros(len(self.edge_ids) + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.rconn_indptr[1:])
+        self.rconn = np.argsort(self.conn_to, kind="stable").astype(np.int32)
+
+        # Plain list mirrors for the search loops; indexing numpy scalars
+        # one at a time is much slower than indexing Python lists.
+        self._conn_indptr = self.conn_indptr.tolist()
+        self._conn_from = self.conn_from.tolist()
+        self._conn_to = self.conn_to.tolist()
+        self._conn_penalty = self.conn_penalty.tolist()
+
+        # Routing cost of each edge; starts out as its length. See set_edge_weights.
+        self.edge_weight = self.edge_length.copy()
+        self.weight_version = 0
+        self._edge_weight = self.edge_weight.tolist()
+        self._build_reverse_arcs()
+
+    def _build_reverse_arcs(self) -> None:
+        # Reverse arcs per edge as (previous edge, arc cost, connection) tuples.
+        self._reverse_arcs = [
+            [(self._conn_from[c], self._edge_weight[f] + self._conn_penalty[c], c) for c in self.rconn[start:end].tolist()]
+            for f, (start, end) in enumerate(zip(self.rconn_indptr[:-1].tolist(), self.rconn_indptr[1:].tolist()))
+        ]
+
+    @classmethod
+    def from_net(
+        cls,
+        net,
+        turn_penalties: Optional[Dict[str, float]] = None,
+        vclass: Optional[str] = "passenger"
+    ) -> "RoutingGraph":
+        """
+        Build the routing graph from a ``sumolib.net.Net``.
+
+        :param net: The sumolib network.
+        :param turn_penalties: Extra cost per connection direction ("s", "r", "l", "t", "R", "L"),
+            in meters, e.g. ``{"l": 10.0, "t": 50.0}``.
+        :param vclass: Only keep connections whose lanes allow this vehicle class. None keeps all.
+        """
+        node_ids = [node.getID() for node in net.getNodes()]
+        node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+
+        edges = net.getEdges(withInternal=False)
+        edge_index = {edge.getID(): i for i, edge in enumerate(edges)}
+
+        turns = set()
+        for edge in edges:
+            for to_edge, lane_connections in edge.getOutgoing().items():
+                if to_edge.getID() not in edge_index:
+                    continue
+                for connection in lane_connections:
+                    if vclass and not (connection.getFromLane().allows(vclass) and connection.getToLane().allows(vclass)):
+                        continue
+                    turns.add((edge_index[edge.getID()], edge_index[to_edge.getID()], connection.getDirection()))
+        turns = sorted(turns)
+
+        return cls(
+            node_ids=node_ids,
+            edge_ids=[edge.getID() for edge in edges],
+            edge_from=[node_index[edge.getFromNode().getID()] for edge in edges],
+            edge_to=[node_index[edge.getToNode().getID()] for edge in edges],
+            edge_length=[edge.getLength() for edge in edges],
+            turn_from=[u for u, _, _ in turns],
+            turn_to=[v for _, v, _ in turns],
+            turn_direction=[direction for _, _, direction in turns],
+            turn_penalties=turn_penalties,
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """The arrays needed to rebuild this graph with ``from_arrays``."""
+        return {
+            "node_ids": np.asarray(self.node_ids, dtype=str),
+            "edge_ids": np.asarray(self.edge_ids, dtype=str),
+            "edge_from": self.edge_from,
+            "edge_to": self.edge_to,
+            "edge_length": self.edge_length,
+            "turn_from": self.turn_from,
+            "turn_to": self.turn_to,
+            "turn_direction": self.turn_direction,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, turn_penalties: Optional[Dict[str, float]] = None) -> "RoutingGraph":
+        """Rebuild a graph from ``to_arrays`` output, e.g. a loaded ``.npz`` file."""
+        return cls(
+            node_ids=arrays["node_ids"].tolist(),
+            edge_ids=arrays["edge_ids"].tolist(),
+            edge_from=arrays["edge_from"],
+            edge_to=arrays["edge_to"],
+            edge_length=arrays["edge_length"],
+            turn_from=arrays["turn_from"],
+            turn_to=arrays["turn_to"],
+            turn_direction=arrays["turn_direction"],
+            turn_penalties=turn_penalties,
+        )
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_ids)
+
+    def set_edge_weights(self, weights) -> None:
+        """
+        Replace the routing cost of every edge, e.g. with current travel times.
+
+        Bumps ``weight_version`` so caches built on the old weights are dropped.
+
+        :param weights: One non-negative cost per edge, in edge index order.
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != self.edge_length.shape:
+            raise ValueError(f"Expected {self.edge_count} edge weights, got {weights.shape[0]}")
+
+        self.edge_weight = weights.copy()
+        self._edge_weight = self.edge_weight.tolist()
+        self._build_reverse_arcs()
+        self.weight_version += 1
+
+    def edge_shortest_path(
+        self,
+        source: int,
+        target: int,
+        banned_connections: Optional[Set[int]] = None
+    ) -> Tuple[float, List[int]]:
+        """
+        Dijkstra on the edge-level graph, following only real connections.
+
+        :param source: Index of the start edge.
+        :param target: Index of the end edge.
+        :param banned_connections: Connection indices the search may not use.
+        :return: (cost, edge indices from source to target inclusive). Cost is ``inf``
+            and the list empty when unreachable.
+        """
+        conn_indptr, conn_to, conn_penalty = self._conn_indptr, self._conn_to, self._conn_penalty
+        edge_weight = self._edge_weight
+
+        dist = {source: 0.0}
+        prev = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, e = heapq.heappop(heap)
+            if e == target:
+                break
+            if d > dist[e]:
+                continue
+            for c in range(conn_indptr[e], conn_indptr[e + 1]):
+                if banned_connections and c in banned_connections:
+                    continue
+                f = conn_to[c]
+                nd = d + edge_weight[f] + conn_penalty[c]
+                if nd < dist.get(f, float("inf")):
+                    dist[f] = nd
+                    prev[f] = e
+                    heapq.heappush(heap, (nd, f))
+
+        if target not in dist:
+            return float("inf"), []
+
+        path = [target]
+        while path[-1] != source:
+            path.append(prev[path[-1]])
+        path.reverse()
+        return dist[target], path
+
+    def reverse_shortest_path_tree(self, target: int) -> Tuple[List[float], List[int]]:
+        """
+        Shortest-path tree of the edge-level graph towards one target edge.
+
+        :param target: Index of the target edge.
+        :return: (dist, next_conn). ``dist[e]`` is the cost from edge ``e`` to the
+            target (``inf`` if unreachable) and ``next_conn[e]`` the connection to
+            take out of ``e`` on that path (-1 at the target and for unreachable edges).
+        """
+        reverse_arcs = self._reverse_arcs
+
+        inf = float("inf")
+        dist = [inf] * len(self.edge_ids)
+        next_conn = [-1] * len(self.edge_ids)
+        dist[target] = 0.0
+        heap = [(0.0, target)]
+        while heap:
+            d, f = heapq.heappop(heap)
+            if d > dist[f]:
+                continue
+            for e, w, c in reverse_arcs[f]:
+                nd = d + w
+                if nd < dist[e]:
+                    dist[e] = nd
+                    next_conn[e] = c
+                    heapq.heappush(heap, (nd, e))
+        return dist, next_conn
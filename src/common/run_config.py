@@ -0,0 +1,150 @@
+import argparse
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.common.sim_backend import SIM_BACKENDS, load_sim_backend
+from src.common.sim_trace import TraceRecorder, TraceReplay
+from src.common.step_profiler import PROFILERS
+
+# SUMO only remembers the last 100 s of a vehicle's waiting by default. With a
+# memory longer than any run the accumulated waiting time is the total of the
+# trip, as in tripinfo (see ``TripMetrics``).
+WAITING_TIME_MEMORY = 1_000_000
+
+
+@dataclass
+class RunConfig:
+    """
+    How a simulation is run.
+
+    By default SUMO runs headless and as fast as possible; ``gui`` and
+    ``step_delay`` are only meant for watching a run.
+    """
+    gui: bool = False
+    # Seconds to sleep after every step.
+    step_delay: float = 0.0
+    # Minimum wall-clock seconds between two progress lines; 0 disables them.
+    progress_interval: float = 10.0
+    # Override the step length / end time from the .sumocfg.
+    step_length: Optional[float] = None
+    end_time: Optional[float] = None
+    # Where to write the per-step phase timings; None disables the step profiler.
+    profile_output: Optional[str] = None
+    # "cprofile" or "pyinstrument" to also profile the whole run.
+    profiler: Optional[str] = None
+    # SUMO's random seed; the .sumocfg's (or SUMO's default) when None.
+    seed: Optional[int] = None
+    # TraCI connection label. SUMO always gets a free port, so runs in
+    # separate processes never collide on the port pinned in the .sumocfg.
+    label: str = "default"
+    # Directory SUMO writes the .sumocfg's outputs (tripinfo, netstate, ...)
+    # to, instead of next to the .sumocfg.
+    output_dir: Optional[str] = None
+    # "traci" (SUMO over a socket) or "libsumo" (SUMO in-process).
+    sim_backend: str = "traci"
+    # Record what the controller observes to this .npz trace.
+    record_trace: Optional[str] = None
+    # Replay a recorded trace instead of running SUMO.
+    replay_trace: Optional[str] = None
+
+    def load_sim(self):
+        """What this run drives SUMO through: traci, libsumo, or a trace recorder or replay standing in for them."""
+        if self.replay_trace:
+            return TraceReplay(self.replay_trace)
+        sim = load_sim_backend(self.sim_backend, gui=self.gui)
+        if self.record_trace:
+            return TraceRecorder(sim, self.record_trace)
+        return sim
+
+    @property
+    def sumo_binary(self) -> str:
+        return "sumo-gui" if self.gui else "sumo"
+
+    def sumo_cmd(self, net_file: str, rou_file: str, cfg_file: str) -> List[str]:
+        cmd = [self.sumo_binary, "-n", net_file, "-r", rou_file, "-c", cfg_file,
+               "--waiting-time-memory", str(WAITING_TIME_MEMORY)]
+        if self.step_length is not None:
+            cmd += ["--step-length", str(self.step_length)]
+        if self.end_time is not None:
+            cmd += ["--end", str(self.end_time)]
+        if self.seed is not None:
+            cmd += ["--seed", str(self.seed)]
+        if self.sim_backend == "libsumo":
+            # In-process SUMO must not open the TraCI server the .sumocfg asks
+            # for and wait there for a client. traci.start passes its own port.
+            cmd += ["--remote-port", "0"]
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            # SUMO puts the prefix in front of output paths relative to the .sumocfg.
+            prefix = os.path.relpath(self.output_dir, os.path.dirname(os.path.abspath(cfg_file)))
+            cmd += ["--output-prefix", prefix + os.sep]
+        return cmd
+
+    def reached_end(self, sim_time: float) -> bool:
+        # SUMO keeps stepping past --end while a TraCI client drives it, so the
+        # controllers check the end time themselves.
+        return self.end_time is not None and sim_time >= self.end_time
+
+    def wait_step(self) -> None:
+        if self.step_delay > 0:
+            time.sleep(self.step_delay)
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("--gui", action="store_true", help="Run sumo-gui instead of headless sumo.")
+        parser.add_argument("--step-delay", type=float, default=0.0, help="Seconds to sleep after every step.")
+        parser.add_argument("--progress-interval", type=float, default=10.0,
+                            help="Seconds between progress lines (0 disables them).")
+        parser.add_argument("--step-length", type=float, default=None, help="Override the simulation step length.")
+        parser.add_argument("--end", dest="end_time", type=float, default=None, help="Override the simulation end time.")
+        parser.add_argument("--profile-output", default=None,
+                            help="Time every phase of each step and write the timings next to this path.")
+        parser.add_argument("--profiler", choices=PROFILERS, default=None,
+                            help="Also profile the whole run; needs --profile-output.")
+        parser.add_argument("--seed", type=int, default=None, help="SUMO's random seed.")
+        parser.add_argument("--sim-backend", choices=SIM_BACKENDS, default="traci",
+                            help="Drive SUMO over a TraCI socket or in-process through libsumo.")
+        parser.add_argument("--record-trace", default=None,
+                            help="Record the per-step vehicle and edge state the controller sees to this .npz file.")
+        parser.add_argument("--replay-trace", default=None,
+                            help="Replay a recorded trace instead of running SUMO, e.g. to benchmark the controller.")
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "RunConfig":
+        return cls(
+            gui=args.gui,
+            step_delay=args.step_delay,
+            progress_interval=args.progress_interval,
+            step_length=args.step_length,
+            end_time=args.end_time,
+            profile_output=args.profile_output,
+            profiler=args.profiler,
+            seed=args.seed,
+            sim_backend=args.sim_backend,
+            record_trace=args.record_trace,
+            replay_trace=args.replay_trace,
+        )
+
+
+class ProgressReporter:
+    """Prints a progress line at most once every ``interval`` wall-clock seconds."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._started = time.perf_counter()
+        self._last = self._started
+
+    def report(self, step: int, sim_time: float, vehicle_count: int) -> None:
+        if self.interval <= 0:
+            return
+
+        now = time.perf_counter()
+        if now - self._last < self.interval:
+            return
+        self._last = now
+
+        elapsed = now - self._started
+        print(f"Step {step} | sim time {sim_time:.1f} s | {vehicle_count} vehicles | "
+              f"{step / elapsed:.1f} steps/s")
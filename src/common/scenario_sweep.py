@@ -0,0 +1,248 @@
+import glob
+import importlib
+import inspect
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.common.run_config import RunConfig
+from src.common.save_to_csv import save_to_csv
+
+# Controller name -> module holding its VehicleController
+CONTROLLERS = {
+    "shortest_path": "src.shortest_path.VehicleController",
+    "LLM": "src.LLM.VehicleController",
+}
+
+SUMMARY_FIELDS = [
+    "dataset", "controller", "seed", "params", "status", "error", "wall_time", "vehicles",
+    "total_travel_time", "total_waiting_time", "total_time_loss", "output_dir",
+]
+
+
+class Scenario(NamedTuple):
+    name: str
+    net_file: str
+    rou_file: str
+    cfg_file: str
+
+
+class SweepRun(NamedTuple):
+    """One simulation of the sweep: a scenario, a controller, a seed and controller parameters."""
+    scenario: Scenario
+    controller: str
+    seed: Optional[int]
+    params: Tuple[Tuple[str, Any], ...]
+    output_dir: str
+
+
+def _config_file_value(cfg_file: str, option: str) -> Optional[str]:
+    element = ET.parse(cfg_file).getroot().find(f".//{option}")
+    return element.get("value") if element is not None else None
+
+
+def _input_file(directory: str, default: str, cfg_file: str, option: str) -> Optional[str]:
+    """``default`` if the dataset has it, else the file the .sumocfg names, if it exists."""
+    path = os.path.join(directory, default)
+    if os.path.exists(path):
+        return path
+
+    value = _config_file_value(cfg_file, option)
+    if value:
+        # The .sumocfg may list several route files; the controllers take the first.
+        path = os.path.join(directory, value.split(",")[0].strip())
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def find_scenario(directory: str) -> Optional[Scenario]:
+    """
+    The network, route and config files of a dataset directory.
+
+    ``net.xml`` and ``routes.xml`` are used when present, else the files the
+    .sumocfg names. None if the directory lacks a .sumocfg or either file.
+    """
+    cfg_files = sorted(glob.glob(os.path.join(directory, "*.sumocfg")))
+    if not cfg_files:
+        return None
+
+    cfg_file = cfg_files[0]
+    net_file = _input_file(directory, "net.xml", cfg_file, "net-file")
+    rou_file = _input_file(directory, "routes.xml", cfg_file, "route-files")
+    if net_file is None or rou_file is None:
+        return None
+    return Scenario(os.path.basename(os.path.normpath(directory)), net_file, rou_file, cfg_file)
+
+
+def find_scenarios(dataset_dir: str = "./dataset") -> Tuple[List[Scenario], List[str]]:
+    """Every runnable scenario under ``dataset_dir``, and the directories that are not runnable."""
+    scenarios, skipped = [], []
+    for directory in sorted(glob.glob(os.path.join(dataset_dir, "*", ""))):
+        scenario = find_scenario(directory)
+        if scenario is None:
+            skipped.append(directory)
+        else:
+            scenarios.append(scenario)
+    return scenarios, skipped
+
+
+def _controller_class(controller: str):
+    return importlib.import_module(CONTROLLERS[controller]).VehicleController
+
+
+def _run_name(seed: Optional[int], params: Tuple[Tuple[str, Any], ...]) -> str:
+    parts = [f"seed{seed}" if seed is not None else "default-seed"]
+    parts += [f"{name}-{value}" for name, value in params]
+    return "_".join(parts)
+
+
+def build_matrix(
+    scenarios: Sequence[Scenario],
+    controllers: Sequence[str],
+    seeds: Sequence[Optional[int]],
+    param_grid: Dict[str, Sequence[Any]],
+    results_dir: str
+) -> List[SweepRun]:
+    """
+    Every combination of scenario, controller, seed and parameter values.
+
+    A controller only gets the parameters its constructor takes, so e.g. the
+    batch sizes of the LLM controller do not multiply the shortest-path runs.
+    """
+    runs = []
+    for controller in controllers:
+        accepted = inspect.signature(_controller_class(controller).__init__).parameters
+        grid = {name: values for name, values in param_grid.items() if name in accepted}
+        combinations = [tuple(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+        for scenario, seed, params in itertools.product(scenarios, seeds, combinations):
+            output_dir = os.path.join(
+                results_dir, scenario.name.replace(" ", "_"), controller, _run_name(seed, params)
+            )
+            runs.append(SweepRun(scenario, controller, seed, params, output_dir))
+    return runs
+
+
+class _RedirectOutput:
+    """Sends everything written to stdout and stderr, SUMO's output included, to a file."""
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+
+    def __enter__(self) -> None:
+        self._file = open(self.file_path, "w", encoding="utf-8")
+        self._saved = [os.dup(1), os.dup(2)]
+        for fd in (1, 2):
+            os.dup2(self._file.fileno(), fd)
+
+    def __exit__(self, *exc) -> None:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, saved in zip((1, 2), self._saved):
+            os.dup2(saved, fd)
+            os.close(saved)
+        self._file.close()
+
+
+def run_one(run: SweepRun, run_config: Optional[RunConfig] = None) -> Dict[str, Any]:
+    """
+    Run one simulation of the sweep and return its summary row.
+
+    Meant to run in its own worker process: SUMO gets a free port and the
+    run's label, writes its outputs to the run's directory, and all output of
+    the run goes to ``run.log`` there. A failing run is reported, not raised.
+    """
+    os.makedirs(run.output_dir, exist_ok=True)
+    base = run_config or RunConfig(progress_interval=0)
+    config = RunConfig(**{
+        **vars(base),
+        "seed": run.seed,
+        "label": os.path.relpath(run.output_dir),
+        "output_dir": run.output_dir,
+        "profile_output": os.path.join(run.output_dir, "run.csv") if base.profile_output else None,
+    })
+    record = {
+        "dataset": run.scenario.name,
+        "controller": run.controller,
+        "seed": run.seed,
+        "params": json.dumps(dict(run.params)),
+        "status": "ok",
+        "error": "",
+        "output_dir": run.output_dir,
+    }
+
+    started = time.perf_counter()
+    with _RedirectOutput(os.path.join(run.output_dir, "run.log")):
+        controller = None
+        try:
+            controller = _controller_class(run.controller)(
+                run.scenario.net_file, run.scenario.rou_file, run.scenario.cfg_file,
+                run_config=config, **dict(run.params)
+            )
+            controller.run_simulation()
+            controller._save_results(os.path.join(run.output_dir, "results.csv"))
+            record.update(controller.metrics.totals())
+            record["vehicles"] = controller.metrics.size
+        except Exception as e:
+            traceback.print_exc()
+            record["status"] = "failed"
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            if controller is not None:
+                try:
+                    controller.finish_simulation()
+                except Exception:
+                    traceback.print_exc()
+    record["wall_time"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_sweep(
+    runs: Sequence[SweepRun],
+    workers: Optional[int] = None,
+    run_config: Optional[RunConfig] = None,
+    summary_file: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run the sweep on a process pool and return one summary row per run.
+
+    Every run gets a fresh worker process, so TraCI's module-level connection
+    state and the controllers' caches never leak from one run into the next.
+
+    :param workers: Processes running at once; one per CPU when None.
+    :param run_config: Settings shared by all runs; seed, label and output directory are set per run.
+    :param summary_file: CSV the summary rows are written to, if given.
+    """
+    workers = workers or os.cpu_count() or 1
+    records = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, max_tasks_per_child=1) as executor:
+        futures = {executor.submit(run_one, run, run_config): run for run in runs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                record = future.result()
+            except Exception as e:
+                # The worker process itself died, e.g. killed or out of memory.
+                run = futures[future]
+                record = {
+                    "dataset": run.scenario.name, "controller": run.controller, "seed": run.seed,
+                    "params": json.dumps(dict(run.params)), "status": "failed",
+                    "error": f"{type(e).__name__}: {e}", "wall_time": 0.0, "output_dir": run.output_dir,
+                }
+            records.append(record)
+            print(f"[{done}/{len(runs)}] {record['dataset']} / {record['controller']} / {record['params']} "
+                  f"seed {record['seed']}: {record['status']} in {record['wall_time']:.1f} s"
+                  + (f" ({record['error']})" if record["error"] else ""))
+
+    if summary_file:
+        os.makedirs(os.path.dirname(summary_file) or ".", exist_ok=True)
+        save_to_csv(summary_file, fieldnames=SUMMARY_FIELDS, records=records)
+    return records
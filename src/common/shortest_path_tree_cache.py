@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from typing import List, Tuple
+
+from src.common.routing_graph import RoutingGraph
+
+
+class ShortestPathTreeCache:
+    """
+    LRU cache of reverse shortest-path trees, keyed by (target edge, weight version).
+
+    Many vehicles head for the same few edges. Once the tree towards a target
+    is built, the shortest path and remaining cost from any edge to that target
+    are read off it in O(path length) instead of running Dijkstra again.
+    Trees built on older edge weights are dropped as soon as the graph's
+    ``weight_version`` changes.
+    """
+
+    def __init__(self, graph: RoutingGraph, max_size: int = 256) -> None:
+        self.graph = graph
+        self.max_size = max_size
+        self._trees: "OrderedDict[Tuple[int, int], Tuple[List[float], List[int]]]" = OrderedDict()
+        self._version = graph.weight_version
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._trees)
+
+    def clear(self) -> None:
+        self._trees.clear()
+
+    def get(self, target: int) -> Tuple[List[float], List[int]]:
+        """
+        Reverse shortest-path tree towards a target edge, as returned by
+        ``RoutingGraph.reverse_shortest_path_tree``.
+
+        :param target: Index of the target edge.
+        """
+        version = self.graph.weight_version
+        if version != self._version:
+            self._trees.clear()
+            self._version = version
+
+        key = (target, version)
+        tree = self._trees.get(key)
+        if tree is not None:
+            self.hits += 1
+            self._trees.move_to_end(key)
+            return tree
+
+        self.misses += 1
+        tree = self.graph.reverse_shortest_path_tree(target)
+        self._trees[key] = tree
+        if len(self._trees) > self.max_size:
+            self._trees.popitem(last=False)
+        return tree
+
+    def shortest_path(self, source: int, target: int) -> Tuple[float, List[int]]:
+        """
+        Shortest path between two edges read off the cached tree.
+
+        :param source: Index of the start edge.
+        :param target: Index of the end edge.
+        :return: (cost, edge indices from source to target inclusive). Cost is ``inf``
+            and the list empty when unreachable.
+        """
+        dist, next_conn = self.get(target)
+        if dist[source] == float("inf"):
+            return float("inf"), []
+
+        conn_to = self.graph._conn_to
+        path = [source]
+        while path[-1] != target:
+            path.append(conn_to[next_conn[path[-1]]])
+        return dist[source], path
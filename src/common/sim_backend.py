@@ -0,0 +1,26 @@
+import importlib
+
+SIM_BACKENDS = ("traci", "libsumo")
+
+
+def load_sim_backend(name: str = "traci", gui: bool = False):
+    """
+    The module the controllers drive SUMO through.
+
+    ``traci`` talks to a SUMO process over a TCP socket. ``libsumo`` has the
+    same API but runs SUMO inside this process, so calls and subscription
+    results skip the socket and its (de)serialization. libsumo has no GUI and
+    runs one simulation per process, which is what the sweep runner gives it.
+
+    :param name: One of ``SIM_BACKENDS``.
+    :param gui: Whether the run uses sumo-gui, which only traci supports.
+    """
+    if name not in SIM_BACKENDS:
+        raise ValueError(f"Unknown simulation backend {name!r}, expected one of {SIM_BACKENDS}")
+    if name == "libsumo" and gui:
+        raise ValueError("libsumo runs SUMO in-process and cannot drive sumo-gui; use the traci backend")
+
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        raise ImportError(f"The {name} backend needs the {name} package: pip install {name}")
@@ -0,0 +1,387 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import traci.constants as tc
+from traci.exceptions import TraCIException
+
+TRACE_VERSION = 1
+
+
+class _StringTable:
+    """Stores every distinct string once; columns hold indices into it."""
+
+    def __init__(self, strings: Sequence[str] = ()) -> None:
+        self.strings: List[str] = list(strings)
+        self.index: Dict[str, int] = {s: i for i, s in enumerate(self.strings)}
+
+    def id(self, s: str) -> int:
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+
+def _ragged(lists: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Lists of indices as one flat array and the offsets of each list in it."""
+    lengths = np.fromiter((len(values) for values in lists), dtype=np.int64, count=len(lists))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    flat = np.fromiter((value for values in lists for value in values), dtype=np.int32, count=int(offsets[-1]))
+    return flat, offsets
+
+
+class _RecordingDomain:
+    """Passes calls on to a domain and notes what is subscribed."""
+
+    def __init__(self, domain, on_subscribe) -> None:
+        self._domain = domain
+        self._on_subscribe = on_subscribe
+
+    def subscribe(self, *args, **kwargs):
+        self._on_subscribe(*args)
+        return self._domain.subscribe(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._domain, name)
+
+
+class TraceRecorder:
+    """
+    Drives SUMO through ``sim`` (traci or libsumo) and records what the controller observes.
+
+    Every step keeps the simulation, vehicle and edge subscription results, the
+    route each vehicle departs with and ``getMinExpectedNumber``. The trace is
+    written to one compressed .npz file on ``close``, with strings interned
+    and per-vehicle values stored column by column, and can be served back
+    by ``TraceReplay`` without SUMO.
+    """
+
+    def __init__(self, sim, trace_file: str) -> None:
+        self._sim = sim
+        self.trace_file = trace_file
+
+        self.simulation = _RecordingDomain(sim.simulation, self._subscribe_simulation)
+        self.vehicle = _RecordingDomain(sim.vehicle, self._subscribe_vehicle)
+        self.edge = _RecordingDomain(sim.edge, self._subscribe_edge)
+        self.simulation.getMinExpectedNumber = self._get_min_expected_number
+
+        self.strings = _StringTable()
+        self.simulation_variables: Tuple[int, ...] = ()
+        self.vehicle_variables: Tuple[int, ...] = ()
+        self.edge_variables: Tuple[int, ...] = ()
+        self.edge_ids: List[str] = []
+
+        self.times: List[float] = []
+        self.departed: List[List[int]] = []
+        self.arrived: List[List[int]] = []
+        self.min_expected: List[int] = []
+        self.routes: Dict[int, List[int]] = {}
+        self.edge_values: List[np.ndarray] = []
+        # Per step: the vehicles and one list of values per vehicle variable
+        self.step_vehicles: List[List[int]] = []
+        self.vehicle_columns: List[List[Any]] = []
+
+        self._last_min_expected: Optional[int] = None
+        self._pending = False
+
+    def __getattr__(self, name: str):
+        return getattr(self._sim, name)
+
+    def _subscribe_simulation(self, variables) -> None:
+        self.simulation_variables = tuple(variables)
+
+    def _subscribe_vehicle(self, vehicle_id, variables=()) -> None:
+        self.vehicle_variables = self.vehicle_variables or tuple(variables)
+
+    def _subscribe_edge(self, edge_id, variables=()) -> None:
+        self.edge_variables = self.edge_variables or tuple(variables)
+        self.edge_ids.append(edge_id)
+
+    def _get_min_expected_number(self) -> int:
+        self._last_min_expected = self._sim.simulation.getMinExpectedNumber()
+        if not self.min_expected:
+            self.min_expected.append(self._last_min_expected)
+        return self._last_min_expected
+
+    def _record_vehicles(self) -> None:
+        # Read at the end of the step rather than right after simulationStep:
+        # the controller subscribes departing vehicles in between.
+        results = self._sim.vehicle.getAllSubscriptionResults()
+        self.step_vehicles.append([self.strings.id(vehicle_id) for vehicle_id in results])
+        self.vehicle_columns.append([[values[var] for values in results.values()] for var in self.vehicle_variables])
+        self.min_expected.append(self._last_min_expected if self._last_min_expected is not None else 0)
+        self._pending = False
+
+    def simulationStep(self, *args, **kwargs):
+        if self._pending:
+            self._record_vehicles()
+        result = self._sim.simulationStep(*args, **kwargs)
+
+        simulation = self._sim.simulation.getSubscriptionResults()
+        self.times.append(simulation[tc.VAR_TIME])
+        departed = [self.strings.id(vehicle_id) for vehicle_id in simulation[tc.VAR_DEPARTED_VEHICLES_IDS]]
+        self.departed.append(departed)
+        self.arrived.append([self.strings.id(vehicle_id) for vehicle_id in simulation[tc.VAR_ARRIVED_VEHICLES_IDS]])
+        # The route a vehicle departs with, before the controller changes it
+        for vehicle_id in simulation[tc.VAR_DEPARTED_VEHICLES_IDS]:
+            self.routes[self.strings.id(vehicle_id)] = [
+                self.strings.id(edge_id) for edge_id in self._sim.vehicle.getRoute(vehicle_id)
+            ]
+
+        edges = self._sim.edge.getAllSubscriptionResults()
+        self.edge_values.append(np.array(
+            [[edges[edge_id][var] for var in self.edge_variables] for edge_id in self.edge_ids],
+            dtype=np.float64
+        ).reshape(len(self.edge_ids), len(self.edge_variables)))
+
+        self._last_min_expected = None
+        self._pending = True
+        return result
+
+    def close(self, *args, **kwargs):
+        if self._pending:
+            self._record_vehicles()
+        self.save()
+        return self._sim.close(*args, **kwargs)
+
+    def save(self) -> None:
+        columns = {}
+        types = {}
+        for i, var in enumerate(self.vehicle_variables):
+            # Steps before the first vehicle subscription have no columns at all
+            values = [value for step in self.vehicle_columns if step for value in step[i]]
+            if values and isinstance(values[0], str):
+                types[var] = "str"
+                columns[f"vehicle_{var}"] = np.fromiter((self.strings.id(v) for v in values), dtype=np.int32, count=len(values))
+            else:
+                types[var] = "float"
+                columns[f"vehicle_{var}"] = np.array(values, dtype=np.float64)
+
+        vehicles, vehicle_offsets = _ragged(self.step_vehicles)
+        departed, departed_offsets = _ragged(self.departed)
+        arrived, arrived_offsets = _ragged(self.arrived)
+        route_vehicles = np.array(list(self.routes), dtype=np.int32)
+        route_edges, route_offsets = _ragged(list(self.routes.values()))
+        # Interned before the string table is written out
+        edge_ids = np.array([self.strings.id(edge_id) for edge_id in self.edge_ids], dtype=np.int32)
+        meta = {
+            "version": TRACE_VERSION,
+            "delta_t": self._sim.simulation.getDeltaT(),
+            "simulation_variables": list(self.simulation_variables),
+            "vehicle_variables": list(self.vehicle_variables),
+            "vehicle_variable_types": [types[var] for var in self.vehicle_variables],
+            "edge_variables": list(self.edge_variables),
+        }
+        np.savez_compressed(
+            self.trace_file,
+            meta=np.array(json.dumps(meta)),
+            strings=np.array(self.strings.strings, dtype=str),
+            times=np.array(self.times, dtype=np.float64),
+            min_expected=np.array(self.min_expected, dtype=np.int64),
+            departed=departed, departed_offsets=departed_offsets,
+            arrived=arrived, arrived_offsets=arrived_offsets,
+            route_vehicles=route_vehicles, route_edges=route_edges, route_offsets=route_offsets,
+            edge_ids=edge_ids,
+            edge_values=np.stack(self.edge_values) if self.edge_values else np.zeros((0, 0, 0)),
+            vehicles=vehicles, vehicle_offsets=vehicle_offsets,
+            **columns,
+        )
+
+
+class _ReplaySimulation:
+    def __init__(self, replay: "TraceReplay") -> None:
+        self._replay = replay
+
+    def subscribe(self, variables=()) -> None:
+        pass
+
+    def getSubscriptionResults(self) -> Dict[int, Any]:
+        return self._replay.simulation_results()
+
+    def getMinExpectedNumber(self) -> int:
+        replay = self._replay
+        return int(replay.min_expected[replay.step]) if replay.step < len(replay.min_expected) else 0
+
+    def getTime(self) -> float:
+        replay = self._replay
+        return float(replay.times[replay.step - 1]) if replay.step else 0.0
+
+    def getDeltaT(self) -> float:
+        return self._replay.delta_t
+
+
+class _ReplayVehicle:
+    def __init__(self, replay: "TraceReplay") -> None:
+        self._replay = replay
+
+    def subscribe(self, vehicle_id: str, variables=()) -> None:
+        missing = set(variables) - set(self._replay.vehicle_variables)
+        if missing:
+            raise TraCIException(
+                f"The trace has no values of vehicle variables {sorted(missing)}; record it again with this version"
+            )
+
+    def getIDList(self) -> List[str]:
+        return list(self._replay.vehicle_results())
+
+    def getAllSubscriptionResults(self) -> Dict[str, Dict[int, Any]]:
+        return self._replay.vehicle_results()
+
+    def getRoute(self, vehicle_id: str) -> Tuple[str, ...]:
+        return tuple(self._replay.route(vehicle_id))
+
+    def getRouteIndex(self, vehicle_id: str) -> int:
+        return self._replay.route_index(vehicle_id)
+
+    def setRoute(self, vehicle_id: str, edge_list: List[str]) -> None:
+        self._replay.set_route(vehicle_id, list(edge_list))
+
+
+class _ReplayEdge:
+    def __init__(self, replay: "TraceReplay") -> None:
+        self._replay = replay
+
+    def subscribe(self, edge_id: str, variables=()) -> None:
+        pass
+
+    def getIDList(self) -> List[str]:
+        return list(self._replay.edge_ids)
+
+    def getAllSubscriptionResults(self) -> Dict[str, Dict[int, float]]:
+        return self._replay.edge_results()
+
+
+class TraceReplay:
+    """
+    Serves a trace recorded by ``TraceRecorder`` through the part of the traci API the controllers use.
+
+    Each ``simulationStep`` moves on to the next recorded step, so runs are
+    deterministic and need neither SUMO nor a socket. The replay is open
+    loop: ``setRoute`` is checked the way SUMO checks it and changes what
+    ``getRoute`` returns, but the vehicles keep moving as recorded. Use it to
+    benchmark controller logic, not to evaluate routing decisions.
+    """
+
+    TraCIException = TraCIException
+
+    def __init__(self, trace_file: str) -> None:
+        with np.load(trace_file) as trace:
+            data = {name: trace[name] for name in trace.files}
+
+        meta = json.loads(str(data["meta"]))
+        if meta["version"] != TRACE_VERSION:
+            raise ValueError(f"{trace_file} is a version {meta['version']} trace, expected {TRACE_VERSION}")
+
+        self.delta_t = meta["delta_t"]
+        self.strings = data["strings"].tolist()
+        self.times = data["times"]
+        self.min_expected = data["min_expected"]
+        self.departed = (data["departed"], data["departed_offsets"])
+        self.arrived = (data["arrived"], data["arrived_offsets"])
+        self.edge_ids = [self.strings[i] for i in data["edge_ids"]]
+        self.edge_values = data["edge_values"]
+        self.edge_variables = meta["edge_variables"]
+
+        self.vehicle_ids = data["vehicles"]
+        self.vehicle_offsets = data["vehicle_offsets"]
+        self.vehicle_variables = meta["vehicle_variables"]
+        self.vehicle_columns = []
+        for var, kind in zip(self.vehicle_variables, meta["vehicle_variable_types"]):
+            column = data[f"vehicle_{var}"]
+            self.vehicle_columns.append([self.strings[i] for i in column] if kind == "str" else column.tolist())
+
+        route_offsets = data["route_offsets"]
+        route_edges = data["route_edges"]
+        self.routes: Dict[str, List[str]] = {
+            self.strings[vehicle]: [self.strings[e] for e in route_edges[route_offsets[i]:route_offsets[i + 1]]]
+            for i, vehicle in enumerate(data["route_vehicles"])
+        }
+        self.route_indices: Dict[str, int] = {}
+
+        self.step = 0
+        self.simulation = _ReplaySimulation(self)
+        self.vehicle = _ReplayVehicle(self)
+        self.edge = _ReplayEdge(self)
+        self._vehicle_results: Optional[Dict[str, Dict[int, Any]]] = None
+
+    @property
+    def steps(self) -> int:
+        return len(self.times)
+
+    def start(self, cmd=None, **kwargs) -> None:
+        self.step = 0
+
+    def close(self, *args, **kwargs) -> None:
+        pass
+
+    def simulationStep(self, step: float = 0.0) -> None:
+        if self.step >= self.steps:
+            raise TraCIException("The trace has no more steps")
+        self.step += 1
+        self._vehicle_results = None
+
+    def _ids(self, ragged: Tuple[np.ndarray, np.ndarray]) -> Tuple[str, ...]:
+        flat, offsets = ragged
+        k = self.step - 1
+        return tuple(self.strings[i] for i in flat[offsets[k]:offsets[k + 1]])
+
+    def simulation_results(self) -> Dict[int, Any]:
+        if not self.step:
+            return {tc.VAR_TIME: 0.0, tc.VAR_DEPARTED_VEHICLES_IDS: (), tc.VAR_ARRIVED_VEHICLES_IDS: ()}
+        return {
+            tc.VAR_TIME: float(self.times[self.step - 1]),
+            tc.VAR_DEPARTED_VEHICLES_IDS: self._ids(self.departed),
+            tc.VAR_ARRIVED_VEHICLES_IDS: self._ids(self.arrived),
+        }
+
+    def vehicle_results(self) -> Dict[str, Dict[int, Any]]:
+        if self._vehicle_results is None:
+            if not self.step:
+                return {}
+            start, end = self.vehicle_offsets[self.step - 1], self.vehicle_offsets[self.step]
+            self._vehicle_results = {
+                self.strings[self.vehicle_ids[row]]: {
+                    var: column[row] for var, column in zip(self.vehicle_variables, self.vehicle_columns)
+                }
+                for row in range(start, end)
+            }
+        return self._vehicle_results
+
+    def edge_results(self) -> Dict[str, Dict[int, float]]:
+        if not self.step:
+            return {}
+        values = self.edge_values[self.step - 1].tolist()
+        return {
+            edge_id: dict(zip(self.edge_variables, row))
+            for edge_id, row in zip(self.edge_ids, values)
+        }
+
+    def _vehicle(self, vehicle_id: str) -> Dict[int, Any]:
+        vehicle = self.vehicle_results().get(vehicle_id)
+        if vehicle is None:
+            raise TraCIException(f"Vehicle '{vehicle_id}' is not known")
+        return vehicle
+
+    def route(self, vehicle_id: str) -> List[str]:
+        self._vehicle(vehicle_id)
+        return self.routes[vehicle_id]
+
+    def route_index(self, vehicle_id: str) -> int:
+        """Index of the vehicle's recorded edge in its route; on a junction, that of the edge it is leaving."""
+        road_id = self._vehicle(vehicle_id)[tc.VAR_ROAD_ID]
+        route = self.routes[vehicle_id]
+        index = self.route_indices.get(vehicle_id, 0)
+        if road_id in route[index:]:
+            index = route.index(road_id, index)
+            self.route_indices[vehicle_id] = index
+        return index
+
+    def set_route(self, vehicle_id: str, edges: List[str]) -> None:
+        vehicle = self._vehicle(vehicle_id)
+        road_id = vehicle[tc.VAR_ROAD_ID]
+        current = road_id if not road_id.startswith(":") else self.routes[vehicle_id][self.route_index(vehicle_id)]
+        if not edges or edges[0] != current:
+            raise TraCIException(f"Route replacement failed for {vehicle_id}: it is on {current}, not on {edges[:1]}")
+        self.routes[vehicle_id] = edges
+        self.route_indices[vehicle_id] = 0
@@ -0,0 +1,135 @@
+from typing import Dict, NamedTuple, Tuple
+
+import numpy as np
+import traci
+import traci.constants as tc
+
+from src.common.network_attributes import NetworkAttributes
+
+VEHICLE_VARIABLES = (
+    tc.VAR_ROAD_ID,
+    tc.VAR_LANE_ID,
+    tc.VAR_LANEPOSITION,
+    tc.VAR_ACCUMULATED_WAITING_TIME,
+    tc.VAR_TIMELOSS,
+    tc.VAR_DISTANCE,
+    tc.VAR_SPEED,
+    tc.VAR_ALLOWED_SPEED,
+)
+
+SIMULATION_VARIABLES = (
+    tc.VAR_TIME,
+    tc.VAR_DEPARTED_VEHICLES_IDS,
+    tc.VAR_ARRIVED_VEHICLES_IDS,
+)
+
+EDGE_VARIABLES = (
+    tc.VAR_CURRENT_TRAVELTIME,
+    tc.LAST_STEP_OCCUPANCY,
+    tc.LAST_STEP_VEHICLE_NUMBER,
+)
+
+
+class VehicleState(NamedTuple):
+    road_id: str
+    lane_id: str
+    lane_position: float
+    lane_length: float
+    waiting_time: float
+    time_loss: float
+    distance: float
+    speed: float
+    # Speed limit of the lane times the vehicle's speed factor
+    allowed_speed: float
+
+
+class EdgeState(NamedTuple):
+    """Per-edge values of one step, as arrays indexed like ``NetworkAttributes.edge_ids``."""
+    travel_time: np.ndarray
+    occupancy: np.ndarray
+    vehicle_number: np.ndarray
+
+
+class StepSnapshot(NamedTuple):
+    time: float
+    delta_t: float
+    vehicles: Dict[str, VehicleState]
+    edges: EdgeState
+    departed: Tuple[str, ...] = ()
+    arrived: Tuple[str, ...] = ()
+
+
+class SimulationStateCollector:
+    """
+    Collects the per-step vehicle and edge state through TraCI subscriptions.
+
+    Vehicles are subscribed once, on the step they depart, and edges and the
+    simulation clock once at start-up. Each ``collect`` then costs one
+    subscription read per domain instead of one getter call per vehicle per value.
+    Edge values are scattered into arrays by edge index, so path metrics can
+    be computed with array gathers (see ``PathBatch``).
+    """
+
+    def __init__(self, network: NetworkAttributes, sim=traci) -> None:
+        self.network = network
+        self.sim = sim
+        self.delta_t = 0.0
+
+    def start(self) -> None:
+        """Subscribe to the simulation and edge variables. Call once after the simulation has started."""
+        self.delta_t = self.sim.simulation.getDeltaT()
+        self.sim.simulation.subscribe(SIMULATION_VARIABLES)
+        for edge_id in self.network.edge_ids:
+            self.sim.edge.subscribe(edge_id, EDGE_VARIABLES)
+
+    def _lane_length(self, lane_id: str) -> float:
+        if not lane_id:
+            # Teleporting vehicles are on no lane.
+            return 0.0
+        return self.network.get_lane_length(lane_id)
+
+    def collect(self) -> StepSnapshot:
+        """Subscribe newly departed vehicles and return the state of the current step."""
+        simulation = self.sim.simulation.getSubscriptionResults()
+        for vehicle_id in simulation[tc.VAR_DEPARTED_VEHICLES_IDS]:
+            self.sim.vehicle.subscribe(vehicle_id, VEHICLE_VARIABLES)
+
+        vehicles = {
+            vehicle_id: VehicleState(
+                road_id=values[tc.VAR_ROAD_ID],
+                lane_id=values[tc.VAR_LANE_ID],
+                lane_position=values[tc.VAR_LANEPOSITION],
+                lane_length=self._lane_length(values[tc.VAR_LANE_ID]),
+                waiting_time=values[tc.VAR_ACCUMULATED_WAITING_TIME],
+                time_loss=values[tc.VAR_TIMELOSS],
+                distance=values[tc.VAR_DISTANCE],
+                speed=values[tc.VAR_SPEED],
+                allowed_speed=values[tc.VAR_ALLOWED_SPEED],
+            )
+            for vehicle_id, values in self.sim.vehicle.getAllSubscriptionResults().items()
+        }
+
+        edge_results = self.sim.edge.getAllSubscriptionResults()
+        edge_index = self.network.edge_index
+        rows = np.fromiter((edge_index[edge_id] for edge_id in edge_results), dtype=np.int32, count=len(edge_results))
+        values = np.array(
+            [[v[tc.VAR_CURRENT_TRAVELTIME], v[tc.LAST_STEP_OCCUPANCY], v[tc.LAST_STEP_VEHICLE_NUMBER]]
+             for v in edge_results.values()],
+            dtype=np.float64
+        ).reshape(-1, 3)
+        columns = np.zeros((len(edge_index), 3), dtype=np.float64)
+        columns[rows] = values
+        edges = EdgeState(
+            travel_time=columns[:, 0],
+            occupancy=columns[:, 1],
+            vehicle_number=columns[:, 2],
+        )
+
+        return StepSnapshot(
+            time=simulation[tc.VAR_TIME],
+            delta_t=self.delta_t,
+            vehicles=vehicles,
+            edges=edges,
+            departed=simulation[tc.VAR_DEPARTED_VEHICLES_IDS],
+            arrived=simulation[tc.VAR_ARRIVED_VEHICLES_IDS],
+        )
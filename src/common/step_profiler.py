@@ -0,0 +1,266 @@
+import contextlib
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+# Histogram bin edges for per-step phase times, in seconds: 1 µs to 100 s
+HISTOGRAM_EDGES = np.logspace(-6, 2, 17)
+
+
+class _PhaseTimer:
+    """Adds the time spent inside the ``with`` block to one phase of the current step."""
+    __slots__ = ("times", "index", "started")
+
+    def __init__(self, times: list, index: int) -> None:
+        self.times = times
+        self.index = index
+        self.started = 0.0
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.times[self.index] += time.perf_counter() - self.started
+
+
+class _CountedDomain:
+    """A TraCI domain whose method calls are counted."""
+
+    def __init__(self, domain, counters: Dict[str, int]) -> None:
+        self._domain = domain
+        self._counters = counters
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._domain, name)
+        if not callable(attr):
+            return attr
+
+        counters = self._counters
+
+        def counted(*args, **kwargs):
+            counters["traci_calls"] += 1
+            return attr(*args, **kwargs)
+
+        # Cached, so later lookups skip __getattr__
+        setattr(self, name, counted)
+        return counted
+
+
+class CountingSim:
+    """
+    Stands in for the ``traci`` module and counts every TraCI call made through it.
+
+    Domains (``vehicle``, ``simulation``, ...) and module-level functions such
+    as ``simulationStep`` are counted; exception classes and constants are
+    passed through.
+    """
+
+    def __init__(self, sim, counters: Dict[str, int]) -> None:
+        self._sim = sim
+        self._counters = counters
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._sim, name)
+        if isinstance(attr, type) or not callable(attr):
+            wrapped = _CountedDomain(attr, self._counters) if hasattr(attr, "subscribe") else attr
+        else:
+            counters = self._counters
+
+            def wrapped(*args, **kwargs):
+                counters["traci_calls"] += 1
+                return attr(*args, **kwargs)
+
+        setattr(self, name, wrapped)
+        return wrapped
+
+
+class StepProfiler:
+    """
+    Where the wall-clock time of each simulation step goes.
+
+    The controller wraps each phase of a step (simulationStep, state
+    collection, shortest paths, setRoute, ...) in ``phase(name)`` and calls
+    ``end_step`` once per step. The phase times of the last ``capacity`` steps
+    are kept in a ring buffer; totals and counters cover the whole run. Time a
+    step spends outside every phase is reported as "other".
+
+    Disabled, ``phase`` returns a shared no-op context manager and
+    ``end_step`` returns at once, so the instrumentation can stay in place.
+    Optionally the whole run is also profiled with cProfile or pyinstrument.
+    """
+
+    def __init__(
+        self,
+        phases: Sequence[str],
+        enabled: bool = True,
+        capacity: int = 4096,
+        profiler: Optional[str] = None
+    ) -> None:
+        """
+        :param phases: Names of the phases a step is divided into.
+        :param enabled: Set to False to make the instrumentation a no-op.
+        :param capacity: Steps kept in the ring buffer.
+        :param profiler: "cprofile" or "pyinstrument" to also profile the run between ``start`` and ``stop``.
+        """
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profiler!r}, expected one of {PROFILERS}")
+
+        self.phases = tuple(phases)
+        self.enabled = enabled
+        self.capacity = capacity
+        self.profiler = profiler if enabled else None
+
+        self._times = [0.0] * len(self.phases)
+        self._timers = {name: _PhaseTimer(self._times, i) for i, name in enumerate(self.phases)}
+        self._null = contextlib.nullcontext()
+
+        # One row per step: the phases, then the whole step
+        self.ring = np.zeros((capacity, len(self.phases) + 1), dtype=np.float64)
+        self.totals = np.zeros(len(self.phases) + 1, dtype=np.float64)
+        self.steps = 0
+        self.counters: Dict[str, int] = defaultdict(int)
+
+        self._step_started = 0.0
+        self._session = None
+
+    def phase(self, name: str):
+        """Context manager timing one phase of the current step."""
+        if not self.enabled:
+            return self._null
+        return self._timers[name]
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] += n
+
+    def wrap(self, sim):
+        """``sim`` with its calls counted as "traci_calls", or ``sim`` itself when disabled."""
+        return CountingSim(sim, self.counters) if self.enabled else sim
+
+    def start(self) -> None:
+        """Start timing the first step, and the profiler if one was asked for."""
+        if not self.enabled:
+            return
+
+        if self.profiler == "cprofile":
+            import cProfile
+            self._session = cProfile.Profile()
+            self._session.enable()
+        elif self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImportError("The pyinstrument profiler needs the pyinstrument package: pip install pyinstrument")
+            self._session = Profiler()
+            self._session.start()
+        self._step_started = time.perf_counter()
+
+    def end_step(self) -> None:
+        """Close the current step and start timing the next one."""
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        row = self.steps % self.capacity
+        self.ring[row, :-1] = self._times
+        self.ring[row, -1] = now - self._step_started
+        self.totals += self.ring[row]
+        self.steps += 1
+
+        for i in range(len(self._times)):
+            self._times[i] = 0.0
+        self._step_started = now
+
+    def stop(self) -> None:
+        if self._session is None:
+            return
+        if self.profiler == "cprofile":
+            self._session.disable()
+        else:
+            self._session.stop()
+
+    def _recent(self) -> np.ndarray:
+        """Ring buffer rows in step order."""
+        if self.steps <= self.capacity:
+            return self.ring[:self.steps]
+        row = self.steps % self.capacity
+        return np.concatenate((self.ring[row:], self.ring[:row]))
+
+    def summary(self) -> Dict[str, object]:
+        """Totals and counters of the whole run, and percentiles and histograms of the recent steps."""
+        recent = self._recent()
+        step_total = self.totals[-1]
+        other = step_total - self.totals[:-1].sum()
+        phases = {}
+        for i, name in enumerate(self.phases + ("step",)):
+            values = recent[:, i]
+            phases[name] = {
+                "total_s": float(self.totals[i]),
+                "share": float(self.totals[i] / step_total) if step_total > 0 else 0.0,
+                "mean_ms": float(self.totals[i] / self.steps * 1000) if self.steps else 0.0,
+                "p50_ms": float(np.percentile(values, 50) * 1000) if len(values) else 0.0,
+                "p90_ms": float(np.percentile(values, 90) * 1000) if len(values) else 0.0,
+                "p99_ms": float(np.percentile(values, 99) * 1000) if len(values) else 0.0,
+                "max_ms": float(values.max() * 1000) if len(values) else 0.0,
+                "histogram": np.histogram(values, bins=HISTOGRAM_EDGES)[0].tolist(),
+            }
+        return {
+            "steps": self.steps,
+            "recent_steps": len(recent),
+            "other_s": float(other),
+            "histogram_edges_s": HISTOGRAM_EDGES.tolist(),
+            "phases": phases,
+            "counters": dict(self.counters),
+        }
+
+    def print_summary(self) -> None:
+        if not self.enabled or not self.steps:
+            return
+
+        summary = self.summary()
+        print(f"Profile over {self.steps} steps ({summary['other_s']:.2f} s outside the timed phases):")
+        for name, stats in summary["phases"].items():
+            print(f"  {name:<16} {stats['total_s']:9.2f} s  {stats['share']:6.1%}  "
+                  f"mean {stats['mean_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+        for name, value in sorted(self.counters.items()):
+            print(f"  {name:<16} {value}")
+
+    def dump(self, file_path: str) -> None:
+        """
+        Write ``<name>_steps.csv`` with the recent per-step phase times in
+        milliseconds, ``<name>_profile.json`` with ``summary()``, and the
+        profiler output, if any, to ``<name>.prof`` or ``<name>_pyinstrument.html``.
+        """
+        if not self.enabled:
+            return
+
+        base, _ = os.path.splitext(file_path)
+        directory = os.path.dirname(base)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        recent = self._recent()
+        first = self.steps - len(recent)
+        columns = np.column_stack((np.arange(first, self.steps), recent * 1000))
+        np.savetxt(
+            f"{base}_steps.csv",
+            columns,
+            delimiter=",",
+            header=",".join(("step",) + self.phases + ("step_total",)),
+            comments="",
+            fmt=["%d"] + ["%.4f"] * (columns.shape[1] - 1),
+        )
+        with open(f"{base}_profile.json", "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+        if self.profiler == "cprofile" and self._session is not None:
+            self._session.dump_stats(f"{base}.prof")
+        elif self.profiler == "pyinstrument" and self._session is not None:
+            with open(f"{base}_pyinstrument.html", "w", encoding="utf-8") as f:
+                f.write(self._session.output_html())
@@ -0,0 +1,118 @@
+"""
+Local stand-in for the chat-completions endpoint, for running the LLM
+controller without an API key.
+
+It answers every prompt with the first candidate route it finds (for
+batch prompts, route 0 of every vehicle), in the same response format as
+DeepSeek. Latency and errors can be injected to exercise timeouts, retries
+and the circuit breaker:
+
+    python -m src.common.stub_chat_server --port 18080 --latency 0.5 --jitter 0.5 --error-rate 0.2
+
+and point the controller at it with
+DEEPSEEK_API_URL=http://127.0.0.1:18080/v1/chat/completions.
+"""
+import argparse
+import ast
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUTES_PATTERN = re.compile(r"routes: (\[\[.*?\]\])")
+BATCH_PATTERN = re.compile(r"^(\[\{.*\}\])$", re.MULTILINE)
+
+
+def answer(prompt: str) -> str:
+    batch = BATCH_PATTERN.search(prompt)
+    if batch:
+        vehicles = json.loads(batch.group(1))
+        return json.dumps({"decisions": [{"vehicle_id": vehicle["vehicle_id"], "route": 0} for vehicle in vehicles]})
+
+    match = ROUTES_PATTERN.search(prompt)
+    routes = ast.literal_eval(match.group(1)) if match else [[]]
+    return f"chose_path = {routes[0]}\nchoice_reason = 'stub server: first candidate'"
+
+
+class StubChatHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep their connections alive; headers and body
+    # go out as separate writes, so Nagle would delay every answer on a kept connection.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    error_status = 503
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if random.random() < self.error_rate:
+            self.send_error(self.error_status)
+            return
+
+        content = answer(prompt)
+        # Rough token counts, enough to exercise usage tracking.
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+        payload = json.dumps({
+            "object": "chat.completion",
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 18080,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    handler: type = StubChatHandler
+) -> ThreadingHTTPServer:
+    """
+    A stub server with its own settings; port 0 picks a free port.
+
+    Call ``serve_forever`` on it, e.g. in a thread, and ``shutdown`` when done.
+    """
+    settings = {"latency": latency, "jitter": jitter, "error_rate": error_rate, "error_status": error_status}
+    return ThreadingHTTPServer((host, port), type("ConfiguredStubChatHandler", (handler,), settings))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds, at random.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error.")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of the injected errors.")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status)
+    print(f"Stub chat-completions server on http://{args.host}:{args.port}/v1/chat/completions")
+    server.serve_forever()
@@ -0,0 +1,115 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+from typing import Any, Dict
+
+_STOP = object()
+
+
+class TrackingSink:
+    """
+    Appends JSON Lines records to a file from a background thread.
+
+    ``write`` only puts the record on a bounded queue, so callers never wait
+    on disk I/O. The writer thread drains the queue, flushes whenever it runs
+    dry, and rotates the file once it grows past ``max_bytes``: ``path``
+    becomes ``path.1`` (``path.1.gz`` with ``compress``), older segments
+    shift up and anything beyond ``backup_count`` is deleted. When the queue
+    is full, records are dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 50 * 1024 * 1024,
+        backup_count: int = 5,
+        compress: bool = True,
+        max_queue: int = 10000
+    ) -> None:
+        """
+        :param path: JSON Lines file to append to.
+        :param max_bytes: Size at which the file is rotated; 0 never rotates.
+        :param backup_count: Rotated segments to keep.
+        :param compress: Gzip rotated segments.
+        :param max_queue: Records buffered before new ones are dropped.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="tracking-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+        self.written = 0
+        self.dropped = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Queue a record for writing; never blocks."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Write everything still queued and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self) -> None:
+        f = open(self.path, "ab")
+        size = f.tell()
+        try:
+            while True:
+                record = self._queue.get()
+                while record is not _STOP:
+                    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                    f.write(line)
+                    size += len(line)
+                    self.written += 1
+
+                    if self.max_bytes and size >= self.max_bytes:
+                        f.close()
+                        self._rotate()
+                        f = open(self.path, "ab")
+                        size = 0
+
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                f.flush()
+
+                if record is _STOP:
+                    return
+        finally:
+            f.close()
+
+    def _segment(self, index: int) -> str:
+        return f"{self.path}.{index}.gz" if self.compress else f"{self.path}.{index}"
+
+    def _rotate(self) -> None:
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+
+        oldest = self._segment(self.backup_count)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(self._segment(index)):
+                os.replace(self._segment(index), self._segment(index + 1))
+
+        if self.compress:
+            with open(self.path, "rb") as src, gzip.open(self._segment(1), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self._segment(1))
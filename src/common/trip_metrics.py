@@ -0,0 +1,232 @@
+import csv
+import math
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.common.simulation_state import StepSnapshot, VehicleState
+
+TRIP_COLUMNS = ("id", "depart", "arrival", "duration", "routeLength", "waitingTime", "timeLoss")
+INTERVAL_COLUMNS = ("begin", "end", "departed", "arrived", "running", "travelTime", "waitingTime", "timeLoss")
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    grown = np.zeros(size, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _write_columns(file_path: str, header: Sequence[str], columns: Sequence[Sequence]) -> None:
+    with open(file_path, mode='w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
+
+
+class TripMetrics:
+    """
+    Per-vehicle trip statistics and per-interval network time series.
+
+    A vehicle's depart time is recorded once, on the step it departs, and its
+    arrival, duration, route length, waiting time and time loss once, on the
+    step it arrives, from the last state seen before it left the network.
+    Both come from the departed / arrived ID lists of the simulation
+    subscription, so the cost is per event rather than per vehicle per step.
+
+    The values match SUMO's tripinfo output when SUMO runs with the long
+    ``--waiting-time-memory`` that ``RunConfig.sumo_cmd`` sets, up to one
+    step length per value: the time loss misses the vehicle's final step, and
+    SUMO's tripinfo device samples waiting slightly differently at the start
+    of a stop.
+    Route lengths assume vehicles arrive at the end of their last lane, SUMO's
+    default. Vehicles still running when ``finish`` is called are kept as
+    unfinished trips with arrival -1, like ``--tripinfo-output.write-unfinished``.
+
+    Intervals are counted from the time of the first step, so a scenario
+    that starts late in the day has no empty intervals before it.
+    """
+
+    def __init__(self, interval: float = 60.0, capacity: int = 1024, end_time: Optional[float] = None) -> None:
+        """
+        :param interval: Length of one time-series interval in simulation seconds.
+        :param capacity: Vehicles to allocate room for up front; grows as needed.
+        :param end_time: Expected end of the simulation, used to allocate the time series on the first step.
+        """
+        self.interval = interval
+        self.end_time = end_time
+        # Begin of the first interval: the time of the first step
+        self.start_time: Optional[float] = None
+
+        self.row: Dict[str, int] = {}
+        self.vehicle_ids: List[str] = []
+        self.depart = np.zeros(capacity, dtype=np.float64)
+        self.arrival = np.zeros(capacity, dtype=np.float64)
+        self.route_length = np.zeros(capacity, dtype=np.float64)
+        self.waiting_time = np.zeros(capacity, dtype=np.float64)
+        self.time_loss = np.zeros(capacity, dtype=np.float64)
+
+        intervals = 64
+        self.departed = np.zeros(intervals, dtype=np.int64)
+        self.arrived = np.zeros(intervals, dtype=np.int64)
+        # Sum of running vehicles over the steps of each interval, and the step count
+        self.running_sum = np.zeros(intervals, dtype=np.float64)
+        self.steps = np.zeros(intervals, dtype=np.int64)
+        # Totals over the trips that ended in each interval
+        self.travel_time = np.zeros(intervals, dtype=np.float64)
+        self.interval_waiting_time = np.zeros(intervals, dtype=np.float64)
+        self.interval_time_loss = np.zeros(intervals, dtype=np.float64)
+
+        self._last_vehicles: Dict[str, VehicleState] = {}
+        self._last_time = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.vehicle_ids)
+
+    @property
+    def intervals(self) -> int:
+        """Intervals seen so far."""
+        return int(np.flatnonzero(self.steps).max()) + 1 if self.steps.any() else 0
+
+    def _interval(self, sim_time: float) -> int:
+        if self.start_time is None:
+            self.start_time = sim_time
+            if self.end_time is not None:
+                self._grow_intervals(int(math.ceil((self.end_time - sim_time) / self.interval)) + 1)
+
+        index = int((sim_time - self.start_time) // self.interval)
+        if index >= len(self.steps):
+            self._grow_intervals(max(index + 1, 2 * len(self.steps)))
+        return index
+
+    def _grow_intervals(self, size: int) -> None:
+        if size <= len(self.steps):
+            return
+        for name in ("departed", "arrived", "running_sum", "steps",
+                     "travel_time", "interval_waiting_time", "interval_time_loss"):
+            setattr(self, name, _grow(getattr(self, name), size))
+
+    def _add_vehicle(self, vehicle_id: str, sim_time: float) -> None:
+        row = self.size
+        if row == len(self.depart):
+            size = 2 * row
+            for name in ("depart", "arrival", "route_length", "waiting_time", "time_loss"):
+                setattr(self, name, _grow(getattr(self, name), size))
+
+        self.row[vehicle_id] = row
+        self.vehicle_ids.append(vehicle_id)
+        self.depart[row] = sim_time
+        self.arrival[row] = -1.0
+
+    def _end_trip(self, vehicle_id: str, vehicle: Optional[VehicleState], arrival: float) -> None:
+        row = self.row[vehicle_id]
+        self.arrival[row] = arrival
+        if vehicle is None:
+            # Arrived on the step it departed, before it was ever seen
+            return
+
+        self.waiting_time[row] = vehicle.waiting_time
+        self.time_loss[row] = vehicle.time_loss
+        self.route_length[row] = vehicle.distance
+        if arrival >= 0:
+            # The last state is one step short of the arrival: add the rest of the lane
+            self.route_length[row] += max(0.0, vehicle.lane_length - vehicle.lane_position)
+
+    def update(self, snapshot: StepSnapshot) -> None:
+        """Record the departures and arrivals of a step. Call once per step."""
+        # SUMO reports the time after the step; departures and arrivals happen during it.
+        sim_time = snapshot.time - snapshot.delta_t
+        index = self._interval(sim_time)
+
+        for vehicle_id in snapshot.departed:
+            self._add_vehicle(vehicle_id, sim_time)
+
+        for vehicle_id in snapshot.arrived:
+            if vehicle_id not in self.row:
+                continue
+            self._end_trip(vehicle_id, self._last_vehicles.get(vehicle_id), sim_time)
+            row = self.row[vehicle_id]
+            self.travel_time[index] += sim_time - self.depart[row]
+            self.interval_waiting_time[index] += self.waiting_time[row]
+            self.interval_time_loss[index] += self.time_loss[row]
+
+        self.departed[index] += len(snapshot.departed)
+        self.arrived[index] += len(snapshot.arrived)
+        self.running_sum[index] += len(snapshot.vehicles)
+        self.steps[index] += 1
+
+        self._last_vehicles = snapshot.vehicles
+        self._last_time = snapshot.time
+
+    def finish(self) -> None:
+        """Record the vehicles still running as unfinished trips. Call once after the last step."""
+        for vehicle_id, vehicle in self._last_vehicles.items():
+            if vehicle_id in self.row:
+                self._end_trip(vehicle_id, vehicle, -1.0)
+        self._last_vehicles = {}
+
+    def durations(self) -> np.ndarray:
+        """Trip durations; unfinished trips count up to the end of the simulation."""
+        n = self.size
+        end = np.where(self.arrival[:n] >= 0, self.arrival[:n], self._last_time)
+        return end - self.depart[:n]
+
+    def totals(self) -> Dict[str, float]:
+        n = self.size
+        return {
+            "total_travel_time": float(self.durations().sum()),
+            "total_waiting_time": float(self.waiting_time[:n].sum()),
+            "total_time_loss": float(self.time_loss[:n].sum()),
+        }
+
+    def save(self, file_path: str) -> None:
+        """
+        Write the trips and the time series next to ``file_path``.
+
+        ``<name>_tripinfo.csv`` has one row per vehicle with tripinfo's
+        attribute names and precision, ``<name>_intervals.csv`` one row per
+        interval, and ``<name>.npz`` holds the same columns at full precision.
+        """
+        base, _ = os.path.splitext(file_path)
+        n = self.size
+        m = self.intervals
+        trips = {
+            "id": np.array(self.vehicle_ids, dtype=str),
+            "depart": self.depart[:n],
+            "arrival": self.arrival[:n],
+            "duration": self.durations(),
+            "routeLength": self.route_length[:n],
+            "waitingTime": self.waiting_time[:n],
+            "timeLoss": self.time_loss[:n],
+        }
+        running = np.divide(self.running_sum[:m], self.steps[:m],
+                            out=np.zeros(m), where=self.steps[:m] > 0)
+        begin = (self.start_time or 0.0) + np.arange(m) * self.interval
+        intervals = {
+            "begin": begin,
+            # The last interval ends with the simulation
+            "end": np.minimum(begin + self.interval, self._last_time),
+            "departed": self.departed[:m],
+            "arrived": self.arrived[:m],
+            "running": running,
+            "travelTime": self.travel_time[:m],
+            "waitingTime": self.interval_waiting_time[:m],
+            "timeLoss": self.interval_time_loss[:m],
+        }
+
+        _write_columns(
+            f"{base}_tripinfo.csv",
+            TRIP_COLUMNS,
+            [trips["id"]] + [np.round(trips[name], 2) for name in TRIP_COLUMNS[1:]]
+        )
+        _write_columns(
+            f"{base}_intervals.csv",
+            INTERVAL_COLUMNS,
+            [np.round(intervals[name], 2) for name in INTERVAL_COLUMNS]
+        )
+        np.savez_compressed(
+            f"{base}.npz",
+            **{f"trip_{name}": values for name, values in trips.items()},
+            **{f"interval_{name}": values for name, values in intervals.items()},
+        )
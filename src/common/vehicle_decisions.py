@@ -0,0 +1,110 @@
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.common.get_vehicle_routes import get_vehicle_routes
+
+
+class VehicleDecisionTable:
+    """
+    Routing state of every vehicle in the route file, one row per vehicle.
+
+    Per vehicle it holds the waypoints from the route file and the index of
+    the one being driven to, plus the edge and simulation time of its last
+    route decision and the route that decision chose. A vehicle may decide at
+    most once per edge, and not again until ``cooldown`` simulation seconds
+    after its previous decision, so a vehicle queued at a red light within
+    the approach window is not rerouted on every step.
+    """
+
+    def __init__(
+        self,
+        vehicle_ids: List[str],
+        waypoints: List[List[str]],
+        edge_index: Dict[str, int],
+        cooldown: float = 0.0
+    ) -> None:
+        """
+        :param vehicle_ids: Vehicle IDs, one per row.
+        :param waypoints: Edges each vehicle has to pass, in order.
+        :param edge_index: Edge ID -> edge index, as in ``NetworkAttributes.edge_index``.
+        :param cooldown: Minimum simulation seconds between two decisions of a vehicle.
+        """
+        self.row: Dict[str, int] = {vehicle_id: i for i, vehicle_id in enumerate(vehicle_ids)}
+        self.waypoints = waypoints
+        self.edge_index = edge_index
+        self.cooldown = cooldown
+
+        n = len(vehicle_ids)
+        self.target_index = np.zeros(n, dtype=np.int32)
+        # Edge index of the last decision, -1 before the first one.
+        self.decision_edge = np.full(n, -1, dtype=np.int32)
+        self.decision_time = np.full(n, -math.inf, dtype=np.float64)
+        self.decision_count = np.zeros(n, dtype=np.int32)
+        self.chosen_route: List[Optional[List[str]]] = [None] * n
+
+        # Decisions refused because the vehicle already decided on its edge or is cooling down
+        self.skipped = 0
+
+    @classmethod
+    def from_route_file(cls, rou_file: str, edge_index: Dict[str, int], cooldown: float = 0.0) -> "VehicleDecisionTable":
+        vehicle_routes = get_vehicle_routes(rou_file)
+        return cls(
+            vehicle_ids=list(vehicle_routes),
+            waypoints=[route_info['route'] for route_info in vehicle_routes.values()],
+            edge_index=edge_index,
+            cooldown=cooldown,
+        )
+
+    def target_edge(self, vehicle_id: str, current_edge: str) -> Optional[str]:
+        """
+        The waypoint the vehicle is heading for, or None once it has passed them all.
+
+        Reaching the current waypoint moves the vehicle on to the next one.
+        """
+        row = self.row.get(vehicle_id)
+        if row is None:
+            return None
+
+        route = self.waypoints[row]
+        target_index = self.target_index[row]
+        if target_index >= len(route):
+            return None
+
+        if current_edge != route[target_index]:
+            return route[target_index]
+
+        self.target_index[row] = target_index + 1
+        return route[target_index + 1] if target_index + 1 < len(route) else None
+
+    def may_decide(self, vehicle_id: str, current_edge: str, sim_time: float) -> bool:
+        """Whether the vehicle may make a new route decision on this edge now."""
+        row = self.row[vehicle_id]
+        edge = self.edge_index.get(current_edge, -1)
+        if (
+            (edge != -1 and self.decision_edge[row] == edge)
+            or sim_time - self.decision_time[row] < self.cooldown
+        ):
+            self.skipped += 1
+            return False
+        return True
+
+    def decided_on(self, vehicle_id: str, current_edge: str) -> bool:
+        """Whether the vehicle's last decision was made on this edge."""
+        edge = self.edge_index.get(current_edge, -1)
+        return edge != -1 and self.decision_edge[self.row[vehicle_id]] == edge
+
+    def record_decision(self, vehicle_id: str, current_edge: str, sim_time: float) -> None:
+        """Note that the vehicle made its decision for this edge."""
+        row = self.row[vehicle_id]
+        self.decision_edge[row] = self.edge_index.get(current_edge, -1)
+        self.decision_time[row] = sim_time
+        self.decision_count[row] += 1
+
+    def record_route(self, vehicle_id: str, route: List[str]) -> None:
+        self.chosen_route[self.row[vehicle_id]] = route
+
+    def get_route(self, vehicle_id: str) -> Optional[List[str]]:
+        """The route last chosen for the vehicle, if any."""
+        return self.chosen_route[self.row[vehicle_id]]
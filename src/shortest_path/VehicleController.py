@@ -1,115 +1,144 @@
-from src.common.get_vehicle_routes import get_vehicle_routes
 from src.common.get_shortest_path import get_shortest_path
+from src.common.intersection_scheduler import APPROACH_THRESHOLD, IntersectionScheduler
 from src.common.save_to_csv import save_to_csv
-import traci
+from src.common.run_config import ProgressReporter, RunConfig
+from src.common.network_cache import load_network
+from src.common.shortest_path_tree_cache import ShortestPathTreeCache
+from src.common.simulation_state import SimulationStateCollector, VehicleState
+from src.common.step_profiler import StepProfiler
+from src.common.trip_metrics import TripMetrics
+from src.common.vehicle_decisions import VehicleDecisionTable
 import sumolib
-import networkx as nx
 from typing import Dict, Optional
 
+PROFILE_PHASES = ("simulation_step", "collect", "metrics", "schedule", "shortest_path", "set_route")
 
 class VehicleController:
-    def __init__(self, net_file: str, rou_file: str, cfg_file: str):
+    def __init__(self, net_file: str, rou_file: str, cfg_file: str, turn_penalties: Optional[Dict[str, float]] = None,
+                 run_config: Optional[RunConfig] = None, decision_cooldown: float = 0.0):
         self.net_file = net_file
         self.rou_file = rou_file
         self.cfg_file = cfg_file
-
-        self.net_data = sumolib.net.readNet(net_file)
-        self.graph = self._init_graph()
+        self.turn_penalties = turn_penalties
+        self.run_config = run_config or RunConfig()
+
+        self._net_data = None
+        self.graph, self.network = load_network(net_file, turn_penalties=turn_penalties)
+        self.tree_cache = ShortestPathTreeCache(self.graph)
+        self.profiler = StepProfiler(
+            PROFILE_PHASES,
+            enabled=self.run_config.profile_output is not None,
+            profiler=self.run_config.profiler
+        )
+        self.sim = self.profiler.wrap(self.run_config.load_sim())
+        self.state = SimulationStateCollector(self.network, sim=self.sim)
+        self.decision_cooldown = decision_cooldown
+        self.scheduler = IntersectionScheduler()
 
         self.start_time: Optional[float] = None
         self.end_time: Optional[float] = None
-        self.total_travel_time: float = 0.0
-        self.total_waiting_time: float = 0.0
-        self.total_time_loss: float = 0.0
-
-    def _init_graph(self) -> nx.DiGraph:
-        graph = nx.DiGraph()
-        for edge in self.net_data.getEdges():
-            from_node = edge.getFromNode().getID()
-            to_node = edge.getToNode().getID()
-            graph.add_edge(from_node, to_node, edge=edge.getID(), weight=edge.getLength())
-        return graph
-
-    def _get_target_edge(self, vehicle_id: str, current_edge: str, vehicle_routes: Dict) -> Optional[str]:
-        route_info = vehicle_routes.get(vehicle_id)
-        if not route_info:
-            return None
-
-        route = route_info['route']
-        target_index = route_info['target_edge_index']
-
-        if target_index < len(route):
-            target_edge = route[target_index]
-
-            if current_edge == target_edge:
-                route_info['target_edge_index'] += 1
-                if route_info['target_edge_index'] < len(route):
-                    return route_info['route'][route_info['target_edge_index']]
-            else:
-                return target_edge
-        return None
-
-    def _is_approaching_intersection(self, vehicle_id: str, threshold: float = 2.0) -> bool:
-        lane_id = traci.vehicle.getLaneID(vehicle_id)
-        lane_pos = traci.vehicle.getLanePosition(vehicle_id)
-        lane_length = traci.lane.getLength(lane_id)
-        return (lane_length - lane_pos) <= threshold
-
-    def _is_inside_intersection(self, vehicle_id: str) -> bool:
-        return traci.vehicle.getRoadID(vehicle_id).startswith(":")
+        self.metrics = TripMetrics(end_time=self.run_config.end_time)
+
+    @property
+    def net_data(self) -> sumolib.net.Net:
+        """The full sumolib net, parsed only when something asks for it."""
+        if self._net_data is None:
+            self._net_data = sumolib.net.readNet(self.net_file, withInternal=True)
+        return self._net_data
+
+    def _is_approaching_intersection(self, vehicle: VehicleState, threshold: float = APPROACH_THRESHOLD) -> bool:
+        return (vehicle.lane_length - vehicle.lane_position) <= threshold
+
+    def _is_inside_intersection(self, vehicle: VehicleState) -> bool:
+        return vehicle.road_id.startswith(":")
 
     def _save_results(self, file_path: str) -> None:
-        records = [{
-            "total_travel_time": self.total_travel_time,
-            "total_waiting_time": self.total_waiting_time,
-            "total_time_loss": self.total_time_loss
-        }]
+        records = [self.metrics.totals()]
         save_to_csv(file_path, fieldnames=list(records[0].keys()), records=records)
+        self.metrics.save(file_path)
 
     def run_simulation(self) -> None:
-        sumo_cmd = ["sumo-gui", "-n", self.net_file, "-r", self.rou_file, "-c", self.cfg_file]
-        traci.start(sumo_cmd)
+        sumo_cmd = self.run_config.sumo_cmd(self.net_file, self.rou_file, self.cfg_file)
+        self.sim.start(sumo_cmd, label=self.run_config.label)
+        progress = ProgressReporter(self.run_config.progress_interval)
 
-        vehicle_routes = get_vehicle_routes(self.rou_file)
+        decisions = VehicleDecisionTable.from_route_file(self.rou_file, self.network.edge_index, self.decision_cooldown)
+        self.state.start()
+        self.profiler.start()
         step = 0
 
-        while traci.simulation.getMinExpectedNumber() > 0:
-            traci.simulationStep()
+        while self.sim.simulation.getMinExpectedNumber() > 0:
+            with self.profiler.phase("simulation_step"):
+                self.sim.simulationStep()
+            with self.profiler.phase("collect"):
+                snapshot = self.state.collect()
+            with self.profiler.phase("metrics"):
+                self.metrics.update(snapshot)
 
             if self.start_time is None:
-                self.start_time = traci.simulation.getTime()
+                self.start_time = snapshot.time
 
-            vehicles = traci.vehicle.getIDList()
-            self.total_travel_time += len(vehicles) * traci.simulation.getDeltaT()
+            vehicles = snapshot.vehicles
 
             step += 1
+            progress.report(step, snapshot.time, len(vehicles))
+            self.run_config.wait_step()
+            if self.run_config.reached_end(snapshot.time):
+                break
 
-            for vehicle_id in vehicles:
-                current_edge = traci.vehicle.getRoadID(vehicle_id)
-                target_edge = self._get_target_edge(vehicle_id, current_edge, vehicle_routes)
+            with self.profiler.phase("schedule"):
+                due = self.scheduler.due(snapshot)
+            for vehicle_id, vehicle in due:
+                current_edge = vehicle.road_id
+                target_edge = decisions.target_edge(vehicle_id, current_edge)
 
                 if not target_edge:
-                    self.total_waiting_time += traci.vehicle.getAccumulatedWaitingTime(vehicle_id)
-                    self.total_time_loss += traci.vehicle.getTimeLoss(vehicle_id)
+                    # Past its last waypoint, so it never decides again
+                    continue
+                self.scheduler.reschedule(vehicle_id, vehicle, snapshot)
+
+                if self._is_inside_intersection(vehicle) or not self._is_approaching_intersection(vehicle):
                     continue
 
-                if self._is_inside_intersection(vehicle_id) or not self._is_approaching_intersection(vehicle_id):
+                if not decisions.may_decide(vehicle_id, current_edge, snapshot.time):
                     continue
 
-                shortest_path = get_shortest_path(self.graph, current_edge, target_edge)
-                traci.vehicle.setRoute(vehicle_id, shortest_path)
+                with self.profiler.phase("shortest_path"):
+                    shortest_path = get_shortest_path(self.graph, current_edge, target_edge, self.tree_cache)
+                self.profiler.count("shortest_path_queries")
+                # Also when no route comes of it, so the vehicle does not search again on every step of this edge
+                decisions.record_decision(vehicle_id, current_edge, snapshot.time)
+                if not shortest_path:
+                    # The target cannot be reached from here; keep the current route
+                    continue
 
-            print("Step: ", step)
+                try:
+                    with self.profiler.phase("set_route"):
+                        self.sim.vehicle.setRoute(vehicle_id, shortest_path)
+                except self.sim.TraCIException as e:
+                    print(f"Could not apply the shortest path for vehicle {vehicle_id}: {e}")
+                    continue
+                decisions.record_route(vehicle_id, shortest_path)
+
+            self.profiler.end_step()
 
         print("Similation ended at step: ", step)
-        self.end_time = traci.simulation.getTime()
+        self.end_time = self.sim.simulation.getTime()
+        self.metrics.finish()
+        totals = self.metrics.totals()
 
         print(f"Simulation ended at {self.end_time} seconds")
         print(f"Total simulation time: {self.end_time - self.start_time} seconds")
-        print(f"Total travel time: {self.total_travel_time} seconds")
-        print(f"Total waiting time: {self.total_waiting_time} seconds")
-        print(f"Total time loss: {self.total_time_loss} seconds")
+        print(f"Total travel time: {totals['total_travel_time']} seconds")
+        print(f"Total waiting time: {totals['total_waiting_time']} seconds")
+        print(f"Total time loss: {totals['total_time_loss']} seconds")
+
+        self.profiler.stop()
+        self.profiler.count("vehicles_woken", self.scheduler.woken)
+        self.profiler.print_summary()
+        if self.run_config.profile_output:
+            self.profiler.dump(self.run_config.profile_output)
 
     def finish_simulation(self) -> None:
-        traci.close()
+        self.sim.close()
         print("Simulation finished and closed.")
\ No newline at end of file
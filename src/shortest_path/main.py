@@ -1,13 +1,19 @@
 from src.shortest_path.VehicleController import VehicleController
+from src.common.run_config import RunConfig
+import argparse
 import time
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    RunConfig.add_arguments(parser)
+    args = parser.parse_args()
+
     dataset_path = "./dataset/mini-grid"
     net_file = f'{dataset_path}/net.xml'
     rou_file = f'{dataset_path}/routes.xml'
     cfg_file = f'{dataset_path}/config_file.sumocfg'
 
-    vehicle_controller = VehicleController(net_file, rou_file, cfg_file)
+    vehicle_controller = VehicleController(net_file, rou_file, cfg_file, run_config=RunConfig.from_args(args))
     vehicle_controller.run_simulation()
 
     file_name = time.strftime("%d-%m-%Y %H:%M:%S")
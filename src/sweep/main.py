@@ -0,0 +1,62 @@
+from src.common.scenario_sweep import CONTROLLERS, build_matrix, find_scenario, find_scenarios, run_sweep
+from src.common.run_config import RunConfig
+from src.common.sim_backend import SIM_BACKENDS
+import argparse
+import ast
+import os
+import time
+
+
+def parse_param(text: str):
+    """``name=v1,v2,...`` -> (name, [v1, v2, ...]), with values parsed as Python literals where possible."""
+    name, _, values = text.partition("=")
+    if not name or not values:
+        raise argparse.ArgumentTypeError(f"expected name=value[,value...], got {text!r}")
+
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(ast.literal_eval(value))
+        except (ValueError, SyntaxError):
+            parsed.append(value)
+    return name, parsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run every scenario under a dataset directory with each controller, in parallel.")
+    parser.add_argument("--dataset-dir", default="./dataset", help="Directory holding one directory per scenario.")
+    parser.add_argument("--datasets", nargs="+", default=None, help="Scenario directories to run (default: all).")
+    parser.add_argument("--controllers", nargs="+", choices=list(CONTROLLERS), default=list(CONTROLLERS))
+    parser.add_argument("--seeds", nargs="+", type=int, default=None, help="SUMO seeds (default: the .sumocfg's).")
+    parser.add_argument("--param", dest="params", action="append", type=parse_param, default=[],
+                        help="Controller parameter and the values to sweep, e.g. batch_size=1,8,16. Repeatable.")
+    parser.add_argument("--workers", type=int, default=None, help="Simulations running at once (default: one per CPU).")
+    parser.add_argument("--end", dest="end_time", type=float, default=None, help="Override the simulation end time.")
+    parser.add_argument("--profile", action="store_true", help="Write per-step phase timings for every run.")
+    parser.add_argument("--sim-backend", choices=SIM_BACKENDS, default="traci",
+                        help="Drive SUMO over a TraCI socket or in-process through libsumo.")
+    args = parser.parse_args()
+
+    if args.datasets:
+        scenarios = [find_scenario(os.path.join(args.dataset_dir, name)) for name in args.datasets]
+        skipped = [name for name, scenario in zip(args.datasets, scenarios) if scenario is None]
+        scenarios = [scenario for scenario in scenarios if scenario is not None]
+    else:
+        scenarios, skipped = find_scenarios(args.dataset_dir)
+    for directory in skipped:
+        print(f"Skipping {directory}: no .sumocfg, network or route file")
+
+    results_dir = f"results/sweep/{time.strftime('%d-%m-%Y %H:%M:%S')}"
+    runs = build_matrix(scenarios, args.controllers, args.seeds or [None], dict(args.params), results_dir)
+    print(f"Running {len(runs)} simulations of {len(scenarios)} scenarios, results in {results_dir}")
+
+    run_config = RunConfig(
+        progress_interval=0,
+        end_time=args.end_time,
+        profile_output="profile" if args.profile else None,
+        sim_backend=args.sim_backend,
+    )
+    records = run_sweep(runs, workers=args.workers, run_config=run_config, summary_file=f"{results_dir}/summary.csv")
+
+    failed = sum(record["status"] != "ok" for record in records)
+    print(f"Sweep finished: {len(records) - failed} ok, {failed} failed, summary in {results_dir}/summary.csv")
@@ -0,0 +1,34 @@
+import threading
+
+import pytest
+
+from src.common.stub_chat_server import make_server
+
+
+@pytest.fixture
+def stub_server():
+    """Starts stub chat-completions servers on free ports and returns their URL."""
+    servers = []
+
+    def start(**settings) -> str:
+        server = make_server(port=0, **settings)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def deepseek_env(monkeypatch):
+    """Point DeepSeekApi at a URL, without an API key or tracking file."""
+    monkeypatch.delenv("DEEPSEEK_TRACKING_FILE", raising=False)
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+
+    def point_at(url: str) -> None:
+        monkeypatch.setenv("DEEPSEEK_API_URL", url)
+
+    return point_at
@@ -0,0 +1,105 @@
+import gc
+import logging
+import re
+import time
+
+from src.common.decision_dispatcher import DecisionDispatcher, DecisionRequest
+from src.common.deepseek import DeepSeekApi
+
+PATHS = [["a", "b"], ["a", "c"]]
+
+
+def make_request(vehicle_id: str) -> DecisionRequest:
+    return DecisionRequest(vehicle_id, PATHS, [0, 0], [10.0, 12.0], [0.1, 0.2])
+
+
+def stub_decider(backend: DeepSeekApi, delays=None):
+    """decide_batch asking the stub, after an optional per-vehicle delay."""
+    def decide(batch):
+        request = batch[0]
+        time.sleep((delays or {}).get(request.vehicle_id, 0.0))
+        answer = backend.request(f"routes: {request.k_shortest_paths}")
+        return {request.vehicle_id: re.findall(r"'(.*?)'", answer.splitlines()[0])}
+    return decide
+
+
+def wait_for(dispatcher: DecisionDispatcher, count: int, timeout: float = 10.0) -> list:
+    decided = []
+    deadline = time.monotonic() + timeout
+    while len(decided) < count and time.monotonic() < deadline:
+        decided += dispatcher.poll()
+        time.sleep(0.01)
+    return decided
+
+
+def test_decisions_complete_out_of_order(stub_server, deepseek_env):
+    deepseek_env(stub_server())
+    backend = DeepSeekApi(max_retries=0)
+    dispatcher = DecisionDispatcher(stub_decider(backend, {"slow": 0.5}), max_in_flight=2)
+    dispatcher.start()
+    try:
+        dispatcher.submit(make_request("slow"), 0.0)
+        dispatcher.flush(0.0)
+        dispatcher.submit(make_request("fast"), 1.0)
+        dispatcher.flush(1.0)
+        assert dispatcher.is_pending("slow") and dispatcher.is_pending("fast")
+
+        decided = wait_for(dispatcher, 2)
+    finally:
+        dispatcher.close()
+        backend.close()
+
+    assert [request.vehicle_id for request, _ in decided] == ["fast", "slow"]
+    assert all(path == ["a", "b"] for _, path in decided)
+    assert dispatcher.decided == 2 and dispatcher.failed == 0
+
+
+def test_failed_batches_are_counted(stub_server, deepseek_env):
+    deepseek_env(stub_server(error_rate=1.0))
+    backend = DeepSeekApi(max_retries=0)
+    dispatcher = DecisionDispatcher(stub_decider(backend), max_in_flight=3)
+    dispatcher.start()
+    try:
+        for vehicle_id in ("v0", "v1", "v2"):
+            dispatcher.submit(make_request(vehicle_id), 0.0)
+        dispatcher.flush(0.0)
+        decided = wait_for(dispatcher, 3)
+    finally:
+        dispatcher.close()
+        backend.close()
+
+    assert sorted(request.vehicle_id for request, _ in decided) == ["v0", "v1", "v2"]
+    assert all(path is None for _, path in decided)
+    assert dispatcher.failed == 3
+    assert dispatcher.batches == 3 and dispatcher.decided == 3
+
+
+def test_close_with_decisions_in_flight(stub_server, deepseek_env, caplog):
+    deepseek_env(stub_server(latency=0.05, jitter=0.1))
+    backend = DeepSeekApi(max_retries=0)
+
+    with caplog.at_level(logging.ERROR, logger="asyncio"):
+        # Close at different points: decisions queued on the semaphore, waiting
+        # for the stub, and finishing.
+        for delay in (0.0, 0.02, 0.05, 0.08, 0.12) * 3:
+            dispatcher = DecisionDispatcher(stub_decider(backend), max_in_flight=2)
+            dispatcher.start()
+            for vehicle_id in ("v0", "v1", "v2", "v3", "v4"):
+                dispatcher.submit(make_request(vehicle_id), 0.0)
+            dispatcher.flush(0.0)
+            time.sleep(delay)
+
+            started = time.monotonic()
+            dispatcher.close()
+            dispatcher.close()
+            assert time.monotonic() - started < 0.5
+            assert not dispatcher.is_pending("v0")
+            del dispatcher
+            gc.collect()
+
+        # Let the worker threads' answers come back, and be dropped
+        time.sleep(0.3)
+        gc.collect()
+    backend.close()
+
+    assert not [record for record in caplog.records if "Task was destroyed" in record.getMessage()]
@@ -0,0 +1,86 @@
+import math
+
+from src.common.decision_dispatcher import DecisionRequest
+from src.common.decision_prefetch import DecisionPrefetcher
+from src.common.simulation_state import VehicleState
+
+PATHS = [["e1", "e2"], ["e1", "e3"]]
+
+
+def make_request(vehicle_id: str = "v", estimated_time_list=(10.0, 12.0)) -> DecisionRequest:
+    return DecisionRequest(vehicle_id, PATHS, [0, 0], list(estimated_time_list), [0.1, 0.2])
+
+
+def vehicle_at(lane_position: float, lane_length: float = 100.0, allowed_speed: float = 10.0) -> VehicleState:
+    return VehicleState("e1", "e1_0", lane_position, lane_length, 0.0, 0.0, 0.0, allowed_speed, allowed_speed)
+
+
+def test_window():
+    assert not DecisionPrefetcher().enabled
+    by_distance = DecisionPrefetcher(distance=30.0)
+    assert by_distance.in_window(vehicle_at(70.0)) and not by_distance.in_window(vehicle_at(69.0))
+    # 5 s at 10 m/s
+    by_horizon = DecisionPrefetcher(distance=20.0, horizon=5.0)
+    assert by_horizon.lead(vehicle_at(0.0)) == 50.0
+    on_entry = DecisionPrefetcher(horizon=math.inf)
+    assert on_entry.in_window(vehicle_at(0.0, lane_length=1e6))
+
+
+def test_ready_at_the_decision_point_is_on_time():
+    prefetcher = DecisionPrefetcher(distance=50.0)
+    request = make_request()
+    prefetcher.start(request, "e1")
+    assert prefetcher.owns(request) and "v" in prefetcher
+    # Decided before the vehicle gets there: held
+    assert prefetcher.resolve(request, PATHS[1]) is None
+
+    assert prefetcher.take("v", "e1", [10.5, 12.5]) == PATHS[1]
+    assert (prefetcher.on_time, prefetcher.late, prefetcher.stale) == (1, 0, 0)
+    assert "v" not in prefetcher
+
+
+def test_taken_after_leaving_the_edge_is_late():
+    prefetcher = DecisionPrefetcher(distance=50.0)
+    request = make_request()
+    prefetcher.start(request, "e1")
+    prefetcher.resolve(request, PATHS[0])
+
+    # Missed the decision point; seen next inside the junction
+    assert prefetcher.take("v", ":j1_0") == PATHS[0]
+    assert (prefetcher.on_time, prefetcher.late, prefetcher.stale) == (0, 1, 0)
+
+
+def test_waiting_vehicle_gets_the_answer_when_it_comes():
+    prefetcher = DecisionPrefetcher(distance=50.0)
+    request = make_request()
+    prefetcher.start(request, "e1")
+
+    assert prefetcher.take("v", "e1", [10.0, 12.0]) is None
+    assert prefetcher.is_waiting("v") and "v" in prefetcher
+
+    # Resolving hands the path out for applying now
+    assert prefetcher.resolve(request, PATHS[1]) == PATHS[1]
+    assert (prefetcher.on_time, prefetcher.late, prefetcher.stale) == (0, 1, 0)
+    assert "v" not in prefetcher and not prefetcher.is_waiting("v")
+
+
+def test_stale_decision_is_dropped():
+    prefetcher = DecisionPrefetcher(distance=50.0, tolerance=0.25)
+    request = make_request()
+    prefetcher.start(request, "e1")
+    prefetcher.resolve(request, PATHS[0])
+
+    # The second candidate got 50% slower in the meantime
+    assert prefetcher.take("v", "e1", [10.0, 18.0]) is None
+    assert (prefetcher.on_time, prefetcher.late, prefetcher.stale) == (0, 0, 1)
+    assert "v" not in prefetcher and not prefetcher.is_waiting("v")
+
+
+def test_superseded_request_is_not_owned():
+    prefetcher = DecisionPrefetcher(distance=50.0)
+    old, new = make_request(), make_request()
+    prefetcher.start(old, "e1")
+    prefetcher.drop("v")
+    prefetcher.start(new, "e4")
+    assert not prefetcher.owns(old) and prefetcher.owns(new)
+    assert prefetcher.edge("v") == "e4"
@@ -0,0 +1,198 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from src.common import deepseek
+from src.common.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.common.deepseek import DeepSeekApi
+from src.common.stub_chat_server import StubChatHandler
+
+BODY = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "routes: [['a', 'b']]"}]}
+
+
+class FlakyHandler(StubChatHandler):
+    """Answers the first ``failures`` requests with ``status`` and a Retry-After header, then like the stub."""
+    failures = 0
+    status = 429
+    retry_after = None
+    # Shared with the test, which counts the requests the server received
+    received: list = []
+
+    def do_POST(self) -> None:
+        self.received.append(self.path)
+        if len(self.received) > self.failures:
+            super().do_POST()
+            return
+
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(self.status)
+        if self.retry_after is not None:
+            self.send_header("Retry-After", str(self.retry_after))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records the backoff delays instead of sleeping."""
+    delays = []
+    monkeypatch.setattr(deepseek, "time", SimpleNamespace(sleep=delays.append, perf_counter=time.perf_counter))
+    return delays
+
+
+def flaky_server(stub_server, **settings):
+    """URL of a flaky stub, and the list its received requests are appended to."""
+    received = []
+    handler = type("TestFlakyHandler", (FlakyHandler,), {**settings, "received": received})
+    return stub_server(handler=handler), received
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_honour_retry_after(stub_server, deepseek_env, sleeps, status):
+    url, received = flaky_server(stub_server, failures=2, status=status, retry_after=3)
+    deepseek_env(url)
+    api = DeepSeekApi(max_retries=3, backoff_max=8.0)
+
+    response = api.post(BODY)
+    api.close()
+
+    assert response.status_code == 200
+    assert len(received) == 3
+    assert sleeps == [3.0, 3.0]
+    assert api.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_after_is_capped_and_backoff_is_jittered(stub_server, deepseek_env, sleeps):
+    url, received = flaky_server(stub_server, failures=4, status=503)
+    deepseek_env(url)
+    api = DeepSeekApi(max_retries=3, backoff_base=0.5, backoff_max=1.5)
+
+    response = api.post(BODY)
+    api.close()
+
+    # Out of retries: the last error answer is returned and counts as a failure
+    assert response.status_code == 503
+    assert len(received) == 4
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= bound for delay, bound in zip(sleeps, [0.5, 1.0, 1.5]))
+    assert api.circuit_breaker._failures == 1
+
+    assert api._backoff(0, type("Response", (), {"headers": {"Retry-After": "60"}})()) == 1.5
+
+
+def test_other_errors_are_not_retried(stub_server, deepseek_env, sleeps):
+    url, received = flaky_server(stub_server, failures=1, status=400)
+    deepseek_env(url)
+    api = DeepSeekApi(max_retries=3)
+
+    response = api.post(BODY)
+    api.close()
+
+    assert response.status_code == 400
+    assert len(received) == 1 and sleeps == []
+
+
+def test_breaker_opens_half_opens_and_closes(stub_server, deepseek_env, sleeps):
+    url, received = flaky_server(stub_server, failures=2, status=503)
+    deepseek_env(url)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    api = DeepSeekApi(max_retries=0, circuit_breaker=breaker)
+
+    assert api.post(BODY).status_code == 503
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert api.post(BODY).status_code == 503
+    assert breaker.state == CircuitBreaker.OPEN and breaker.times_opened == 1
+
+    # Open: refused without contacting the endpoint
+    with pytest.raises(CircuitOpenError):
+        api.post(BODY)
+    assert len(received) == 2
+
+    # After the reset timeout one trial goes through; it succeeds and closes the circuit
+    time.sleep(0.25)
+    assert api.post(BODY).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert api.post(BODY).status_code == 200
+    assert len(received) == 4
+    api.close()
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_failed_half_open_trial_reopens(stub_server, deepseek_env, sleeps):
+    url, received = flaky_server(stub_server, failures=3, status=503)
+    deepseek_env(url)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    api = DeepSeekApi(max_retries=0, circuit_breaker=breaker)
+
+    api.post(BODY)
+    api.post(BODY)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.25)
+    assert api.post(BODY).status_code == 503
+    assert breaker.state == CircuitBreaker.OPEN and breaker.times_opened == 2
+    with pytest.raises(CircuitOpenError):
+        api.post(BODY)
+    assert len(received) == 3
+    api.close()
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ChunkedEncodingError("connection broken"),
+    requests.exceptions.TooManyRedirects("redirect loop"),
+    ValueError("not a requests error"),
+])
+def test_half_open_trial_failing_unexpectedly_reopens(deepseek_env, sleeps, monkeypatch, error):
+    deepseek_env("http://127.0.0.1:1/v1/chat/completions")
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    api = DeepSeekApi(max_retries=0, circuit_breaker=breaker)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    def fail(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(api.session, "post", fail)
+
+    with pytest.raises(type(error)):
+        api.post(BODY)
+    # Not stuck half-open: the next trial is let through after the reset timeout
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+    api.close()
+
+
+def test_request_tracks_any_requests_error(deepseek_env, sleeps, monkeypatch, tmp_path):
+    deepseek_env("http://127.0.0.1:1/v1/chat/completions")
+    tracking_file = tmp_path / "tracking.jsonl"
+    api = DeepSeekApi(max_retries=1, tracking_file=str(tracking_file))
+
+    calls = []
+
+    def fail(*args, **kwargs):
+        calls.append(1)
+        raise requests.exceptions.ContentDecodingError("bad gzip")
+    monkeypatch.setattr(api.session, "post", fail)
+
+    with pytest.raises(requests.exceptions.ContentDecodingError):
+        api.request("prompt", context={"step": 7})
+    api.close()
+
+    assert len(calls) == 2
+    records = [json.loads(line) for line in tracking_file.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["step"] == 7 and "bad gzip" in records[0]["error"]
@@ -0,0 +1,112 @@
+import importlib
+import sys
+import threading
+import types
+from unittest import mock
+
+import pytest
+
+from src.common import gpt4all_backend
+
+
+class FakeGPT4All:
+    """Stands in for gpt4all.GPT4All and records how it is used."""
+    instances = []
+
+    def __init__(self, model_name, **kwargs):
+        self.model_name = model_name
+        self.kwargs = kwargs
+        self.load_thread = threading.current_thread().name
+        self.sessions = 0
+        self.in_session = False
+        self.generate = mock.Mock(side_effect=self._generate)
+        self.close = mock.Mock()
+        FakeGPT4All.instances.append(self)
+
+    def _generate(self, prompt, **kwargs):
+        assert self.in_session, "generate must run inside a chat session"
+        return f"chose_path = ['a', 'b'] on {threading.current_thread().name}"
+
+    def chat_session(self):
+        model = self
+
+        class Session:
+            def __enter__(self):
+                model.sessions += 1
+                model.in_session = True
+
+            def __exit__(self, *exc):
+                model.in_session = False
+
+        return Session()
+
+
+@pytest.fixture
+def backend_module(monkeypatch):
+    """gpt4all_backend imported against a fake gpt4all package."""
+    FakeGPT4All.instances = []
+    monkeypatch.setitem(sys.modules, "gpt4all", types.SimpleNamespace(GPT4All=FakeGPT4All))
+    monkeypatch.delenv("DEEPSEEK_TRACKING_FILE", raising=False)
+    monkeypatch.delenv("GPT4ALL_MODEL_PATH", raising=False)
+    yield importlib.reload(gpt4all_backend)
+    monkeypatch.undo()
+    importlib.reload(gpt4all_backend)
+
+
+def test_loads_the_model_once_on_its_worker_thread(backend_module, monkeypatch):
+    monkeypatch.setenv("GPT4ALL_MODEL", "model.gguf")
+    backend = backend_module.GPT4AllBackend(model_path="/models", n_threads=4)
+
+    assert len(FakeGPT4All.instances) == 1
+    model = FakeGPT4All.instances[0]
+    assert model.model_name == "model.gguf"
+    assert model.kwargs == {"model_path": "/models", "allow_download": False, "device": "cpu", "n_threads": 4}
+    assert model.load_thread.startswith("gpt4all")
+    backend.close()
+
+
+def test_downloads_only_without_a_model_path(backend_module):
+    backend = backend_module.GPT4AllBackend(model_name="model.gguf")
+    assert FakeGPT4All.instances[0].kwargs["allow_download"] is True
+    backend.close()
+
+
+def test_generate_arguments_and_sessions(backend_module):
+    backend = backend_module.GPT4AllBackend(model_name="model.gguf", max_tokens=128, temperature=0.2)
+    model = FakeGPT4All.instances[0]
+
+    first = backend.request("prompt 1")
+    backend.request("prompt 2", json_output=True)
+
+    assert first.startswith("chose_path = ['a', 'b']")
+    # Requests run on the thread the model was loaded on
+    assert first.endswith(model.load_thread)
+    assert model.generate.call_args_list == [
+        mock.call("prompt 1", max_tokens=128, temp=0.2),
+        mock.call("prompt 2", max_tokens=128, temp=0.2),
+    ]
+    # One fresh chat session per prompt, same model
+    assert model.sessions == 2 and len(FakeGPT4All.instances) == 1
+    backend.close()
+
+
+def test_close_releases_the_model(backend_module):
+    backend = backend_module.GPT4AllBackend(model_name="model.gguf")
+    model = FakeGPT4All.instances[0]
+    backend.close()
+
+    model.close.assert_called_once_with()
+    with pytest.raises(RuntimeError):
+        backend._executor.submit(lambda: None)
+
+
+def test_needs_a_model_name(backend_module, monkeypatch):
+    monkeypatch.delenv("GPT4ALL_MODEL", raising=False)
+    with pytest.raises(ValueError):
+        backend_module.GPT4AllBackend()
+
+
+def test_needs_gpt4all(monkeypatch):
+    monkeypatch.setattr(gpt4all_backend, "GPT4All", None)
+    with pytest.raises(ImportError):
+        gpt4all_backend.GPT4AllBackend(model_name="model.gguf")
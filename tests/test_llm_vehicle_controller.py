@@ -0,0 +1,237 @@
+import subprocess
+
+import numpy as np
+import pytest
+import traci
+
+from src.common.simulation_state import EdgeState, StepSnapshot, VehicleState
+from src.common.vehicle_decisions import VehicleDecisionTable
+from src.LLM.VehicleController import VehicleController
+
+# a -> b, where the road splits over c or d, and joins again at e -> f
+NODES = """<nodes>
+    <node id="a" x="0" y="0"/>
+    <node id="b" x="100" y="0"/>
+    <node id="c" x="200" y="50"/>
+    <node id="d" x="200" y="-50"/>
+    <node id="e" x="300" y="0"/>
+    <node id="f" x="400" y="0"/>
+</nodes>"""
+EDGES = """<edges>
+    <edge id="ab" from="a" to="b" numLanes="1" speed="13.89"/>
+    <edge id="bc" from="b" to="c" numLanes="1" speed="13.89"/>
+    <edge id="bd" from="b" to="d" numLanes="1" speed="13.89"/>
+    <edge id="ce" from="c" to="e" numLanes="1" speed="13.89"/>
+    <edge id="de" from="d" to="e" numLanes="1" speed="13.89"/>
+    <edge id="ef" from="e" to="f" numLanes="1" speed="13.89"/>
+</edges>"""
+
+
+@pytest.fixture(scope="module")
+def net_file(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("net")
+    (directory / "net.nod.xml").write_text(NODES)
+    (directory / "net.edg.xml").write_text(EDGES)
+    subprocess.run(
+        ["netconvert", "-n", "net.nod.xml", "-e", "net.edg.xml", "-o", "net.xml", "--no-turnarounds"],
+        cwd=directory, check=True, capture_output=True
+    )
+    return str(directory / "net.xml")
+
+
+class FakeVehicles:
+    """The vehicle domain of TraCI, for vehicles whose route is set by hand."""
+
+    def __init__(self) -> None:
+        self.routes = {}
+        self.route_index = {}
+        self.set_routes = []
+
+    def getRoute(self, vehicle_id):
+        return tuple(self.routes[vehicle_id])
+
+    def getRouteIndex(self, vehicle_id):
+        return self.route_index[vehicle_id]
+
+    def setRoute(self, vehicle_id, route):
+        self.routes[vehicle_id] = list(route)
+        self.route_index[vehicle_id] = 0
+        self.set_routes.append((vehicle_id, list(route)))
+
+
+class FakeSim:
+    TraCIException = traci.exceptions.TraCIException
+
+    def __init__(self) -> None:
+        self.vehicle = FakeVehicles()
+
+
+@pytest.fixture
+def controller(net_file, deepseek_env):
+    deepseek_env("http://127.0.0.1:1/v1/chat/completions")
+
+    def build(**kwargs) -> VehicleController:
+        controller = VehicleController(net_file, "routes.xml", "config.sumocfg", **kwargs)
+        controller.sim = FakeSim()
+        return controller
+
+    return build
+
+
+def vehicle_on(edge: str, remaining: float, speed: float = 10.0, lane_length: float = 100.0) -> VehicleState:
+    return VehicleState(
+        road_id=edge, lane_id=f"{edge}_0", lane_position=lane_length - remaining, lane_length=lane_length,
+        waiting_time=0.0, time_loss=0.0, distance=0.0, speed=speed, allowed_speed=13.89
+    )
+
+
+def snapshot_of(controller: VehicleController, time: float, vehicles) -> StepSnapshot:
+    n = len(controller.network.edge_ids)
+    edges = EdgeState(np.full(n, 10.0), np.zeros(n), np.zeros(n, dtype=np.int32))
+    return StepSnapshot(time, 1.0, vehicles, edges)
+
+
+@pytest.mark.parametrize("prefetch_distance", [0.0, 50.0])
+def test_waypoint_driven_past_keeps_the_current_route(controller, prefetch_distance):
+    controller = controller(prefetch_distance=prefetch_distance)
+    decisions = controller.decisions = VehicleDecisionTable(["v"], [["ab", "bc", "ef"]], controller.network.edge_index)
+    assert decisions.target_edge("v", "ab") == "bc"
+
+    # bc was driven past between two steps, so from ce the vehicle still heads for it
+    vehicle = vehicle_on("ce", remaining=1.0)
+    snapshot = snapshot_of(controller, 10.0, {"v": vehicle})
+    target_edge = decisions.target_edge("v", "ce")
+    assert target_edge == "bc"
+
+    candidates, prefetching = [], {}
+    controller._consider("v", vehicle, target_edge, snapshot, candidates, prefetching)
+
+    assert candidates == [] and prefetching == {}
+    assert "v" not in controller.prefetcher
+    # Decided all the same, so it does not search again on every step of this edge
+    assert decisions.decided_on("v", "ce")
+    assert not decisions.may_decide("v", "ce", 11.0)
+    assert controller.sim.vehicle.set_routes == []
+
+
+def start_prefetch(controller, vehicle: VehicleState, snapshot: StepSnapshot):
+    """Start the prefetched decision of vehicle "v", heading for ef; returns its request."""
+    controller.decisions = VehicleDecisionTable(["v"], [["ab", "ef"]], controller.network.edge_index)
+    controller.sim.vehicle.routes["v"], controller.sim.vehicle.route_index["v"] = ["ab", "bc", "ce", "ef"], 0
+
+    candidates, prefetching = [], {}
+    controller._consider("v", vehicle, controller.decisions.target_edge("v", "ab"), snapshot, candidates, prefetching)
+    assert prefetching == {"v": "ab"}
+    [request] = controller._build_requests(candidates, snapshot, step=10)
+    controller.prefetcher.start(request, "ab")
+    return request
+
+
+def test_prefetched_route_is_applied_as_soon_as_it_comes_back(controller):
+    controller = controller(prefetch_distance=50.0)
+    vehicle = vehicle_on("ab", remaining=45.0)
+    request = start_prefetch(controller, vehicle, snapshot_of(controller, 10.0, {"v": vehicle}))
+    via_d = next(path for path in request.k_shortest_paths if "bd" in path)
+
+    # Back two steps later, with the vehicle still 25 m before the junction
+    vehicle = vehicle_on("ab", remaining=25.0)
+    controller._decided(request, via_d, snapshot_of(controller, 12.0, {"v": vehicle}))
+
+    assert controller.sim.vehicle.set_routes == [("v", via_d)]
+    prefetcher = controller.prefetcher
+    assert (prefetcher.on_time, prefetcher.late, prefetcher.stale) == (1, 0, 0)
+    assert "v" not in prefetcher
+
+
+def test_fast_vehicle_gets_its_held_route_before_the_junction(controller):
+    controller = controller(prefetch_distance=50.0)
+    # 45 m before the junction at 13.89 m/s, so the vehicle is never within 2 m of it
+    speed = 13.89
+    vehicle = vehicle_on("ab", remaining=45.0, speed=speed)
+    snapshot = snapshot_of(controller, 10.0, {"v": vehicle})
+    request = start_prefetch(controller, vehicle, snapshot)
+    via_d = next(path for path in request.k_shortest_paths if "bd" in path)
+
+    # Back while the edges are briefly slower: stale, so held
+    slow = snapshot_of(controller, 10.0, {"v": vehicle})
+    slow.edges.travel_time[:] *= 2
+    controller._decided(request, via_d, slow)
+    assert controller.sim.vehicle.set_routes == [] and "v" in controller.prefetcher
+
+    # Woken on the last step before it can leave the edge, 3.33 m before the junction
+    threshold = controller._wake_threshold("v", vehicle, snapshot.delta_t, {})
+    wake_time = controller.scheduler.wake_time(vehicle, snapshot.time, snapshot.delta_t, threshold)
+    assert wake_time == 13.0
+    vehicle = vehicle_on("ab", remaining=45.0 - 3 * speed, speed=speed)
+    controller._take_prefetched("v", vehicle, "ef", snapshot_of(controller, wake_time, {"v": vehicle}), [])
+
+    # The times are back to what the decision was made on, so it stands
+    assert controller.sim.vehicle.set_routes == [("v", via_d)]
+    prefetcher = controller.prefetcher
+    assert (prefetcher.on_time, prefetcher.late, prefetcher.stale) == (1, 0, 0)
+    assert "v" not in prefetcher
+
+
+def test_vehicle_at_its_decision_point_decides_on_the_spot(controller):
+    controller = controller(prefetch_distance=50.0)
+    controller.decisions = VehicleDecisionTable(["v"], [["ab", "ef"]], controller.network.edge_index)
+
+    vehicle = vehicle_on("ab", remaining=10.0, speed=13.89)
+    candidates, prefetching = [], {}
+    snapshot = snapshot_of(controller, 10.0, {"v": vehicle})
+    controller._consider("v", vehicle, controller.decisions.target_edge("v", "ab"), snapshot, candidates, prefetching)
+
+    # Not held: the answer is applied as soon as it is there
+    assert len(candidates) == 1 and prefetching == {}
+
+
+class ScriptedBackend:
+    """Answers every prompt with the same text."""
+
+    def __init__(self, answer: str) -> None:
+        self.answer = answer
+
+    def request(self, prompt, json_output=False, context=None):
+        return self.answer
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.mark.parametrize("answer", [
+    "chose_path = ['ab', 'bd', 'ef']",
+    "chose_path = ['ab', 'bc']",
+    "no route given",
+])
+def test_answer_that_is_no_candidate_is_neither_cached_nor_applied(controller, answer):
+    controller = controller()
+    controller.prompt_path = "src/LLM/prompt.txt"
+    controller.backend = ScriptedBackend(answer)
+    controller.decisions = VehicleDecisionTable(["v"], [["ab", "ef"]], controller.network.edge_index)
+    controller.sim.vehicle.routes["v"], controller.sim.vehicle.route_index["v"] = ["ab", "bd", "de", "ef"], 0
+
+    vehicle = vehicle_on("ab", remaining=1.0)
+    snapshot = snapshot_of(controller, 10.0, {"v": vehicle})
+    [request] = controller._build_requests([("v", controller._k_shortest_paths("ab", "ef"))], snapshot, step=10)
+    chosen = controller._get_llm_suggestions([request]).get("v")
+    controller._take_decided([(request, chosen)], snapshot)
+
+    assert len(controller.decision_cache) == 0
+    assert controller.sim.vehicle.set_routes == [("v", request.k_shortest_paths[0])]
+
+
+def test_candidate_answer_is_cached_and_applied(controller):
+    controller = controller()
+    controller.prompt_path = "src/LLM/prompt.txt"
+    controller.decisions = VehicleDecisionTable(["v"], [["ab", "ef"]], controller.network.edge_index)
+    controller.sim.vehicle.routes["v"], controller.sim.vehicle.route_index["v"] = ["ab", "bc", "ce", "ef"], 0
+
+    vehicle = vehicle_on("ab", remaining=1.0)
+    snapshot = snapshot_of(controller, 10.0, {"v": vehicle})
+    [request] = controller._build_requests([("v", controller._k_shortest_paths("ab", "ef"))], snapshot, step=10)
+    controller.backend = ScriptedBackend(f"chose_path = {request.k_shortest_paths[1]}")
+    chosen = controller._get_llm_suggestions([request]).get("v")
+    controller._take_decided([(request, chosen)], snapshot)
+
+    assert controller.decision_cache.get(request) == request.k_shortest_paths[1]
+    assert controller.sim.vehicle.set_routes == [("v", request.k_shortest_paths[1])]
@@ -0,0 +1,163 @@
+import pytest
+
+from src.common.get_k_shortest_paths import get_k_shortest_paths
+from src.common.get_shortest_path import get_shortest_path
+from src.common.k_shortest_paths_engine import KShortestPathsEngine
+from src.common.routing_graph import RoutingGraph
+from src.common.shortest_path_tree_cache import ShortestPathTreeCache
+
+# A -in-> B, then B -> C over either of two parallel edges, C -out-> D. B -bd-> D
+# exists too, but turning into it from ``in`` is not allowed.
+EDGES = {
+    # edge ID: (from, to, length)
+    "in": ("A", "B", 10.0),
+    "p1": ("B", "C", 10.0),
+    "p2": ("B", "C", 12.0),
+    "out": ("C", "D", 10.0),
+    "bd": ("B", "D", 5.0),
+}
+TURNS = [("in", "p1", "s"), ("in", "p2", "s"), ("p1", "out", "s"), ("p2", "out", "l")]
+
+
+def make_graph(edges=EDGES, turns=TURNS, turn_penalties=None) -> RoutingGraph:
+    node_ids = sorted({node for u, v, _ in edges.values() for node in (u, v)})
+    node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+    edge_ids = list(edges)
+    edge_index = {edge_id: i for i, edge_id in enumerate(edge_ids)}
+    return RoutingGraph(
+        node_ids=node_ids,
+        edge_ids=edge_ids,
+        edge_from=[node_index[u] for u, _, _ in edges.values()],
+        edge_to=[node_index[v] for _, v, _ in edges.values()],
+        edge_length=[length for _, _, length in edges.values()],
+        turn_from=[edge_index[u] for u, _, _ in turns],
+        turn_to=[edge_index[v] for _, v, _ in turns],
+        turn_direction=[direction for _, _, direction in turns],
+        turn_penalties=turn_penalties,
+    )
+
+
+def test_new_edge_weights_rebuild_the_cached_trees():
+    graph = make_graph()
+    cache = ShortestPathTreeCache(graph)
+    source, target = graph.edge_index["in"][2], graph.edge_index["out"][2]
+
+    assert cache.shortest_path(source, target) == (20.0, [source, graph.edge_index["p1"][2], target])
+    cache.get(target)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # p1 gets slow: the tree towards ``out`` is built again, and now runs over p2
+    weights = graph.edge_length.copy()
+    weights[graph.edge_index["p1"][2]] = 50.0
+    graph.set_edge_weights(weights)
+    assert graph.weight_version == 1
+
+    dist, _ = cache.get(target)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert dist[source] == 22.0
+    assert get_shortest_path(graph, "in", "out", cache) == ["in", "p2", "out"]
+    assert len(cache) == 1
+
+
+def test_edge_weights_must_cover_every_edge():
+    graph = make_graph()
+    with pytest.raises(ValueError):
+        graph.set_edge_weights([1.0, 2.0])
+    assert graph.weight_version == 0
+
+
+def engine_for(graph: RoutingGraph) -> KShortestPathsEngine:
+    return KShortestPathsEngine(graph, ShortestPathTreeCache(graph))
+
+
+def test_parallel_edges_are_separate_paths():
+    paths = engine_for(make_graph()).find("in", "out", 3)
+    # k larger than the number of paths: all there are, cheapest first
+    assert paths == [(20.0, ["in", "p1", "out"]), (22.0, ["in", "p2", "out"])]
+
+
+def test_turn_penalties_are_part_of_the_cost():
+    paths = engine_for(make_graph(turn_penalties={"l": 5.0})).find("in", "out", 2)
+    assert paths == [(20.0, ["in", "p1", "out"]), (27.0, ["in", "p2", "out"])]
+
+
+def test_restricted_turn_is_never_taken():
+    graph = make_graph()
+    # B -> D is a single edge, but it cannot be turned into from ``in``
+    assert engine_for(graph).find("in", "bd", 3) == []
+    assert get_shortest_path(graph, "in", "bd") == []
+    with pytest.raises(ValueError, match="No path between in and bd"):
+        get_k_shortest_paths(graph, "in", "bd", 3)
+
+
+def test_unreachable_target_has_no_paths():
+    assert engine_for(make_graph()).find("out", "in", 3) == []
+
+
+def test_start_is_the_end():
+    assert engine_for(make_graph()).find("p1", "p1", 3) == [(0.0, ["p1"])]
+
+
+def test_unknown_edge_is_an_error():
+    with pytest.raises(ValueError):
+        engine_for(make_graph()).find("in", "nowhere", 3)
+
+
+def grid(size: int = 3):
+    """Two-way grid of junctions with uneven edge lengths, without U-turns; returns (edges, turns)."""
+    edges = {}
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                if 0 <= i + di < size and 0 <= j + dj < size:
+                    u, v = (i, j), (i + di, j + dj)
+                    edges[f"{u[0]}{u[1]}-{v[0]}{v[1]}"] = (u, v, 10.0 + 3 * ((7 * i + 3 * j + 5 * di + dj) % 5))
+
+    turns = []
+    for from_edge, (u, v, _) in edges.items():
+        for to_edge, (v2, w, _) in edges.items():
+            if v2 != v or w == u:
+                continue
+            cross = (v[0] - u[0]) * (w[1] - v[1]) - (v[1] - u[1]) * (w[0] - v[0])
+            turns.append((from_edge, to_edge, "s" if cross == 0 else "l" if cross > 0 else "r"))
+    return {edge_id: (str(u), str(v), length) for edge_id, (u, v, length) in edges.items()}, turns
+
+
+def all_paths(edges, turns, turn_penalties, start: str, end: str):
+    """Every path from start to end using each edge at most once, with its cost, cheapest first."""
+    penalties = {}
+    for u, v, direction in turns:
+        penalty = turn_penalties.get(direction, 0.0)
+        penalties[(u, v)] = min(penalty, penalties.get((u, v), penalty))
+
+    paths = []
+
+    def extend(path, cost):
+        if path[-1] == end:
+            paths.append((cost, path))
+            return
+        for (u, v), penalty in penalties.items():
+            if u == path[-1] and v not in path:
+                extend(path + [v], cost + edges[v][2] + penalty)
+
+    extend([start], 0.0)
+    return sorted(paths)
+
+
+def test_k_shortest_paths_match_every_path_enumerated():
+    edges, turns = grid()
+    turn_penalties = {"l": 4.0, "r": 1.0}
+    graph = make_graph(edges, turns, turn_penalties)
+    engine = engine_for(graph)
+
+    for start, end in [("00-01", "21-22"), ("10-11", "12-02"), ("22-12", "01-00"), ("11-21", "11-12")]:
+        expected = all_paths(edges, turns, turn_penalties, start, end)
+        paths = engine.find(start, end, 12)
+
+        assert len(paths) == min(12, len(expected))
+        assert [cost for cost, _ in paths] == pytest.approx([cost for cost, _ in expected[:len(paths)]])
+        # Distinct and loopless, each at the cost it is reported with
+        costs = dict((tuple(path), cost) for cost, path in expected)
+        assert len({tuple(path) for _, path in paths}) == len(paths)
+        for cost, path in paths:
+            assert costs[tuple(path)] == pytest.approx(cost)
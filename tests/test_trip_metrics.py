@@ -0,0 +1,45 @@
+import csv
+
+import numpy as np
+import pytest
+
+from src.common.simulation_state import EdgeState, StepSnapshot, VehicleState
+from src.common.trip_metrics import INTERVAL_COLUMNS, TripMetrics
+
+NO_EDGES = EdgeState(np.zeros(0), np.zeros(0), np.zeros(0))
+
+
+def vehicle(distance: float) -> VehicleState:
+    return VehicleState("e", "e_0", 10.0, 100.0, 0.0, 1.0, distance, 10.0, 10.0)
+
+
+def run(metrics: TripMetrics, start: float, steps: int) -> None:
+    """One vehicle departing on the first step and arriving on the last; SUMO reports the time after each step."""
+    for step in range(1, steps + 1):
+        departed = ("v",) if step == 1 else ()
+        arrived = ("v",) if step == steps else ()
+        vehicles = {} if arrived else {"v": vehicle(10.0 * step)}
+        metrics.update(StepSnapshot(start + step, 1.0, vehicles, NO_EDGES, departed, arrived))
+    metrics.finish()
+
+
+@pytest.mark.parametrize("end_time", [None, 25200.0 + 150])
+def test_intervals_start_with_the_simulation(tmp_path, end_time):
+    metrics = TripMetrics(interval=60.0, end_time=end_time)
+    run(metrics, start=25200.0, steps=150)
+
+    assert metrics.start_time == 25200.0
+    assert metrics.intervals == 3
+    # Allocated for the scenario's own length, not from time 0
+    assert len(metrics.steps) < 25200 // 60
+
+    metrics.save(str(tmp_path / "results.csv"))
+    with open(tmp_path / "results_intervals.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == list(INTERVAL_COLUMNS)
+    assert [(float(row["begin"]), float(row["end"])) for row in rows] == [
+        (25200.0, 25260.0), (25260.0, 25320.0), (25320.0, 25350.0)
+    ]
+    assert [int(row["departed"]) for row in rows] == [1, 0, 0]
+    assert [int(row["arrived"]) for row in rows] == [0, 0, 1]
+    assert float(rows[2]["travelTime"]) == 149.0